@@ -0,0 +1,375 @@
+"""Computer opponent: chooses where to bomb from what a player can see
+
+The computer only learns the outcome of its own shots: misses, hits and
+the ships it has sunk (which the board reveals). It never looks at the
+hidden layout. Three levels of difficulty are available:
+
+Easy:    bombs random locations
+Medium:  hunts on a checkerboard, then bombs around every wounded ship
+Hard:    keeps, for every location, the number of ways the remaining
+         ships could still cover it, and bombs the most likely location
+         (given an endgame.EndgameSolver, the last ships are played
+         exactly once few layouts of them are left)
+
+Average shots to sink the default fleet (2, 3, 4, 5 on a 10x10 board)
+over 1000 games, as reported by measure():
+
+Easy:    94.3
+Medium:  46.1
+Hard:    41.4
+"""
+
+import random
+
+from engine import BoardState, MISS, HIT, SINK, indices
+
+
+# ################################
+#        Constants
+# ################################
+
+EASY = 0
+MEDIUM = 1
+HARD = 2
+LEVELS = ('Easy', 'Medium', 'Hard')
+
+# How much more a placement counts for every wounded location it covers
+HIT_WEIGHT = 50
+
+# Density of locations that have been bombed
+BOMBED = -1 << 60
+
+_placements = {}
+
+
+# ################################
+#        Functions
+# ################################
+
+def shipPlacements(size, boardsize):
+    """(int, int) -> tuple
+    Return (placements, cover, counts) for ships of size on the board
+    placements is a tuple of the locations covered by each placement
+    cover[n] lists the placements covering location n
+    counts[n] is the number of placements covering location n
+    Results are cached and must not be modified"""
+
+    key = (size, boardsize)
+    if key not in _placements:
+        placements = []
+        for r in range(boardsize):
+            for c in range(boardsize - size + 1):
+                n = r * boardsize + c
+                placements.append(tuple(range(n, n + size)))
+                if size > 1:
+                    n = c * boardsize + r
+                    placements.append(tuple(range(n, n + size * boardsize,
+                                                  boardsize)))
+        cover = [[] for n in range(pow(boardsize, 2))]
+        for p, cells in enumerate(placements):
+            for n in cells:
+                cover[n].append(p)
+        counts = [len(ships) for ships in cover]
+        _placements[key] = (tuple(placements), cover, counts)
+    return _placements[key]
+
+
+def placementCount(size, boardsize):
+    """(int, int) -> int
+    Return the number of placements of a ship of size on the board"""
+
+    across = boardsize * (boardsize - size + 1)
+    return across if size == 1 else 2 * across
+
+
+def transform(index, boardsize, symmetry):
+    """(int, int, int) -> int
+    Return where location index goes under one of the 8 symmetries of
+    the board: bit 0 flips rows, bit 1 flips columns, bit 2 transposes"""
+
+    r, c = divmod(index, boardsize)
+    if symmetry & 1:
+        r = boardsize - 1 - r
+    if symmetry & 2:
+        c = boardsize - 1 - c
+    if symmetry & 4:
+        r, c = c, r
+    return r * boardsize + c
+
+
+def measure(level=HARD, games=1000, shipList=None, boardsize=10, seed=0):
+    """(int, int, dict, int, int) -> float
+    Return the average number of shots the computer takes to sink every
+    ship of shipList on randomly laid out boards"""
+
+    if shipList is None:
+        shipList = {2: 1, 3: 1, 4: 1, 5: 1}
+    rng = random.Random(seed)
+    shots = 0
+    for i in range(games):
+        board = BoardState(shipList, boardsize)
+        board.placeShips(rng)
+        computer = Targeting(shipList, boardsize, level, rng)
+        while not board.allSunk():
+            computer.record(board.fire(computer.choose()))
+            shots += 1
+    return float(shots) / games
+
+
+# ################################
+#        Classes
+# ################################
+
+class Targeting(object):
+    """Computer's knowledge of the board it bombs"""
+
+    def __init__(self, shipList, boardsize, level=HARD, rng=random,
+                 opening=None, endgame=None):
+        """(Targeting, dict, int, int, Random, OpeningTables,
+        EndgameSolver) -> NoneType
+        opening holds the precomputed tables of shipList and boardsize
+        (see tables.py): the hard computer then starts without building
+        its own and follows the opening book, under a random symmetry of
+        the board, until its first hit
+        The hard computer plays the last ships with endgame, if given
+        (see endgame.py)"""
+
+        self.boardsize = boardsize
+        self.cells = pow(boardsize, 2)
+        self.level = level
+        self.rng = rng
+        self.endgame = endgame
+        self.remaining = dict((k, v) for k, v in shipList.items() if v)
+        self.shots = 0    # locations bombed
+        self.wounded = 0  # locations hit on ships not sunk yet
+
+        # Locations not bombed yet, in no order, and the position of
+        # every location in that list: a shot swaps its location out
+        self.unbombed = list(range(self.cells))
+        self.slots = list(range(self.cells))
+
+        # For every ship size: placements that avoid every miss and
+        # sunk ship, and how many of them cover each location
+        # density[n] adds those counts up over all remaining ships
+        self.alive = {}
+        self.counts = {}
+        self.density = None
+
+        # Opening book followed while every shot misses, and the misses
+        # not yet taken off the placements
+        self.book = None
+        self.booked = 0
+        self.symmetry = 0
+        self.missed = []
+
+        if level == HARD and opening is not None:
+            self.book = opening
+            self.symmetry = rng.randrange(8)
+            self.density = opening.density()
+            for k in self.remaining:
+                self.alive[k] = bytearray([1]) * placementCount(k, boardsize)
+                self.counts[k] = opening.counts(k)
+        elif level == HARD:
+            self.density = [0] * self.cells
+            for k, v in self.remaining.items():
+                placements, cover, counts = shipPlacements(k, boardsize)
+                self.alive[k] = bytearray([1]) * len(placements)
+                self.counts[k] = list(counts)
+                for n, count in enumerate(self.counts[k]):
+                    self.density[n] += v * count
+
+    def choose(self, deadline=None):
+        """(Targeting, float) -> int
+        Return the location to bomb next
+        The hard computer's endgame search gives up at deadline (a
+        timer() value), the heuristics choosing the move instead"""
+
+        if self.level == HARD:
+            if self.book is not None:
+                n = self.bookMove()
+                if n is not None:
+                    return n
+                self.leaveBook()
+            if self.endgame is not None:
+                n = self.endgame.choose(self.boardsize, self.shots,
+                                        self.wounded, self.remaining,
+                                        deadline)
+                if n is not None:
+                    return n
+            if self.wounded:
+                n = self.target()
+                if n is not None:
+                    return n
+            return self.pick(self.density)
+        if self.level == MEDIUM:
+            if self.wounded:
+                return self.pick(self.neighbours())
+            return self.hunt()
+        return self.pick()
+
+    def record(self, shot):
+        """(Targeting, Shot) -> NoneType
+        Learn from the outcome of a shot fired at location shot.index"""
+
+        n = shot.index
+        if self.book is not None:
+            if shot.result == MISS and n == self.bookMove():
+                self.bomb(n)
+                self.density[n] = BOMBED
+                self.missed.append(n)
+                self.booked += 1
+                return
+            self.leaveBook()
+        self.bomb(n)
+        if shot.result == SINK:
+            self.wounded = (self.wounded | 1 << n) & ~shot.mask
+            self.sink(shot.size, shot.mask)
+        elif shot.result == HIT:
+            self.wounded |= 1 << n
+        else:
+            self.block(n)
+        if self.density is not None:
+            self.density[n] = BOMBED
+
+    def bomb(self, n):
+        """(Targeting, int) -> NoneType
+        Mark location n as bombed"""
+
+        if self.shots >> n & 1:
+            return
+        self.shots |= 1 << n
+        last = self.unbombed.pop()
+        if last != n:
+            slot = self.slots[n]
+            self.unbombed[slot] = last
+            self.slots[last] = slot
+
+    def bookMove(self):
+        """(Targeting) -> int or NoneType
+        Return the next location of the opening book, or None once the
+        book is exhausted"""
+
+        n = self.book.book(self.booked)
+        if n is None:
+            return None
+        return transform(n, self.boardsize, self.symmetry)
+
+    def leaveBook(self):
+        """(Targeting) -> NoneType
+        Stop following the opening book and take the misses made so far
+        off the placements"""
+
+        self.book = None
+        for n in self.missed:
+            self.block(n)
+        self.missed = []
+
+    def block(self, n):
+        """(Targeting, int) -> NoneType
+        Drop every placement covering location n, known to hold no ship"""
+
+        if self.density is None:
+            return
+        density = self.density
+        for k, alive in self.alive.items():
+            placements, cover = shipPlacements(k, self.boardsize)[:2]
+            counts = self.counts[k]
+            weight = self.remaining[k]
+            for p in cover[n]:
+                if alive[p]:
+                    alive[p] = 0
+                    for m in placements[p]:
+                        counts[m] -= 1
+                        density[m] -= weight
+
+    def sink(self, size, mask):
+        """(Targeting, int, int) -> NoneType
+        Record that the ship of size covering mask has been sunk"""
+
+        cells = indices(mask)
+        for n in cells:
+            self.block(n)
+        if size not in self.remaining:
+            return
+        self.remaining[size] -= 1
+        if self.density is not None:
+            density = self.density
+            for m, count in enumerate(self.counts[size]):
+                density[m] -= count
+        if not self.remaining[size]:
+            del self.remaining[size]
+            self.alive.pop(size, None)
+            self.counts.pop(size, None)
+
+    def target(self):
+        """(Targeting) -> int or NoneType
+        Return the location most likely to hold the rest of a wounded
+        ship, weighing placements by the wounded locations they cover"""
+
+        score = {}
+        wounded = indices(self.wounded)
+        for k, alive in self.alive.items():
+            placements, cover = shipPlacements(k, self.boardsize)[:2]
+            weight = self.remaining[k]
+            for h in wounded:
+                for p in cover[h]:
+                    if not alive[p]:
+                        continue
+                    cells = placements[p]
+                    gain = weight * pow(HIT_WEIGHT, sum(
+                        1 for m in cells if self.wounded >> m & 1))
+                    for m in cells:
+                        if not self.shots >> m & 1:
+                            score[m] = score.get(m, 0) + gain
+        if not score:
+            return None
+        best = max(score.values())
+        return self.rng.choice([m for m in score if score[m] == best])
+
+    def neighbours(self):
+        """(Targeting) -> list of int
+        Return the locations next to wounded locations not bombed yet
+        Locations in line with two wounded locations come first"""
+
+        around = []
+        inLine = []
+        size = self.boardsize
+        for h in indices(self.wounded):
+            r, c = divmod(h, size)
+            for dr, dc in ((0, 1), (0, -1), (1, 0), (-1, 0)):
+                if not (0 <= r + dr < size and 0 <= c + dc < size):
+                    continue
+                m = h + dr * size + dc
+                if self.shots >> m & 1:
+                    continue
+                around.append(m)
+                back = (r - dr, c - dc)
+                if 0 <= back[0] < size and 0 <= back[1] < size and \
+                   self.wounded >> (back[0] * size + back[1]) & 1:
+                    inLine.append(m)
+        return inLine or around or None
+
+    def hunt(self):
+        """(Targeting) -> int
+        Return a random location on a checkerboard spaced by the
+        smallest ship left, so no ship can hide between shots"""
+
+        step = min(self.remaining) if self.remaining else 1
+        size = self.boardsize
+        cells = [n for n in range(self.cells) if not self.shots >> n & 1
+                 and (n // size + n % size) % step == 0]
+        return self.pick(cells or None)
+
+    def pick(self, choices=None):
+        """(Targeting, list) -> int
+        Return a random location not bombed yet
+        With a list of locations pick among them, with a list of
+        densities pick among the locations of highest density"""
+
+        if choices is None:
+            return self.rng.choice(self.unbombed)
+        if choices is self.density:
+            best = max(choices)
+            return self.rng.choice(
+                [n for n, d in enumerate(choices) if d == best])
+        return self.rng.choice(choices)
@@ -0,0 +1,134 @@
+"""Ships moved by hand on a player's board before the game starts
+
+A player drags a ship to move it and right-clicks it to turn it about
+its first location. Ships stay on the board: a ship dragged past an edge
+stops along it. While a ship is held it follows the pointer square by
+square, drawn in CLASH colour over another ship. Dropped there, it goes
+back to where it was picked up. Once the board has been bombed no ship
+moves any more.
+
+The board's occupied mask is the occupancy index: whether a ship fits
+is one AND of its mask with the locations of the other ships. Only the
+ship held is redrawn, and only when the pointer enters another square,
+so dragging costs the same on any board with any number of ships.
+
+Nothing here imports Tkinter.
+
+Example:
+
+    arrangement = Arrangement(board.state, board.grid, board.drawing)
+    canvas.bind('<ButtonPress-1>', lambda e: arrangement.grab(e.x, e.y))
+    canvas.bind('<B1-Motion>', lambda e: arrangement.drag(e.x, e.y))
+    canvas.bind('<ButtonRelease-1>', lambda e: arrangement.drop())
+"""
+
+from engine import FIRST_SHIP_ID, maskPlacement, shipMask
+from render import SHIP, CLASH
+
+
+# ################################
+#        Classes
+# ################################
+
+class Arrangement(object):
+    """Ships of one board being laid out by hand"""
+
+    def __init__(self, state, grid, ships):
+        """(Arrangement, BoardState, Grid, Ships) -> NoneType
+        ships draws the ships of state on grid"""
+
+        self.state = state
+        self.grid = grid
+        self.ships = ships
+        self.held = None    # ship id being dragged
+        self.offset = 0     # location of the ship held under the pointer
+        self.mask = 0       # where the ship held is drawn
+
+    def shipAt(self, x, y):
+        """(Arrangement, float, float) -> int or NoneType
+        Return the id of the ship at canvas point x, y, if any"""
+
+        n = self.grid.cellAt(x, y)
+        if n is None:
+            return None
+        return self.state.shipAt(n)
+
+    def grab(self, x, y):
+        """(Arrangement, float, float) -> bool
+        Pick up the ship at canvas point x, y; False if there is none
+        or the board was bombed already"""
+
+        if self.state.shots:
+            return False
+        shipID = self.shipAt(x, y)
+        if shipID is None:
+            return False
+        mask = self.state.ships[shipID - FIRST_SHIP_ID]
+        n, k, rotation = maskPlacement(mask)
+        boardsize = self.state.boardsize
+        r, c = self.grid.nearest(x, y)
+        self.held = shipID
+        self.offset = c - n % boardsize if rotation else r - n // boardsize
+        self.mask = mask
+        self.ships.lift(shipID - FIRST_SHIP_ID)
+        return True
+
+    def drag(self, x, y):
+        """(Arrangement, float, float) -> bool
+        Move the ship held under canvas point x, y
+        Return True if it was redrawn"""
+
+        if self.held is None:
+            return False
+        n, k, rotation = maskPlacement(self.mask)
+        boardsize = self.state.boardsize
+        last = boardsize - k
+        r, c = self.grid.nearest(x, y)
+        if rotation:
+            c = min(max(c - self.offset, 0), last)
+        else:
+            r = min(max(r - self.offset, 0), last)
+        mask = shipMask(r * boardsize + c, k, rotation, boardsize)
+        if mask == self.mask:
+            return False
+        self.mask = mask
+        fill = CLASH if self.state.overlap(self.held, mask) else SHIP
+        self.ships.move(self.held - FIRST_SHIP_ID, mask, fill)
+        return True
+
+    def drop(self):
+        """(Arrangement) -> bool
+        Put down the ship held where it is drawn, or back where it was
+        picked up if it lies over another ship
+        Return True if the ship moved"""
+
+        if self.held is None:
+            return False
+        shipID, mask = self.held, self.mask
+        self.held = None
+        i = shipID - FIRST_SHIP_ID
+        moved = mask != self.state.ships[i] and not self.state.shots and \
+            not self.state.overlap(shipID, mask)
+        if moved:
+            self.state.moveShip(shipID, mask)
+        self.ships.move(i, self.state.ships[i])
+        return moved
+
+    def rotate(self, shipID):
+        """(Arrangement, int) -> bool
+        Turn ship shipID about its first location
+        Return False if it does not fit the board turned or the board
+        was bombed already"""
+
+        if self.held is not None or self.state.shots:
+            return False
+        i = shipID - FIRST_SHIP_ID
+        n, k, rotation = maskPlacement(self.state.ships[i])
+        if k == 1:
+            return True
+        mask = shipMask(n, k, 1 - rotation, self.state.boardsize)
+        if not mask or self.state.overlap(shipID, mask):
+            return False
+        self.state.moveShip(shipID, mask)
+        self.ships.move(i, mask)
+        return True
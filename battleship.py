@@ -1,18 +1,245 @@
 import os
 import sys
-import select
+import json
+import atexit
+import tempfile
 import random
-import Dialog
-import tkSimpleDialog
-import tkMessageBox
+import argparse
 from collections import Counter
-from Tkinter import *
+from engine import Game, BoardState, HIT, SINK, FIRST_SHIP_ID, indices
+from ai import Targeting, HARD, LEVELS
+from gamelog import GameLog
+from metrics import Metrics
+from ratings import RatingStore
+from tables import TableCache
+from endgame import EndgameSolver, BUDGET
+from worker import MoveWorker, awaitMove, awaitCall, MOVE_LIMIT
+from events import EventBus, Miss, Hit, Sink, TurnSwitch, GameOver
+from events import shotEvent, COALESCE, KEEP_ALL
+from snapshot import Session, dumpGame, loadGame, restoreTargeting
+from render import Grid, Markers, PixelBoard, Ships, animate, flash
+from render import cellSize, LARGE_BOARD, VIEWPORT, MIN_CELL, MAX_CELL
+from render import SHIP, CLASH
+from arrange import Arrangement
+from tournament import parseShips
+
+
+# ################################
+#        Constants
+# ################################
+
+# Every game is appended to this log (see gamelog.py), unless the
+# BATTLESHIP_LOG environment variable names another file or is empty
+GAME_LOG = os.path.join(os.path.expanduser('~'), '.battleship_games.log')
+
+# Results and ratings of every game are kept in this database (see
+# ratings.py), unless BATTLESHIP_DB names another file or is empty
+RATINGS_DB = os.path.join(os.path.expanduser('~'), '.battleship_stats.db')
+
+# Opening tables of the computer are cached in this directory (see
+# tables.py), unless BATTLESHIP_CACHE names another one or is empty
+TABLE_CACHE = os.path.join(os.path.expanduser('~'), '.battleship_cache')
+
+# A game left before its end is saved here to be resumed with --resume,
+# unless BATTLESHIP_SAVE names another file or is empty
+SAVE_FILE = os.path.join(os.path.expanduser('~'), '.battleship_save')
+
+# Milliseconds between the end of a turn and the next one
+TURN_DELAY = 500
+
+OPPONENTS = ('human', 'computer')
+
+# Types of text: JSON strings are unicode under Python 2
+STRING_TYPES = (str, type(u''))
+WIN_CONDITIONS = ('points', 'moves')
+
+# Settings of a game started without the dialogs, when not given
+DEFAULTS = {'names': ['Player 1', 'Player 2'],
+            'ships': {2: 1, 3: 1, 4: 1, 5: 1},
+            'boardsize': 10,
+            'opponent': 'human',
+            'level': 'hard',
+            'winCondition': 'points',
+            'seed': None,
+            'think': BUDGET,
+            'hotSeat': False}
 
 
 # ################################
 #        Functions
 # ################################
 
+def loadTk():
+    """Import Tkinter and its dialogs, only once a window is needed
+    Tkinter names become globals of this module, as with import *"""
+
+    global Dialog, tkMessageBox
+    try:
+        import Tkinter
+        import Dialog
+        import tkMessageBox
+    except ImportError:  # Python 3
+        import tkinter as Tkinter
+        import tkinter.dialog as Dialog
+        import tkinter.messagebox as tkMessageBox
+    names = dict((name, getattr(Tkinter, name)) for name in dir(Tkinter)
+                 if not name.startswith('_'))
+    globals().update(names)
+
+
+def readSettings(argv=None):
+    """(list of str) -> dict or NoneType
+    Return the settings of the game from the command line and the config
+    file it names, or None if none were given and dialogs should ask
+    Settings are usernames, shipList, boardsize, opponent (0 human,
+    1 computer), difficulty, winCondition, seed, think (seconds the
+    computer may think about a move), hotSeat (both boards in one window)
+    and game, the Game to carry on when resuming a saved one (None for a
+    new game)"""
+
+    parser = argparse.ArgumentParser(
+        description='Battleship game. Any setting skips the dialogs; '
+                    'settings left out take their default values')
+    parser.add_argument('--config', default=None,
+                        help='JSON file of settings: names, ships, '
+                             'boardsize, opponent, level, winCondition, '
+                             'seed, think, hotSeat')
+    parser.add_argument('--names', default=None,
+                        help='names of the two players, comma separated')
+    parser.add_argument('--ships', default=None,
+                        help='ships as size:number pairs, e.g. 2:1,3:1')
+    parser.add_argument('--boardsize', type=int, default=None)
+    parser.add_argument('--opponent', choices=OPPONENTS, default=None)
+    parser.add_argument('--level', choices=[l.lower() for l in LEVELS],
+                        default=None, help='strength of the computer')
+    parser.add_argument('--win-condition', choices=WIN_CONDITIONS,
+                        default=None)
+    parser.add_argument('--seed', type=int, default=None,
+                        help='seed of the ship placement')
+    parser.add_argument('--think', type=float, default=None,
+                        help='seconds the computer may think about a move '
+                             '(default: %s)' % BUDGET)
+    parser.add_argument('--hot-seat', action='store_const', const=True,
+                        default=None,
+                        help='both boards in one window, hidden by a '
+                             'curtain while the players swap seats')
+    parser.add_argument('--resume', nargs='?', const='', default=None,
+                        metavar='PATH',
+                        help='carry on the game saved on exit (default: '
+                             '$BATTLESHIP_SAVE or %s)' % SAVE_FILE)
+    args = parser.parse_args(argv)
+
+    if args.resume is not None:
+        path = args.resume or os.environ.get('BATTLESHIP_SAVE') or SAVE_FILE
+        try:
+            with open(path, 'rb') as f:
+                session = loadGame(f.read())
+        except (IOError, ValueError) as e:
+            parser.error('cannot resume from %s: %s' % (path, e))
+        if not isinstance(session, Session):
+            parser.error('%s holds no session to resume' % path)
+        os.remove(path)  # saved again if left before the end
+        game = session.game
+        return {'usernames': session.usernames, 'shipList': game.shipList,
+                'boardsize': game.boardsize, 'opponent': session.opponent,
+                'difficulty': session.difficulty,
+                'winCondition': game.winCondition, 'seed': session.seed,
+                'think': args.think or BUDGET,
+                'hotSeat': bool(args.hot_seat),
+                'messages': session.messages, 'game': game}
+
+    given = {}
+    if args.config:
+        try:
+            with open(args.config) as f:
+                given.update(json.load(f))
+        except (IOError, ValueError) as e:
+            parser.error('cannot read %s: %s' % (args.config, e))
+    flags = {'names': args.names, 'ships': args.ships,
+             'boardsize': args.boardsize, 'opponent': args.opponent,
+             'level': args.level, 'winCondition': args.win_condition,
+             'seed': args.seed, 'think': args.think,
+             'hotSeat': args.hot_seat}
+    given.update((k, v) for k, v in flags.items() if v is not None)
+    if not given:
+        return None
+
+    unknown = set(given) - set(DEFAULTS)
+    if unknown:
+        parser.error('unknown settings: %s' % ', '.join(sorted(unknown)))
+    settings = dict(DEFAULTS)
+    settings.update(given)
+    try:
+        names = settings['names']
+        if isinstance(names, STRING_TYPES):
+            names = names.split(',')
+        ships = settings['ships']
+        if isinstance(ships, STRING_TYPES):
+            ships = parseShips(ships)
+        shipList = dict((int(k), int(v)) for k, v in ships.items())
+        boardsize = int(settings['boardsize'])
+        opponent = OPPONENTS.index(settings['opponent'])
+        difficulty = [l.lower() for l in LEVELS].index(settings['level'])
+        winCondition = WIN_CONDITIONS.index(settings['winCondition'])
+        think = float(settings['think'])
+    except (ValueError, TypeError, AttributeError) as e:
+        parser.error('invalid settings: %s' % e)
+
+    # Same rules as the input form
+    if len(names) != 2:
+        parser.error('two names are needed')
+    if boardsize < 2:
+        parser.error('Size of board must be greater than 1')
+    if not shipList or min(shipList) < 1:
+        parser.error('Size of ship must be atleast 1')
+    if min(shipList.values()) < 1:
+        parser.error('Number of ships must be atleast 1')
+    if think <= 0:
+        parser.error('Thinking time must be positive')
+    if opponent == 1 and 'names' not in given:
+        names = ['Player', 'Computer']
+
+    return {'usernames': [name.strip() if isinstance(name, STRING_TYPES)
+                          else str(name) for name in names],
+            'shipList': shipList, 'boardsize': boardsize,
+            'opponent': opponent, 'difficulty': difficulty,
+            'winCondition': winCondition, 'seed': settings['seed'],
+            'think': think, 'hotSeat': bool(settings['hotSeat']),
+            'game': None}
+
+
+def askSettings():
+    """Return the settings of the game asked with the input form and
+    dialogs (see readSettings)"""
+
+    showDialogBox("Battleship Game!\n\nCreated by:\nAjit Pawar\n(c) 2012")
+
+    # Display user-input Form
+    root1 = Tk()
+    form = inputForm(root1)
+    root1.protocol('WM_DELETE_WINDOW', clickOverride)
+    root1.mainloop()
+    root1.withdraw()
+
+    # Retrieve user-supplied values from Form
+    usernames = form.usernames
+    opponent = askOpponentType()
+    winCondition = askWinCondition()
+    difficulty = HARD
+    if opponent == 1:
+        usernames[0] = 'Player'
+        usernames[1] = 'Computer'
+        difficulty = askDifficulty()
+
+    showDialogBox("Let's Play Battleship!\n\n%s\n   " \
+    "vs\n%s\n\nGood Luck!" % (usernames[0], usernames[1]))
+
+    return {'usernames': usernames, 'shipList': form.shipList,
+            'boardsize': form.boardsize, 'opponent': opponent,
+            'difficulty': difficulty, 'winCondition': winCondition,
+            'seed': None, 'think': BUDGET, 'hotSeat': False, 'game': None}
+
+
 def showDialogBox(mssg, icon="info", type="ok", default="ok"):
     """Return a pop-up dialog box containing message mssg"""
 
@@ -25,11 +252,14 @@ def clickOverride():
     pass
 
 
-def exitConfirm():
-    """Display pop-up dialog box to confirm game exit"""
+def exitConfirm(players=None):
+    """Display pop-up dialog box to confirm game exit
+    The game of players is saved to be resumed, if it is not over"""
 
     confirm = showDialogBox('Exit the game now?', 'question', 'yesno', 'no')
     if confirm == 'yes':
+        if players is not None:
+            players.save()
         raise SystemExit
 
 
@@ -55,6 +285,38 @@ def askWinCondition():
     return winCondition
 
 
+def askDifficulty():
+    """Return user's choice of how strong the computer plays"""
+
+    difficulty = Dialog.Dialog(None, {'title': 'Battleship',
+        'text': 'Choose the difficulty',
+        'bitmap': 'question',
+        'default': HARD,
+        'strings': LEVELS}).num
+    return difficulty
+
+
+def instrumentGame(registry):
+    """(Metrics) -> NoneType
+    Time the hot paths of the game in registry and keep count of the
+    items on every board's canvas after each shot"""
+
+    def countItems(board, *args):
+        registry.gauge('canvas_items', len(board.canvas.find_all()),
+                       board=board.playerNumber)
+
+    for name in ('fire', 'computer_fire', 'placeShips', 'dragShip'):
+        registry.instrument(Board, name)
+    registry.instrument(Board, 'bomb', after=countItems)
+    registry.instrument(Targeting, 'choose', 'computer_choose')
+    registry.instrument(Players, 'switchTurn')
+    registry.instrument(Players, 'endOfTurn')
+    registry.instrument(HotSeat, 'flip', 'hot_seat_flip')
+    registry.instrument(EventBus, 'publish', 'event_publish')
+    registry.instrument(EventBus, 'pump', 'event_pump')
+    registry.instrumentPlacement()
+
+
 # ################################
 #        Classes
 # ################################
@@ -115,7 +377,9 @@ class inputForm(object):
         mssg3 = "\n\nWin by moves:\nWinner is declared by " \
                 "calculating\naverage hits per move. The more\n" \
                 "your hits, the higher your average"
-        Label(Help, text=mssg1 + mssg2 + mssg3).grid(row=0)
+        mssg4 = "\n\nPlacing ships:\nDrag a ship to move it and " \
+                "right-click\nit to turn it, then press Done"
+        Label(Help, text=mssg1 + mssg2 + mssg3 + mssg4).grid(row=0)
 
         # Submit button
         btn = Button(Part3, text="Submit", command=self.validateForm)
@@ -161,273 +425,421 @@ class inputForm(object):
                 self.shipList = {2: 1, 3: 1, 4: 1, 5: 1}
 
         except ValueError as ve:
-            showDialogBox(ve.message)
+            showDialogBox(str(ve))
         else:
             self.root.quit()
 
 
+class HotSeat(object):
+    """Both widgets of the game as frames stacked in one window
+    Turns are switched by raising the frame of the player to move over
+    the other, both boards staying drawn; a curtain hides them while
+    the players swap seats"""
+
+    def __init__(self, window):
+        """(HotSeat, widget) -> NoneType
+        Stack two frames and the curtain in window"""
+
+        self.window = window
+        self.frames = [Frame(window), Frame(window)]
+        self.titles = {}  # frame -> window title while it is on top
+        self.current = None  # frame on top, or behind the curtain
+
+        # Created last, so above the frames until one is raised
+        self.curtain = Frame(window, background='black')
+        self.notice = Label(self.curtain, background='black',
+                            foreground='white', font='Helvetica 16')
+        self.notice.pack(side=TOP, expand=TRUE, anchor=S, pady=5)
+        self.ready = Button(self.curtain, text='Ready')
+        self.ready.pack(side=TOP, expand=TRUE, anchor=N, pady=5)
+        for widget in self.frames + [self.curtain]:
+            widget.grid(row=0, column=0, sticky='nsew')
+
+    def title(self, frame, text):
+        """(HotSeat, widget, str) -> NoneType
+        Title the window with text while frame is on top"""
+
+        self.titles[frame] = text
+        if frame is self.current:
+            self.window.title(text)
+
+    def show(self, frame, curtain=None, then=None):
+        """(HotSeat, widget, str, function) -> NoneType
+        Raise frame and call then(); if curtain is given, the curtain
+        reads it and frame is only raised once Ready is pressed"""
+
+        self.current = frame
+        if curtain is None:
+            self.flip(frame)
+            if then is not None:
+                then()
+            return
+
+        def seated():
+            self.flip(frame)
+            if then is not None:
+                then()
+
+        self.notice.config(text=curtain)
+        self.ready.config(command=seated)
+        self.curtain.tkraise()
+        self.window.title(curtain)
+
+    def flip(self, frame):
+        """(HotSeat, widget) -> NoneType
+        Raise frame over the other and the curtain"""
+
+        self.current = frame
+        frame.tkraise()
+        self.window.title(self.titles.get(frame, ''))
+
+    def showBoth(self):
+        """(HotSeat) -> NoneType
+        Lay out both frames side by side, once the game is over"""
+
+        self.curtain.grid_remove()
+        self.frames[1].grid(row=0, column=1, sticky='nsew')
+        self.window.title('Battleship')
+
+
 class Players(object):
     """Class for players of the game"""
 
-    def __init__(self, frame1, frame2, usernames, winCondition):
-        """(Players, widget, widget, list of str, int) -> NoneType """
+    def __init__(self, frame1, frame2, usernames, game, difficulty=HARD,
+                 seed=None, log=None, store=None, tables=None,
+                 savePath=None, resumed=False, think=BUDGET, hotSeat=None):
+        """(Players, widget, widget, list of str, Game, int, int, GameLog,
+        RatingStore, TableCache, str, bool, float, HotSeat) -> NoneType
+        Ships are placed from seed (default: a random one) so that the
+        game can be recorded in log and reproduced
+        The result of the game is saved in store, and a hard computer
+        opens from the tables cached in tables, if given
+        A game left before its end is saved to savePath; resumed games
+        already have their ships placed and shots fired
+        The computer thinks about its moves in a worker thread for up to
+        think seconds
+        The widgets are frames of hotSeat in hot-seat mode, otherwise
+        windows of their own"""
 
         self.frame1 = frame1
         self.frame2 = frame2
         self.usernames = usernames
-        self.winCondition = winCondition
-        self.tracker = None
+        self.game = game
+        self.winCondition = game.winCondition
+        self.difficulty = difficulty  # strength of a computer opponent
         self.message = {0: None, 1: None}
-        self.score = [0, 0]
-        self.moves = [[0], [0]]
+        if seed is None:
+            seed = random.getrandbits(63)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.log = log
+        self.logStarted = False  # game recorded in log
+        self.store = store
+        self.tables = tables
+        self.savePath = savePath
+        self.resumed = resumed
+        self.think = think
+        self.worker = None  # MoveWorker, started by the computer's move
+        self.hotSeat = hotSeat
+
+        # Events of the game are handed out from the Tk loop once the
+        # shooter's turn is over. Only the latest sinking is announced
+        self.events = EventBus(lambda pump: frame1.after(0, pump))
+        self.events.subscribe(self.announce, (Sink,), policy=COALESCE)
+        if log is not None:
+            self.events.subscribe(self.logEvent, (Miss, Hit, Sink, GameOver),
+                                  policy=KEEP_ALL)
+        if store is not None:
+            self.events.subscribe(self.rateGame, (GameOver,),
+                                  policy=KEEP_ALL)
+
+        # Board widgets indexed by the player who bombs them
+        # boards[0] shows player 2's ships and is bombed by player 1
+        self.boards = [None, None]
+
+    def onTop(self):
+        """(Players) -> widget
+        Return the widget on screen, or behind the hot-seat curtain"""
+
+        if self.hotSeat is not None:
+            return self.hotSeat.current
+        if self.frame1.state() == 'normal':
+            return self.frame1
+        return self.frame2
+
+    def show(self, frame, player, then=None):
+        """(Players, widget, int, function) -> NoneType
+        Put widget frame on screen for player, then call then()
+        In hot-seat mode the curtain is drawn until player is seated,
+        unless the opponent is the computer"""
+
+        if self.hotSeat is not None:
+            curtain = None
+            if self.boards[0].isComputer == 0:
+                curtain = "Pass to %s" % self.usernames[player]
+            self.hotSeat.show(frame, curtain, then)
+            return
+
+        other = self.frame2 if frame is self.frame1 else self.frame1
+        frame.deiconify()
+        other.withdraw()
+        self.frame1.update()
+        self.frame2.update()
+        if then is not None:
+            then()
+
+    def setTitles(self):
+        """(Players) -> NoneType
+        Title each widget with the turn it is shown for"""
+
+        titles = ((self.frame1, "%s's turn" % self.usernames[1]),
+                  (self.frame2, "%s's turn" % self.usernames[0]))
+        for frame, text in titles:
+            if self.hotSeat is not None:
+                self.hotSeat.title(frame, text)
+            else:
+                frame.title(text)
 
     def updateWidget(self):
         """(Players) -> NoneType
         Update title of the widget to display current player's turn"""
 
-        if self.frame1.state() == 'normal':
-            self.frame2.deiconify()
-            self.frame1.withdraw()
-        else:
-            self.frame2.withdraw()
-            self.frame2.update()
-            self.frame2.deiconify()
-            self.frame1.title("%s's turn" % self.usernames[1])
-            self.frame2.title("%s's turn" % self.usernames[0])
-            showDialogBox("%s's turn first!" % self.usernames[0])
+        if self.onTop() is self.frame1:
+            self.show(self.frame2, 1)
+            return
+
+        self.setTitles()
+        if self.hotSeat is not None:
+            self.show(self.frame2, 0)
+            return
+        self.frame2.withdraw()
+        self.frame2.update()
+        self.frame2.deiconify()
+        showDialogBox("%s's turn first!" % self.usernames[0])
         self.frame1.update()
         self.frame2.update()
 
+    def resume(self):
+        """(Players) -> NoneType
+        Carry on a resumed game from the turn it was saved at"""
+
+        self.setTitles()
+
+        # switchTurn shows the widget other than the one on screen
+        if self.game.turn == 0:
+            shown, hidden = self.frame1, self.frame2
+        else:
+            shown, hidden = self.frame2, self.frame1
+        if self.hotSeat is not None:
+            self.hotSeat.current = shown
+        else:
+            shown.deiconify()
+            hidden.withdraw()
+        self.switchTurn()
+
+    def save(self):
+        """(Players) -> bool
+        Write the game in progress to savePath, to be resumed later
+        Return False if there was nothing to save"""
+
+        game = self.game
+        if not self.savePath or game.over or \
+           not (game.boards[0].shots or game.boards[1].shots):
+            return False
+        self.events.pump()  # announcements not handed out yet
+        session = Session(game, self.usernames, self.boards[0].isComputer,
+                          self.difficulty, self.seed, self.message)
+        directory = os.path.dirname(os.path.abspath(self.savePath))
+        handle, temporary = tempfile.mkstemp(dir=directory)
+        with os.fdopen(handle, 'wb') as f:
+            f.write(dumpGame(game, session))
+        os.rename(temporary, self.savePath)
+        return True
+
+    def announce(self, event):
+        """(Players, Sink) -> NoneType
+        Keep the news of a sunk ship for its owner's next turn"""
+
+        owner = 1 - event.player
+        self.message[owner] = '%s,\nYour ship of size %s was sunk by enemy' \
+            % (self.usernames[owner], event.shot.size)
+
+    def logEvent(self, event):
+        """(Players, event) -> NoneType
+        Record a shot in the game log, flushing it once the game is over"""
+
+        # Ships may be moved by hand until the first shot
+        if not self.logStarted:
+            self.log.startGame(self.game, self.seed)
+            self.logStarted = True
+        if isinstance(event, GameOver):
+            self.log.flush()
+        else:
+            self.log.shot(event.player, event.shot)
+
+    def rateGame(self, event):
+        """(Players, GameOver) -> NoneType
+        Save the result of the game and update the ratings"""
+
+        self.store.recordGame(self.usernames, self.game)
+        self.store.flush()
+
     def switchTurn(self):
         """(Players) -> NoneType
         Switch turns between the two players
         Switch between widgets belonging to the respective players"""
 
         # Widget for player 1
-        if self.frame1.state() == 'normal':
-            self.frame2.deiconify()
-            self.frame1.withdraw()
-            self.frame1.update()
-            self.frame2.update()
-            if self.message[0]:
-                showDialogBox(self.message[0])  # announce
-                self.message[0] = None
-            game2.canvas.tag_bind('square', '<Button-1>', game2.fire)
+        if self.onTop() is self.frame1:
+            self.show(self.frame2, 0, lambda: self.beginTurn(0))
 
         # Widget for player 2
         else:
-            self.frame1.deiconify()
-            self.frame2.withdraw()
-            self.frame1.update()
-            self.frame2.update()
-            if game2.isComputer == 1:
-                self.frame1.after(500)
-                game1.computer_fire()
-            else:
-                if self.message[1]:
-                    showDialogBox(self.message[1])  # announce
-                    self.message[1] = None
-                game1.canvas.tag_bind('square', '<Button-1>', game1.fire)
+            self.show(self.frame1, 1, lambda: self.beginTurn(1))
 
-    def endOfTurn(self, tracker):
-        """(Players, dict) -> NoneType
+    def beginTurn(self, player):
+        """(Players, int) -> NoneType
+        Let player bomb, once their widget is on screen"""
+
+        if player == 1 and self.boards[0].isComputer == 1:
+            self.boards[1].computer_fire()
+            return
+        if self.message[player]:
+            showDialogBox(self.message[player])  # announce
+            self.message[player] = None
+        board = self.boards[player]
+        board.canvas.tag_bind('square', '<Button-1>', board.fire)
+
+    def endOfTurn(self):
+        """(Players) -> NoneType
         Check for a winner after each turn and declare him if available
         Calculate player scores and winning margin"""
 
-        # Get status on whether all ships have been sunk
-        win = self.checkForWin(tracker)
+        if not self.game.over:
+            self.events.publish(TurnSwitch(self.game.turn))
+            self.frame1.after(TURN_DELAY, self.switchTurn)
+            return
 
-        if not win:
-            if self.frame1.state() == 'normal':
-                battleships = game1
-            else:
-                battleships = game2
-            self.frame1.after(500)
-            self.switchTurn()
+        # Scores are kept up to date by the engine as shots are fired
+        # The result is saved before the ratings are shown
+        scoreboard = self.game.scoreboard
+        text = scoreboard.rule.unit
+        score = scoreboard.scores()
+        self.events.publish(GameOver(score, self.game.winner()))
+        self.events.pump()
+
+        # Player with the highest score is the winner
+        index = score.index(max(score))
+        winner = self.usernames[index]
+        margin = scoreboard.margin()
+
+        # Prepare scorecard
+        mssg0 = "Congratulations, %s wins!" % self.usernames[index]
+        mssg1 = "Scorecard:\n\n%s's score: %s  %s\n" \
+           "%s's score: %s  %s\n\n" % (self.usernames[0], score[0],\
+            text, self.usernames[1], score[1], text)
+        mssg2 = "%s wins by a margin of  %s %s" % (winner, margin, text)
+
+        if self.game.winner() is None:
+            mssg0 = "It's a draw!"
+            mssg2 = ""
+
+        # Show the new ratings; a game between two players of one name
+        # is not rated
+        if self.store is not None:
+            ratings = [self.store.rating(name) for name in self.usernames]
+            mssg2 += "\n\nRatings: %s" % ", ".join(
+                "%s %s" % (name, "unrated" if rating is None
+                           else "%d" % rating)
+                for name, rating in zip(self.usernames, ratings))
+
+        # Reveal ship positions for both players
+        for board in self.boards:
+            board.canvas.tag_raise('ship', 'square')
+            board.canvas.tag_raise('text')
+
+        # Display scorecard
+        showDialogBox(mssg0)
+        if self.hotSeat is not None:
+            self.hotSeat.showBoth()
         else:
-
-            # Calculate scores
-            if self.winCondition:
-                text = 'hits per move'
-                for i in range(2):
-                    if len(self.moves[i]) == 1:
-                        continue
-                    total = self.moves[i][0]
-                    for n in self.moves[i][1:]:
-                        total += n
-                    avg = float(len(self.moves[i]) - 1) / total
-                    self.score[i] = float('%.2f' % avg)
-            else:
-                text = 'points'
-
-            # Player with the highest score is the winner
-            index = self.score.index(max(self.score))
-            winner = self.usernames[index]
-            margin = max(self.score) - min(self.score)
-
-            # Prepare scorecard
-            mssg0 = "Congratulations, %s wins!" % self.usernames[index]
-            mssg1 = "Scorecard:\n\n%s's score: %s  %s\n" \
-               "%s's score: %s  %s\n\n" % (self.usernames[0], self.score[0],\
-                text, self.usernames[1], self.score[1], text)
-            mssg2 = "%s wins by a margin of  %s %s" % (winner, margin, text)
-
-            if self.score[0] == self.score[1]:
-                mssg0 = "It's a draw!"
-                mssg2 = ""
-
-            # Reveal ship positions for both players
-            game1.canvas.tag_raise('ship', 'square')
-            game2.canvas.tag_raise('ship', 'square')
-            game1.canvas.tag_raise('text')
-            game2.canvas.tag_raise('text')
-
-            # Display scorecard
-            showDialogBox(mssg0)
             self.frame1.deiconify()
             self.frame2.deiconify()
-            showDialogBox(mssg1 + mssg2)
-            showDialogBox("End of game!\n\n" \
-            "Here are the board setups for both players")
-
-    def checkForWin(self, tracker):
-        """(Players, dict) -> int
-        Return True if all ships have been sunk, False otherwise"""
-
-        # Check damage levels for all ships in the tracker
-        # 0 = Fully damaged (sunk), Non-zero otherwise
-        for i in tracker.values():
-            if i != 0:
-                break
-        else:
-            return True
-        return False
+        showDialogBox(mssg1 + mssg2)
+        showDialogBox("End of game!\n\n" \
+        "Here are the board setups for both players")
 
 
 class Board(object):
     """Class representing board used in the game"""
 
-    def __init__(self, frame, players, shipList, boardsize, opponent, number):
-        """(Board, widget, Players, dict, int, int, int) -> NoneType """
+    def __init__(self, frame, players, opponent, number):
+        """(Board, widget, Players, int, int) -> NoneType
+        Draw the board bombed by player number, owned by the other player"""
 
         self.myframe = frame
         self.players = players
-        self.shipList = shipList
-        self.boardsize = boardsize
         self.isComputer = opponent  # 0 human, 1 computer
         self.playerNumber = number
-        self.shipID = 101  # Every ship is identified by an id
         self.exitstatus = 0
+        self.players.boards[number] = self
+        self.ai = None  # computer's view of this board, once it fires
 
-        # List representing every attacked location on the board
-        # 0 = not attacked yet, 1 = attacked
-        self.hit = [0 for i in range(pow(self.boardsize, 2))]
+        # Ships, shots and damage live in the headless engine
+        self.state = players.game.target(number)
+        self.boardsize = self.state.boardsize
 
-        # Keeps track of ships alongwith their original sizes
-        # As ships are hit, their size in tracker will be decremented
-        # Size of zero represents sunk ship
-        # Example: {101:5, 102:0, 103:7, 104:1, 105:0}
-        # So, ships with id "102" and "105" have been sunk
-        self.tracker = {}
-
-        # Create canvas
+        # Create canvas, scrolling once the board outgrows the viewport
+        self.grid = Grid(self.boardsize, cellSize(self.boardsize))
+        width, height = self.grid.extent()
         self.canvas = Canvas(\
             self.myframe, background='white', highlightthickness=0,\
-            width=pow(self.boardsize, 2) + 140,\
-            height=pow(self.boardsize, 2) + 160)
+            width=min(width, VIEWPORT), height=min(height, VIEWPORT),\
+            scrollregion=(0, 0, width, height))
+        self.large = self.boardsize > LARGE_BOARD
+        if self.large or max(width, height) > VIEWPORT:
+            xscroll = Scrollbar(self.myframe, orient=HORIZONTAL,\
+                                command=self.canvas.xview)
+            yscroll = Scrollbar(self.myframe, orient=VERTICAL,\
+                                command=self.canvas.yview)
+            xscroll.pack(side=BOTTOM, fill=X)
+            yscroll.pack(side=RIGHT, fill=Y)
+            self.canvas.config(xscrollcommand=xscroll.set,\
+                               yscrollcommand=yscroll.set)
+        if self.large:
+            self.canvas.bind('<Control-Button-4>', lambda e: self.zoom(2))
+            self.canvas.bind('<Control-Button-5>', lambda e: self.zoom(0.5))
+            self.canvas.bind('<Control-MouseWheel>',\
+                lambda e: self.zoom(2 if e.delta > 0 else 0.5))
         self.canvas.pack(fill=BOTH, expand=TRUE)
 
-        # Draw board on canvas
-        self.squares = []
-        for y in xrange(self.boardsize):
-            for x in xrange(self.boardsize):
-                self.squares.append(self.canvas.create_rectangle(\
-                x * 20 + 20, y * 20 + 40, x * 20 + 40, y * 20 + 60, \
-                fill='#0055ff', width=2))
-                self.canvas.addtag_withtag('square', self.squares[-1])
+        # Draw board on canvas: one image for large boards, otherwise
+        # a rectangle per location
+        if self.large:
+            self.markers = PixelBoard(self.canvas, self.grid, PhotoImage)
+        else:
+            self.markers = Markers(self.canvas, self.grid)
 
         self.placeShips()
 
     def placeShips(self):
         """(Board) -> NoneType
-        Randomly place each ship on the board in 20 attempts
+        Randomly place each ship on the board and draw them; the hard
+        computer then hides its own ships in one of its fleet layouts
+        (see hideShips), and users may move theirs until they are done
         Announce failures in placing ships to the user"""
 
-        self.ships = []  # Canvas co-ordinates for the ships
+        self.ships = []  # Canvas rectangles of the ships
         self.shipText = []  # Text to be displayed besides each ship
-        self.failedAttempts = []
-        self.names = {2: 'BOAT', 3: 'SUB', 4: 'CRUISER', 5: 'CARRIER'}
-
-        items = self.shipList.items()
-        for k, v in items:
-            for i in range(v):   # for every ship v of size k
-                attempts = 20
-                success = False
-                while not success and attempts > 0:
-                    success = True
-                    n = random.randrange(0, len(self.hit))
-                    shipRotation = random.randrange(0, 2)
-                    attempts -= 1
-
-                    # Check if ship fits horizontally
-                    if shipRotation != 0:
-                        for j in range(n, n + k):
-                            if (j >= len(self.hit)) or (j % self.boardsize \
-                                < n % self.boardsize) or (self.hit[j] != 0):
-                                success = False
-                                break
-                    # Check if ship fits vertically
-                    else:
-                        for j in range(n, n + k * self.boardsize, \
-                                       self.boardsize):
-                            if (j >= len(self.hit)) or (self.hit[j] != 0):
-                                success = False
-                                break
-
-                # Keep track of ships that failed to be placed
-                if attempts == 0:
-                    self.failedAttempts.append(k)
-                    continue
-
-                # Ships of custom sizes above 5 are named "BATTLESHIP"
-                name = 'BATTLESHIP'
-                if k in self.names:
-                    name = self.names[k]
-
-                x = n % self.boardsize * 20 + 20
-                y = (n / self.boardsize) * 20 + 40
-
-                # Place ship horizontally
-                if shipRotation != 0:
-                    for i in range(n, n + k):
-                        self.hit[i] = self.shipID
-                    self.ships.append(self.canvas.create_rectangle(\
-                    x, y + 5, x + k * 20, y + 15, fill='orange', width=1))
-                    self.shipText.append(self.canvas.create_text(\
-                    x + 20, y, text=name, font='Courier 6', fill='yellow'))
-
-                # Place ship vertically
-                else:
-                    for i in range(n, n + k * self.boardsize, self.boardsize):
-                        self.hit[i] = self.shipID
-                    self.ships.append(self.canvas.create_rectangle(\
-                    x + 5, y, x + 15, y + k * 20, fill='orange', width=1))
-                    cname = ""
-                    for ch in name:
-                        cname += ch + '\n'
-                    self.shipText.append(self.canvas.create_text(\
-                    x, y + 20, text=cname, font='Courier 6', fill='yellow'))
-
-                # Tag every placed ship with "tagXXX" where XXX is shipID
-                # Will be used to identify which ship was bombed
-                self.canvas.addtag_withtag('tag%s' % \
-                                      self.shipID, self.ships[-1])
-                self.canvas.addtag_withtag('ship', self.ships[-1])
-                self.tracker[self.shipID] = k
-                self.shipID += 1
 
         # Announce any failures in placing ships
         # Game will exit after user is notified of this failure
+        # Ships of a resumed game are already in place
+        self.failedAttempts = []
+        hide = self.isComputer == 1 and self.players.difficulty == HARD \
+            and self.players.tables is not None and not self.state.ships
+        if not self.state.ships:
+            self.failedAttempts = self.state.placeShips(self.players.rng)
         if self.failedAttempts:
             mssg = "Oops, we failed to fit the " \
                     "following ships on this board:\n\n"
@@ -440,33 +852,88 @@ class Board(object):
             self.exitstatus = 1
             return
 
-        # 'tracker' will be modified throughout the game, so keep a copy
-        self.counter_copy = self.tracker.copy()
-        self.players.tracker = self.tracker
+        # Tag every placed ship with "tagXXX" where XXX is shipID
+        # Will be used to identify which ship was bombed
+        self.drawing = Ships(self.canvas, self.grid, self.state.ships)
+        self.ships = self.drawing.rects
+        self.shipText = self.drawing.names
+        for i, item in enumerate(self.ships):
+            self.canvas.addtag_withtag('tag%s' % (FIRST_SHIP_ID + i), item)
 
         for i in self.ships:
             self.canvas.addtag_withtag('ship', i)
         for i in self.shipText:
             self.canvas.addtag_withtag('text', i)
-        for i in range(self.shipID - 100):
-            self.ships.append(None)
-            self.shipText.append(None)
 
-        if self.isComputer == 1:
+        if self.players.resumed:
+            self.restore()
+        elif self.isComputer == 1:
             self.canvas.tag_lower('ship')
             self.canvas.tag_lower('text')
             self.canvas.tag_bind('square', '<Button-1>', self.fire)
+
+            # Racing the layouts takes a second or so on a cache miss:
+            # it runs in a thread while the random layout stands in
+            if hide:
+                awaitCall(self.myframe, self.players.tables.fleet,
+                          (self.state.shipList, self.boardsize),
+                          self.hideShips)
         else:
+            # Ships can be dragged and turned until the user is done
+            self.arrangement = Arrangement(self.state, self.grid,
+                                           self.drawing)
+            self.canvas.bind('<ButtonPress-1>', self.grabShip)
+            self.canvas.bind('<B1-Motion>', self.dragShip)
+            self.canvas.bind('<ButtonRelease-1>', self.dropShip)
+            self.canvas.bind('<Button-3>', self.rotateShip)
             self.clickDone = Button(self.myframe, text='Done',\
                                     command=self.clickDone)
             self.clickDone.place(x=1, y=1)
 
+    def grabShip(self, event):
+        """(Board, event) -> NoneType
+        Pick up the ship that user pressed the mouse on"""
+
+        self.arrangement.grab(self.canvas.canvasx(event.x),
+                              self.canvas.canvasy(event.y))
+
+    def dragShip(self, event):
+        """(Board, event) -> NoneType
+        Move the ship picked up with the mouse"""
+
+        self.arrangement.drag(self.canvas.canvasx(event.x),
+                              self.canvas.canvasy(event.y))
+
+    def dropShip(self, event):
+        """(Board, event) -> NoneType
+        Put down the ship picked up once the mouse is released"""
+
+        self.arrangement.drop()
+
+    def rotateShip(self, event):
+        """(Board, event) -> NoneType
+        Turn the ship that user right-clicked on, flashing it if it
+        does not fit turned"""
+
+        arrangement = self.arrangement
+        shipID = arrangement.shipAt(self.canvas.canvasx(event.x),
+                                    self.canvas.canvasy(event.y))
+        if shipID is None or arrangement.held is not None:
+            return
+        if not arrangement.rotate(shipID):
+            flash(self.myframe, self.canvas,
+                  self.ships[shipID - FIRST_SHIP_ID], (CLASH, SHIP), 2, 100)
+
     def clickDone(self):
         """(Board) -> NoneType
         Proceed with the game once user is done placing ships"""
 
-        # Hide done button
+        # Hide done button; ships stay where they are
         self.clickDone.place_forget()
+        for sequence in ('<ButtonPress-1>', '<B1-Motion>',
+                         '<ButtonRelease-1>', '<Button-3>'):
+            self.canvas.unbind(sequence)
+        self.arrangement = None
 
         # Hide all ships and their names
         self.canvas.tag_lower('ship')
@@ -476,12 +943,55 @@ class Board(object):
 
         # If opponent is computer, unbind left-click trigger
         # This prevents user from left-clicking
-        if game2.isComputer == 1:
+        if self.players.boards[0].isComputer == 1:
             self.canvas.tag_unbind('square', '<Button-1>')
-            self.players.frame1.title("%s's turn" % self.players.usernames[1])
-            self.players.frame2.title("%s's turn" % self.players.usernames[0])
+            self.players.setTitles()
             showDialogBox("%s's turn first" % self.players.usernames[0])
 
+    def hideShips(self, layouts):
+        """(Board, FleetLayouts) -> NoneType
+        Move the ships to a random one of layouts, if any, unless the
+        board was bombed already"""
+
+        if layouts is None or self.state.shots:
+            return
+        hidden = BoardState(self.state.shipList, self.boardsize)
+        layouts.place(hidden, self.players.rng)
+        self.state.ships[:] = hidden.ships
+        self.state.occupied = hidden.occupied
+        for i, mask in enumerate(self.state.ships):
+            self.drawing.move(i, mask)
+
+    def restore(self):
+        """(Board) -> NoneType
+        Draw every shot of a resumed game in one pass, with the ships
+        hidden but for those already sunk"""
+
+        self.canvas.tag_lower('ship')
+        self.canvas.tag_lower('text')
+        state = self.state
+        self.markers.showAll(dict(
+            (n, ('O', 'red') if state.occupied >> n & 1 else ('X', 'yellow'))
+            for n in indices(state.shots)))
+        for shipID, n, k, shipRotation in state.placements():
+            if state.isSunk(shipID):
+                self.canvas.tag_raise('tag%s' % shipID, 'square')
+
+    def zoom(self, factor):
+        """(Board, float) -> NoneType
+        Scale the board by factor, keeping squares between MIN_CELL
+        and MAX_CELL pixels"""
+
+        cell = max(MIN_CELL, min(MAX_CELL, int(self.grid.cell * factor)))
+        if cell == self.grid.cell:
+            return
+        ratio = float(cell) / self.grid.cell
+        self.canvas.scale('all', self.grid.left, self.grid.top, ratio, ratio)
+        self.grid.cell = cell
+        self.markers.rescale(cell)
+        width, height = self.grid.extent()
+        self.canvas.config(scrollregion=(0, 0, width, height))
+
     def fire(self, event):
         """(Board, event) -> NoneType
         Bomb the location that user clicked on"""
@@ -489,136 +999,85 @@ class Board(object):
         # Unbind left-click to prevent user from bombing
         # multiple locations at once
         self.canvas.tag_unbind('square', '<Button-1>')
-        self.canvas.update()
 
-        # Get co-ordinates of the square that was clicked
-        n = self.canvas.find_closest(event.x, event.y)
-        n = int(n[0]) - 1
-        try:
-            coords = self.canvas.coords(self.squares[n])
-            coords[0], coords[1], coords[2], coords[3]
-            if self.hit[n] == 5:  # Location already bombed
-                raise IndexError
-        except IndexError:
+        # Work out the square that was clicked from its position
+        n = self.grid.cellAt(self.canvas.canvasx(event.x),
+                             self.canvas.canvasy(event.y))
+        if n is None or self.state.isBombed(n):  # Location already bombed
             self.canvas.tag_bind('square', '<Button-1>', self.fire)
         else:
             self.bomb(n)
 
     def computer_fire(self):
-        """(Board, mouse event) -> NoneType
-        Randomly fire on a new location"""
-
-        # Check tracker to see if previous attempt was a hit
-        # If yes, continue to bomb rest of the ship first
-        for shipID, size in self.tracker.items():
-            if (size != 0) and (self.counter_copy[shipID] != size):
-                for n in range(len(self.hit)):
-                    if self.hit[n] == shipID:
-                        self.bomb(n)
-                        return
-
-        # Else, randomly fire on a new location
-        n = random.randrange(0, len(self.hit))
-        while self.hit[n] == 5:
-            n = random.randrange(0, len(self.hit))
-        self.bomb(n)
+        """(Board) -> NoneType
+        Have the computer choose a location in the worker thread, and
+        fire on it from the Tk loop once chosen"""
+
+        if self.ai is None:
+            opening = endgame = None
+            if self.players.difficulty == HARD:
+                endgame = EndgameSolver(budget=self.players.think)
+                if self.players.tables is not None:
+                    opening = self.players.tables.opening(
+                        self.state.shipList, self.boardsize)
+            if self.state.shots:  # Resumed game
+                self.ai = restoreTargeting(self.state,
+                                           self.players.difficulty,
+                                           self.players.rng, opening,
+                                           endgame)
+            else:
+                self.ai = Targeting(self.state.shipList, self.boardsize,
+                                    self.players.difficulty,
+                                    self.players.rng, opening, endgame)
+        if self.players.worker is None:
+            self.players.worker = MoveWorker()
+        awaitMove(self.myframe, self.players.worker, self.ai, self.bomb,
+                  TURN_DELAY, limit=max(MOVE_LIMIT, self.players.think))
 
     def bomb(self, index):
         """(Board, int) -> NoneType
         Bomb the square on the board at location index
-        Display visually if the location is a hit, sink or a miss"""
-
-        coords = self.canvas.coords(self.squares[index])
-        x, y = coords[0] + 10, coords[1] + 10
-        tag = self.hit[index]
-
-        # Count moves for player (used for scoring)
-        if self.players.winCondition == 1:
-            self.players.moves[self.playerNumber][0] += 1
-
-        # Hit
-        if tag != 0:
-            self.tracker[tag] -= 1
-
-            # Count moves for player (used in scoring)
-            if self.players.winCondition == 1:
-                self.players.moves[self.playerNumber].append(\
-                    self.players.moves[self.playerNumber][0])
-                self.players.moves[self.playerNumber][0] = 0
-
-            # Ship was sunk
-            if self.tracker[tag] == 0:
-                text = []
-                tagname = 'tag%s' % tag
-
-                # Bonus points equal to the size of ship
-                # awarded for sinking entire ship
-                if self.players.winCondition == 0:
-                    self.players.score[self.playerNumber] += \
-                        self.counter_copy[tag]
-
-                # Show bombed location with black & orange flashing bar
-                for i in range(5):
-                    text.append(self.canvas.create_text(\
-                                      x, y, text='O', fill='red'))
-                    self.canvas.addtag_withtag('text', text[-1])
-                self.canvas.tag_raise(tagname, 'square')
-                for i in range(3):  # Flashing bar
-                    self.canvas.itemconfig(tagname, {'fill': 'black'})
-                    self.canvas.update()
-                    self.myframe.after(100)
-                    self.canvas.itemconfig(tagname, {'fill': 'orange'})
-                    self.canvas.update()
-                    self.myframe.after(100)
-
-                self.hit[index] = 5
-                self.players.message[not self.playerNumber] = \
-                    '%s,\nYour ship of size %s was sunk by enemy' % \
-                    (self.players.usernames[not self.playerNumber], \
-                     self.counter_copy[tag])
-                self.players.endOfTurn(self.tracker)
-                return
-
-            # Hit, but not sunk. Player gets only 1 point
-            if self.players.winCondition == 0:
-                self.players.score[self.playerNumber] += 1
-
-            # Show hit location with flashing black & red circle
-            text = []
-            for i in range(3):
-                del text[:]
-                for i in range(5):  # flash black circle
-                    text.append(self.canvas.create_text(\
-                        x, y, text='O', fill='black'))
-                    self.canvas.addtag_withtag('text', text[-1])
-                self.canvas.update()
-                self.myframe.after(100)
-                del text[:]
-                for i in range(5):  # flash red circle
-                    text.append(self.canvas.create_text(\
-                        x, y, text='O', fill='red'))
-                    self.canvas.addtag_withtag('text', text[-1])
-                self.canvas.update()
-                self.myframe.after(100)
+        Display visually if the location is a hit, sink or a miss
+        The turn ends once the animation has played"""
+
+        # Engine resolves the shot and keeps the score
+        shot = self.players.game.fire(index)
+        if self.ai is not None:
+            self.ai.record(shot)
+        self.players.events.publish(shotEvent(self.playerNumber, shot))
+
+        # Ship was sunk
+        # Show bombed location with black & orange flashing bar
+        if shot.result == SINK:
+            tagname = 'tag%s' % shot.shipID
+            self.markers.show(index, 'O', 'red')
+            self.canvas.tag_raise(tagname, 'square')
+            flash(self.myframe, self.canvas, tagname, ('black', 'orange'),
+                  3, 100, self.players.endOfTurn)
+
+        # Hit, but not sunk
+        # Show hit location with flashing black & red circle
+        elif shot.result == HIT:
+            self.markers.show(index, 'O', 'black')
+            animate(self.myframe, self.markers.painter(index),
+                    ('black', 'red'), 3, 100, self.players.endOfTurn)
 
         # Complete miss. Draw 'X'
         else:
-            for i in range(5):
-                text = self.canvas.create_text(x, y, text='X', fill='yellow')
-                self.canvas.addtag_withtag('text', text)
-            self.canvas.update()
-            self.myframe.after(250)
-        self.hit[index] = 5
-        self.players.endOfTurn(self.tracker)
+            self.markers.show(index, 'X', 'yellow')
+            self.myframe.after(250, self.players.endOfTurn)
 
 
 # ################################
 #       Main
 # ################################
 
-if __name__ == '__main__':
+def main(argv=None):
+    """Play a game set up from the command line, or from the dialogs when
+    no settings were given"""
 
-    global game1, game2
+    settings = readSettings(argv)
+    loadTk()
 
     # Main display frame
     root = Tk()
@@ -626,46 +1085,79 @@ if __name__ == '__main__':
     root.withdraw()
     root.protocol('WM_DELETE_WINDOW', clickOverride)
 
-    showDialogBox("Battleship Game!\n\nCreated by:\nAjit Pawar\n(c) 2012")
-
-    # Display user-input Form
-    root1 = Tk()
-    form = inputForm(root1)
-    root1.protocol('WM_DELETE_WINDOW', clickOverride)
-    root1.mainloop()
-    root1.withdraw()
-
-    # Retrieve user-supplied values from Form
-    boardsize = form.boardsize
-    usernames = form.usernames
-    shipList = form.shipList
-    opponent = askOpponentType()
-    winCondition = askWinCondition()
-    if opponent == 1:
-        usernames[0] = 'Player'
-        usernames[1] = 'Computer'
-
-    showDialogBox("Let's Play Battleship!\n\n%s\n   " \
-    "vs\n%s\n\nGood Luck!" % (usernames[0], usernames[1]))
+    if settings is None:
+        settings = askSettings()
+    usernames = settings['usernames']
+    opponent = settings['opponent']
 
-    # Create two widgets, one for each player
+    # Create two widgets, one for each player: windows of their own, or
+    # frames of a single window in hot-seat mode
     top = Menu(root)
-    frame1 = Toplevel(root, menu=top)
-    frame2 = Toplevel(root, menu=top)
-    frame2.withdraw()
-
-    frame1.title("%s's setup" % usernames[0])
-    frame2.title("%s's setup" % usernames[1])
-    frame1.protocol('WM_DELETE_WINDOW', exitConfirm)
-    frame2.protocol('WM_DELETE_WINDOW', exitConfirm)
-    frame1.resizable(width=0, height=0)
-    frame2.resizable(width=0, height=0)
+    hotSeat = None
+    if settings['hotSeat']:
+        window = Toplevel(root, menu=top)
+        window.resizable(width=0, height=0)
+        hotSeat = HotSeat(window)
+        frame1, frame2 = hotSeat.frames
+        hotSeat.title(frame1, "%s's setup" % usernames[0])
+        hotSeat.title(frame2, "%s's setup" % usernames[1])
+        hotSeat.flip(frame1)
+        windows = (window,)
+    else:
+        frame1 = Toplevel(root, menu=top)
+        frame2 = Toplevel(root, menu=top)
+        frame2.withdraw()
+
+        frame1.title("%s's setup" % usernames[0])
+        frame2.title("%s's setup" % usernames[1])
+        frame1.resizable(width=0, height=0)
+        frame2.resizable(width=0, height=0)
+        windows = (frame1, frame2)
+
+    # Timings are written on exit when BATTLESHIP_METRICS names a file
+    # (JSON if it ends in .json, otherwise Prometheus text)
+    path = os.environ.get('BATTLESHIP_METRICS')
+    if path:
+        registry = Metrics()
+        instrumentGame(registry)
+        atexit.register(registry.dump, path)
 
     # Create objects
-    players = Players(frame1, frame2, usernames, winCondition)
-    game1 = Board(frame1, players, shipList, boardsize, 0, 1)
-    game2 = Board(frame2, players, shipList, boardsize, opponent, 0)
+    # Resumed games are not logged: the log replays games from the start
+    game = settings['game']
+    path = os.environ.get('BATTLESHIP_LOG', GAME_LOG)
+    log = GameLog(path) if path and game is None else None
+    path = os.environ.get('BATTLESHIP_DB', RATINGS_DB)
+    store = RatingStore(path) if path else None
+    path = os.environ.get('BATTLESHIP_CACHE', TABLE_CACHE)
+    tables = TableCache(path) if path and opponent == 1 else None
+    if game is None:
+        game = Game(settings['shipList'], settings['boardsize'],
+                    settings['winCondition'])
+    players = Players(frame1, frame2, usernames, game,
+                      settings['difficulty'], settings['seed'], log=log,
+                      store=store, tables=tables,
+                      savePath=os.environ.get('BATTLESHIP_SAVE', SAVE_FILE),
+                      resumed=settings['game'] is not None,
+                      think=settings['think'], hotSeat=hotSeat)
+    for window in windows:
+        window.protocol('WM_DELETE_WINDOW', lambda: exitConfirm(players))
+    Board(frame1, players, 0, 1)
+    Board(frame2, players, opponent, 0)
+    if players.resumed:
+        players.message.update(settings['messages'])
+        players.resume()
 
     root.mainloop()
+    if players.worker is not None:
+        players.worker.close()
+    if log is not None:
+        log.close()
+    if store is not None:
+        store.close()
     root.quit()
     raise SystemExit
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,383 @@
+"""Benchmarks of the hot paths of the game, with baseline comparison
+
+Times ship placement across board sizes and fleet densities, the
+resolution of misses, hits and sinks, the computer's latency per move
+as the board fills up, the win check, the canvas setup of a board and
+dragging a ship while the ships are laid out by hand.
+Canvas work is measured against StubCanvas, which only counts items,
+so no display is needed. Every benchmark uses fixed seeds.
+
+Results are reported per operation in microseconds: the median, 90th
+percentile and mean over all timed calls. Every benchmark is run several
+rounds and the round with the lowest median is kept, which steadies the
+numbers enough to compare against a baseline.
+
+Usage:
+    python benchmark.py --save baseline.json
+    python benchmark.py --compare baseline.json --tolerance 0.25
+    python benchmark.py --quick --filter computer_fire --json
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+from timeit import default_timer as timer
+
+from ai import Targeting, LEVELS
+from arrange import Arrangement
+from engine import BoardState, Game, MISS, HIT, SINK, FIRST_SHIP_ID
+from render import Grid, Markers, PixelBoard, Ships, cellSize, LARGE_BOARD
+
+
+# ################################
+#        Constants
+# ################################
+
+RESULTS = {MISS: 'miss', HIT: 'hit', SINK: 'sink'}
+
+# Parts of the board covered by ships in the placement benchmarks
+DENSITIES = (0.05, 0.2, 0.4)
+
+
+# ################################
+#        Functions
+# ################################
+
+def fleet(boardsize, density):
+    """(int, float) -> dict
+    Return a shipList of ships of size 2 to 5 covering about density of
+    the board"""
+
+    cells = max(int(pow(boardsize, 2) * density), 14)
+    number = max(cells // 14, 1)  # 2 + 3 + 4 + 5 = 14
+    return {2: number, 3: number, 4: number, 5: number}
+
+
+def summary(times):
+    """(list of float) -> dict
+    Return the median, p90 and mean of times in microseconds"""
+
+    times = sorted(times)
+    n = len(times)
+    return {'calls': n,
+            'p50': round(times[n // 2] * 1e6, 2),
+            'p90': round(times[min(int(n * 0.9), n - 1)] * 1e6, 2),
+            'mean': round(sum(times) / n * 1e6, 2)}
+
+
+def benchPlacement(quick):
+    """(bool) -> dict of list
+    Time BoardState.placeShips across board sizes and densities"""
+
+    results = {}
+    rng = random.Random(1)
+    for boardsize in (10, 30) if quick else (10, 30, 100):
+        for density in DENSITIES:
+            shipList = fleet(boardsize, density)
+            times = []
+            for i in range(20 if quick else 100):
+                board = BoardState(shipList, boardsize)
+                start = timer()
+                board.placeShips(rng)
+                times.append(timer() - start)
+            results['placeShips/%sx%s/%d%%' % (
+                boardsize, boardsize, density * 100)] = times
+    return results
+
+
+def benchBomb(quick):
+    """(bool) -> dict of list
+    Time Game.fire for misses, hits and sinks, and drawing the marker
+    of a shot on a stub canvas"""
+
+    results = dict(('bomb/%s' % name, []) for name in RESULTS.values())
+    results['bomb/marker'] = []
+    rng = random.Random(2)
+    for g in range(50 if quick else 300):
+        game = Game({2: 1, 3: 1, 4: 1, 5: 1}, 10)
+        game.placeShips(rng)
+        grids = [Grid(10), Grid(10)]
+        markers = [Markers(StubCanvas(), grid) for grid in grids]
+        orders = [rng.sample(range(100), 100) for p in range(2)]
+        while not game.over:
+            player = game.turn
+            index = orders[player].pop()
+            start = timer()
+            shot = game.fire(index)
+            middle = timer()
+            markers[player].show(index, 'X', 'yellow')
+            end = timer()
+            results['bomb/%s' % RESULTS[shot.result]].append(middle - start)
+            results['bomb/marker'].append(end - middle)
+    return results
+
+
+def benchComputer(quick):
+    """(bool) -> dict of list
+    Time the computer choosing and learning from a shot, per level and
+    per quarter of the board already bombed"""
+
+    results = {}
+    rng = random.Random(3)
+    for boardsize in (10,) if quick else (10, 30):
+        cells = pow(boardsize, 2)
+        shipList = fleet(boardsize, 0.14)
+        for level, name in enumerate(LEVELS):
+            for g in range(10 if quick else 400 // boardsize):
+                board = BoardState(shipList, boardsize)
+                board.placeShips(rng)
+                computer = Targeting(shipList, boardsize, level, rng)
+                fired = 0
+                while not board.allSunk():
+                    start = timer()
+                    computer.record(board.fire(computer.choose()))
+                    elapsed = timer() - start
+                    quarter = min(fired * 4 // cells, 3)
+                    key = 'computer_fire/%s/%sx%s/%d-%d%%' % (
+                        name.lower(), boardsize, boardsize,
+                        quarter * 25, quarter * 25 + 25)
+                    results.setdefault(key, []).append(elapsed)
+                    fired += 1
+    return results
+
+
+def benchWinCheck(quick):
+    """(bool) -> dict of list
+    Time the checks made after every shot: BoardState.allSunk, and the
+    scorecard of Game.finalScores and Game.winner"""
+
+    results = {'allSunk': [], 'finalScores': []}
+    rng = random.Random(4)
+    for winCondition in (0, 1):
+        game = Game({2: 3, 3: 3, 4: 3, 5: 3}, 30, winCondition)
+        game.placeShips(rng)
+        for index in rng.sample(range(900), 600):
+            if game.over:
+                break
+            game.fire(index)
+            board = game.target()
+            start = timer()
+            board.allSunk()
+            middle = timer()
+            game.winner()
+            results['allSunk'].append(middle - start)
+            results['finalScores'].append(timer() - middle)
+    return results
+
+
+def benchCanvas(quick):
+    """(bool) -> dict of list
+    Time drawing the squares of a board, as done by Board.__init__"""
+
+    results = {}
+    for boardsize in (10, 30, 100, 200):
+        key = 'canvas/%sx%s' % (boardsize, boardsize)
+        results[key] = []
+        for i in range(50 if quick else 200):
+            grid = Grid(boardsize, cellSize(boardsize))
+            canvas = StubCanvas()
+            start = timer()
+            if boardsize > LARGE_BOARD:
+                PixelBoard(canvas, grid, StubImage)
+            else:
+                Markers(canvas, grid)
+            results[key].append(timer() - start)
+    return results
+
+
+def benchDrag(quick):
+    """(bool) -> dict of list
+    Time the motion events of ships dragged around crowded boards, as
+    handled by Board.dragShip"""
+
+    results = {}
+    rng = random.Random(5)
+    for boardsize in (10, 30):
+        key = 'drag/%sx%s' % (boardsize, boardsize)
+        results[key] = []
+        board = BoardState(fleet(boardsize, DENSITIES[-1]), boardsize)
+        board.placeShips(rng)
+        grid = Grid(boardsize, cellSize(boardsize))
+        arrangement = Arrangement(board, grid,
+                                  Ships(StubCanvas(), grid, board.ships))
+        for i in range(20 if quick else 100):
+            shipID = rng.randrange(len(board.ships)) + FIRST_SHIP_ID
+            x, y = grid.centre(board.shipCells(shipID)[0])
+            arrangement.grab(x, y)
+            for j in range(50):
+                x += rng.randint(-grid.cell, grid.cell)
+                y += rng.randint(-grid.cell, grid.cell)
+                start = timer()
+                arrangement.drag(x, y)
+                results[key].append(timer() - start)
+            arrangement.drop()
+    return results
+
+
+BENCHMARKS = (('placeShips', benchPlacement),
+              ('bomb', benchBomb),
+              ('computer_fire', benchComputer),
+              ('wincheck', benchWinCheck),
+              ('canvas', benchCanvas),
+              ('drag', benchDrag))
+
+
+def runBenchmarks(quick=False, only=None, rounds=3):
+    """(bool, str, int) -> dict
+    Run rounds of the benchmarks whose name contains only (default: all
+    of them) and return their report"""
+
+    report = {'python': platform.python_version(),
+              'platform': platform.platform(),
+              'quick': quick,
+              'rounds': rounds,
+              'results': {}}
+    results = report['results']
+    for name, function in BENCHMARKS:
+        if only and only not in name:
+            continue
+        for i in range(rounds):
+            for key, times in function(quick).items():
+                if not times:
+                    continue
+                result = summary(times)
+                if key not in results or result['p50'] < results[key]['p50']:
+                    results[key] = result
+    return report
+
+
+def compare(report, baseline, tolerance):
+    """(dict, dict, float) -> list of str
+    Return a line for every benchmark whose median got slower than in
+    baseline by more than tolerance (0.25 allows 25% slower)"""
+
+    regressions = []
+    for key, result in sorted(report['results'].items()):
+        before = baseline['results'].get(key)
+        if before is None or not before['p50']:
+            continue
+        ratio = result['p50'] / before['p50']
+        if ratio > 1 + tolerance:
+            regressions.append('%s: %.2fus -> %.2fus (x%.2f)' % (
+                key, before['p50'], result['p50'], ratio))
+    return regressions
+
+
+def formatReport(report):
+    """(dict) -> str
+    Return the benchmark report as a table"""
+
+    lines = ['Python %s on %s%s' % (report['python'], report['platform'],
+                                    ' (quick)' if report['quick'] else ''),
+             '',
+             '%-42s %8s %10s %10s %10s' % ('Benchmark (us per call)',
+                                           'Calls', 'p50', 'p90', 'Mean')]
+    for key, result in sorted(report['results'].items()):
+        lines.append('%-42s %8s %10.2f %10.2f %10.2f' % (
+            key, result['calls'], result['p50'], result['p90'],
+            result['mean']))
+    return '\n'.join(lines)
+
+
+# ################################
+#        Classes
+# ################################
+
+class StubCanvas(object):
+    """Stand-in for a Tkinter Canvas that only keeps count of its items"""
+
+    def __init__(self):
+        """(StubCanvas) -> NoneType """
+
+        self.items = 0
+        self.created = 0
+
+    def create(self, *args, **kw):
+        """(StubCanvas) -> int
+        Add an item and return its id"""
+
+        self.items += 1
+        self.created += 1
+        return self.created
+
+    create_rectangle = create_text = create_line = create_image = create
+
+    def delete(self, *args):
+        """(StubCanvas) -> NoneType
+        Drop an item"""
+
+        self.items -= 1
+
+    def itemconfig(self, *args, **kw):
+        """(StubCanvas) -> NoneType """
+
+    def coords(self, *args):
+        """(StubCanvas) -> NoneType """
+
+    def tag_raise(self, *args):
+        """(StubCanvas) -> NoneType """
+
+
+class StubImage(object):
+    """Stand-in for a Tkinter PhotoImage"""
+
+    def __init__(self, width=0, height=0):
+        """(StubImage, int, int) -> NoneType """
+
+        self.width = width
+        self.height = height
+
+    def put(self, *args, **kw):
+        """(StubImage) -> NoneType """
+
+    def zoom(self, factor):
+        """(StubImage, int) -> StubImage
+        Return the image scaled up by factor"""
+
+        return StubImage(self.width * factor, self.height * factor)
+
+
+def main(argv=None):
+    """(list of str) -> NoneType
+    Run the benchmarks from the command line
+    Exit with status 1 if a benchmark regressed against the baseline"""
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--quick', action='store_true',
+                        help='fewer sizes and repetitions')
+    parser.add_argument('--rounds', type=int, default=3,
+                        help='runs of every benchmark, keeping the fastest')
+    parser.add_argument('--filter', default=None,
+                        help='only run benchmarks whose name contains this')
+    parser.add_argument('--json', action='store_true',
+                        help='print the report as JSON')
+    parser.add_argument('--save', default=None,
+                        help='write the report to this file')
+    parser.add_argument('--compare', default=None,
+                        help='baseline report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown of the median (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    report = runBenchmarks(args.quick, args.filter, args.rounds)
+    if args.json:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    else:
+        print(formatReport(report))
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            sys.stderr.write('Slower than %s:\n  %s\n' % (
+                args.compare, '\n  '.join(regressions)))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
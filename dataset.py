@@ -0,0 +1,282 @@
+"""Self-play datasets for training targeting models
+
+Computer players play engine.Game games against each other and every
+shot becomes a sample: the board as the shooter saw it, the location it
+chose and the outcome. Samples are written to numbered shards, .npy
+files of a structured array with one record per shot:
+
+    game     number of the game
+    move     shots fired by the shooter before this one (16 bits, so
+             boards are at most MAX_BOARDSIZE squares a side)
+    level    difficulty of the shooter (see ai.LEVELS)
+    state    one byte per location: UNKNOWN, MISSED, WOUNDED (hit on a
+             ship still afloat) or SUNK
+    shot     location bombed
+    result   engine.MISS, engine.HIT or engine.SINK
+
+numpy.load(path) reads a shard; numpy is not needed to write them.
+
+Games are played by worker processes in chunks. At most a few chunks
+per worker are in flight, and a shard is written once it holds
+shardSamples samples, so memory stays bounded however many games are
+played. Shards only hold whole games. The manifest written after
+every shard records how far generation got, and a run in the same
+directory with the same settings carries on from there. Every game
+gets its own seed, so the output does not depend on the number of
+workers.
+
+Usage:
+    python dataset.py data --games 1000000
+    python dataset.py data --games 5000000 --levels medium,hard \\
+        --shard-samples 2000000 --processes 32
+"""
+
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import random
+import struct
+import tempfile
+import time
+
+from ai import Targeting, LEVELS
+from engine import Game, HIT, SINK, indices
+from tournament import gameSeed, parseShips
+
+
+# ################################
+#        Constants
+# ################################
+
+# Locations in the state of a sample
+UNKNOWN = 0
+MISSED = 1
+WOUNDED = 2
+SUNK = 3
+
+# Largest board whose moves all fit the 16-bit move field
+MAX_BOARDSIZE = 256
+
+CHUNK_GAMES = 64
+SHARD_SAMPLES = 1 << 20
+
+# Chunks in flight per worker process
+PENDING = 4
+
+MANIFEST = 'manifest.json'
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+HEAD = struct.Struct('<QHB')  # game, move, level
+TAIL = struct.Struct('<IB')   # shot, result
+
+
+# ################################
+#        Functions
+# ################################
+
+def sampleSize(boardsize):
+    """(int) -> int
+    Return the bytes taken by one sample"""
+
+    return HEAD.size + pow(boardsize, 2) + TAIL.size
+
+
+def npyHeader(boardsize, samples):
+    """(int, int) -> bytes
+    Return the .npy header of a shard holding samples samples"""
+
+    descr = [('game', '<u8'), ('move', '<u2'), ('level', '|u1'),
+             ('state', '|u1', (pow(boardsize, 2),)), ('shot', '<u4'),
+             ('result', '|u1')]
+    text = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (
+        descr, samples)
+    # Magic, version and length take 10 bytes; the data starts on a
+    # multiple of 64
+    padding = 63 - (10 + len(text)) % 64
+    text += ' ' * padding + '\n'
+    return NPY_MAGIC + struct.pack('<H', len(text)) + text.encode('ascii')
+
+
+def playSamples(task):
+    """(tuple) -> tuple of (int, bytes)
+    Play a chunk of games and return the number of samples and the
+    samples packed as the records of a shard
+    task is (seed, first, games, levels, shipList, boardsize) where
+    first is the number of the first game; player p of game g plays at
+    levels[(g + p) % len(levels)]"""
+
+    seed, first, games, levels, shipList, boardsize = task
+    cells = pow(boardsize, 2)
+    parts = []
+    for number in range(first, first + games):
+        rng = random.Random(gameSeed(seed, number))
+        game = Game(shipList, boardsize)
+        failed = game.placeShips(rng)
+        if failed:
+            raise ValueError('Ships of size %s do not fit the board' %
+                             sorted(set(failed)))
+        players = [levels[(number + p) % len(levels)] for p in range(2)]
+        computers = [Targeting(shipList, boardsize, level, rng)
+                     for level in players]
+        views = [bytearray(cells), bytearray(cells)]
+        moves = [0, 0]
+        while not game.over:
+            p = game.turn
+            view = views[p]
+            n = computers[p].choose()
+            shot = game.fire(n)
+            computers[p].record(shot)
+            parts.append(HEAD.pack(number, moves[p], players[p]))
+            parts.append(bytes(view))
+            parts.append(TAIL.pack(n, shot.result))
+            moves[p] += 1
+            if shot.result == SINK:
+                for m in indices(shot.mask):
+                    view[m] = SUNK
+            else:
+                view[n] = WOUNDED if shot.result == HIT else MISSED
+    data = b''.join(parts)
+    return len(data) // sampleSize(boardsize), data
+
+
+def shardName(number):
+    """(int) -> str """
+
+    return 'shard-%06d.npy' % number
+
+
+def writeAtomic(path, parts):
+    """(str, list of bytes) -> NoneType
+    Write parts to path through a temporary file, so that readers never
+    see it half written"""
+
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or '.')
+    with os.fdopen(handle, 'wb') as f:
+        for part in parts:
+            f.write(part)
+    os.rename(temporary, path)
+
+
+def generate(directory, games, levels, shipList=None, boardsize=10, seed=0,
+             processes=None, shardSamples=SHARD_SAMPLES,
+             chunkGames=CHUNK_GAMES, progress=None):
+    """(str, int, list of int, dict, int, int, int, int, int, function)
+    -> dict
+    Write the samples of games games to shards in directory, carrying on
+    from its manifest if it has one, and return the manifest
+    progress(manifest) is called after every shard written
+    Raise ValueError if directory holds a dataset of other settings or
+    boardsize is over MAX_BOARDSIZE"""
+
+    if boardsize > MAX_BOARDSIZE:
+        raise ValueError('Boards of more than %d squares a side are not '
+                         'supported' % MAX_BOARDSIZE)
+    if shipList is None:
+        shipList = {2: 1, 3: 1, 4: 1, 5: 1}
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    settings = {'levels': [LEVELS[l] for l in levels],
+                'ships': dict((str(k), v) for k, v in shipList.items()),
+                'boardsize': boardsize, 'seed': seed}
+    manifest = {'settings': settings, 'shards': 0, 'games': 0,
+                'samples': 0, 'seconds': 0.0}
+    path = os.path.join(directory, MANIFEST)
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest['settings'] != settings:
+            raise ValueError('%s holds a dataset of other settings: %s' %
+                             (directory, manifest['settings']))
+
+    start = time.time() - manifest['seconds']
+    buffered = []  # packed samples of the shard being filled
+    samples = 0
+    played = manifest['games']
+
+    def flush():
+        name = os.path.join(directory, shardName(manifest['shards']))
+        writeAtomic(name, [npyHeader(boardsize, samples)] + buffered)
+        manifest['shards'] += 1
+        manifest['games'] = played
+        manifest['samples'] += samples
+        manifest['seconds'] = round(time.time() - start, 3)
+        writeAtomic(path, [json.dumps(manifest, indent=2,
+                                      sort_keys=True).encode('ascii')])
+        if progress is not None:
+            progress(manifest)
+
+    pool = multiprocessing.Pool(processes)
+    pending = collections.deque()  # (games up to, result) in flight
+    limit = PENDING * (processes or multiprocessing.cpu_count())
+    first = played
+    try:
+        while pending or first < games:
+            # Keep a bounded number of chunks in flight and take their
+            # results in order, so the shards do not depend on timing
+            while first < games and len(pending) < limit:
+                count = min(chunkGames, games - first)
+                pending.append((first + count, pool.apply_async(
+                    playSamples, ((seed, first, count, levels, shipList,
+                                   boardsize),))))
+                first += count
+            played, result = pending.popleft()
+            count, data = result.get()
+            buffered.append(data)
+            samples += count
+            if samples >= shardSamples:
+                flush()
+                buffered = []
+                samples = 0
+        if buffered:
+            flush()
+    finally:
+        pool.terminate()
+        pool.join()
+    return manifest
+
+
+def main(argv=None):
+    """(list of str) -> NoneType
+    Generate a dataset from the command line"""
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('directory')
+    parser.add_argument('--games', type=int, default=10000,
+                        help='games in the whole dataset')
+    parser.add_argument('--levels', default='hard',
+                        help='comma separated difficulty levels')
+    parser.add_argument('--ships', default='2:1,3:1,4:1,5:1',
+                        help='ships as size:number pairs')
+    parser.add_argument('--boardsize', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None,
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('--shard-samples', type=int, default=SHARD_SAMPLES,
+                        help='samples per shard, rounded up to whole '
+                             'chunks of games')
+    args = parser.parse_args(argv)
+
+    names = [name.lower() for name in LEVELS]
+    levels = []
+    for name in args.levels.split(','):
+        if name.strip().lower() not in names:
+            parser.error('unknown level %r' % name)
+        levels.append(names.index(name.strip().lower()))
+
+    def progress(manifest):
+        print('%s  %d games, %d samples, %.0f samples/sec' % (
+            shardName(manifest['shards'] - 1), manifest['games'],
+            manifest['samples'],
+            manifest['samples'] / max(manifest['seconds'], 1e-9)))
+
+    try:
+        generate(args.directory, args.games, levels,
+                 parseShips(args.ships), args.boardsize, args.seed,
+                 args.processes, args.shard_samples, progress=progress)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,377 @@
+"""Exact endgame solver for the computer
+
+Once few enough layouts of the remaining ships agree with what the
+computer has seen, every one of them can be listed. The solver then
+picks the shot minimising the expected number of shots left to sink
+every ship, every consistent layout being equally likely: a shot splits
+the layouts by the outcome the board would show (a miss, a hit, or a
+sink revealing the ship) and the best shot of each part is solved in
+turn.
+
+A position is what the computer knows: the locations known to be empty
+(misses and sunk ships), the wounded locations (hits on ships still
+afloat) and the sizes of the ships left. Positions reached in several
+ways, or that are one of the 8 symmetries of the board away from each
+other, share one entry of a transposition table. The table keeps its
+most recently used entries and can be shared by any number of games,
+played in any number of threads, so a long-running process gets faster
+as it plays.
+
+Example:
+
+    solver = EndgameSolver()
+    n = solver.choose(boardsize, shots, wounded, remaining)
+"""
+
+import threading
+from collections import OrderedDict
+from timeit import default_timer as timer
+
+from ai import shipPlacements, transform
+from engine import popcount, indices
+
+
+# ################################
+#        Constants
+# ################################
+
+# Layouts above which a position is not solved
+MAX_LAYOUTS = 16
+
+# Ships left above which the layouts are not even counted
+MAX_SHIPS = 2
+
+# Positions kept in the transposition table
+TABLE_SIZE = 50000
+
+# Seconds a move may take in the live game
+BUDGET = 0.05
+
+_masks = {}
+_symmetries = {}
+
+
+# ################################
+#        Functions
+# ################################
+
+def placementMasks(size, boardsize):
+    """(int, int) -> list of int
+    Return the mask of every placement of a ship of size on the board
+    Results are cached and must not be modified"""
+
+    key = (size, boardsize)
+    if key not in _masks:
+        _masks[key] = [sum(1 << n for n in cells)
+                       for cells in shipPlacements(size, boardsize)[0]]
+    return _masks[key]
+
+
+def symmetries(boardsize):
+    """(int) -> list of list of int
+    Return, for each of the 8 symmetries of the board, where every
+    location goes (see ai.transform)"""
+
+    if boardsize not in _symmetries:
+        cells = range(pow(boardsize, 2))
+        _symmetries[boardsize] = [[transform(n, boardsize, s) for n in cells]
+                                  for s in range(8)]
+    return _symmetries[boardsize]
+
+
+def mapMask(mask, table):
+    """(int, list of int) -> int
+    Return mask with every location n moved to table[n]"""
+
+    result = 0
+    for n in indices(mask):
+        result |= 1 << table[n]
+    return result
+
+
+def layouts(boardsize, empty, wounded, sizes, limit=MAX_LAYOUTS):
+    """(int, int, int, tuple of int, int) -> list of tuple or NoneType
+    Return every layout of ships of sizes avoiding the locations in
+    empty and covering every wounded location, no ship lying wholly on
+    wounded locations (it would have been sunk), or None if there are
+    more than limit
+    A layout is (mask of all ships, tuple of the mask of every ship)"""
+
+    found = []
+    sizes = sorted(sizes, reverse=True)
+
+    # Placements clear of the empty locations, and not lying wholly on
+    # wounded ones
+    legal = {}
+    for k in sizes:
+        if k not in legal:
+            legal[k] = [m for m in placementMasks(k, boardsize)
+                        if not m & empty and m & ~wounded]
+
+    def place(i, occupied, ships, start):
+        if i == len(sizes):
+            if wounded & ~occupied:
+                return True
+            found.append((occupied, tuple(ships)))
+            return len(found) <= limit
+        # Ships of equal size are placed in increasing order, so every
+        # layout is listed once
+        masks = legal[sizes[i]]
+        last = i + 1 == len(sizes)
+        for p in range(start, len(masks)):
+            m = masks[p]
+            if m & occupied or last and wounded & ~(occupied | m):
+                continue
+            ships.append(m)
+            more = place(i + 1, occupied | m, ships,
+                         p + 1 if not last and sizes[i + 1] == sizes[i]
+                         else 0)
+            ships.pop()
+            if not more:
+                return False
+        return True
+
+    if not place(0, 0, [], 0):
+        return None
+    return found
+
+
+# ################################
+#        Classes
+# ################################
+
+class OutOfTime(Exception):
+    """Raised when a solve runs past its time budget"""
+
+    pass
+
+
+class EndgameSolver(object):
+    """Expected shots to finish positions, remembered across games"""
+
+    def __init__(self, size=TABLE_SIZE, maxLayouts=MAX_LAYOUTS,
+                 maxShips=MAX_SHIPS, budget=BUDGET):
+        """(EndgameSolver, int, int, int, float) -> NoneType
+        Moves give up after budget seconds (None for no limit)"""
+
+        self.size = size
+        self.maxLayouts = maxLayouts
+        self.maxShips = maxShips
+        self.budget = budget
+
+        # Positions -> (expected shots, best location), least recently
+        # used first. A position asked about is keyed by its canonical
+        # orientation; the positions searched from it by that key, the
+        # ships and wounded locations left and the layouts left, one bit
+        # per layout of the position asked about
+        self.table = OrderedDict()
+        self.found = 0   # positions looked up in the table
+        self.solved = 0  # positions solved
+        self.deadline = None
+        self.lock = threading.Lock()  # one search at a time
+
+    def choose(self, boardsize, shots, wounded, remaining, deadline=None):
+        """(EndgameSolver, int, int, int, dict, float) -> int or NoneType
+        Return the location to bomb minimising the expected shots left,
+        or None if the position has too many layouts or cannot be solved
+        within the budget, or by deadline (a timer() value) if sooner
+        shots and wounded are masks of the locations bombed and hit on
+        ships afloat; remaining maps ship sizes to the number left"""
+
+        if not remaining or sum(remaining.values()) > self.maxShips:
+            return None
+        with self.lock:
+            self.deadline = deadline
+            if self.budget is not None:
+                end = timer() + self.budget
+                if deadline is None or end < deadline:
+                    self.deadline = end
+            try:
+                entry, symmetry = self.evaluate(boardsize, shots, wounded,
+                                                remaining)
+            except OutOfTime:
+                return None
+            finally:
+                self.deadline = None
+        if entry is None:
+            return None
+        return symmetries(boardsize)[symmetry].index(entry[1])
+
+    def expected(self, boardsize, shots, wounded, remaining):
+        """(EndgameSolver, int, int, int, dict) -> float or NoneType
+        Return the expected shots to sink every ship left with best
+        play, or None if the position has too many layouts"""
+
+        if not remaining:
+            return 0.0
+        with self.lock:
+            entry = self.evaluate(boardsize, shots, wounded, remaining)[0]
+        return None if entry is None else entry[0]
+
+    def evaluate(self, boardsize, shots, wounded, remaining):
+        """(EndgameSolver, int, int, int, dict) -> tuple
+        Return the entry of a position, None if it has too many layouts,
+        and the symmetry taking the position to its canonical orientation
+        in which the entry is kept"""
+
+        sizes = []
+        for k in sorted(remaining):
+            sizes.extend([k] * remaining[k])
+        sizes = tuple(sizes)
+        key, symmetry = self.key(boardsize, shots & ~wounded, wounded, sizes)
+        entry = self.lookup(key)
+        if entry is None:
+            empty, wounded = key[2:]
+            found = layouts(boardsize, empty, wounded, sizes, self.maxLayouts)
+            if not found:
+                return None, symmetry
+            found = [(occupied, ships, 1 << j)
+                     for j, (occupied, ships) in enumerate(found)]
+            entry = self.solve(key, wounded, sizes, found)
+            self.store(key, entry)
+        return entry, symmetry
+
+    def key(self, boardsize, empty, wounded, sizes):
+        """(EndgameSolver, int, int, int, tuple of int) -> tuple
+        Return the key of a position in its canonical orientation:
+        (boardsize, sizes, empty, wounded), and the symmetry taking the
+        position to it"""
+
+        best = None
+        for s, table in enumerate(symmetries(boardsize)):
+            candidate = (mapMask(empty, table), mapMask(wounded, table))
+            if best is None or candidate < best:
+                best, symmetry = candidate, s
+        return (boardsize, sizes) + best, symmetry
+
+    def lookup(self, key):
+        """(EndgameSolver, tuple) -> tuple or NoneType
+        Return the entry of key, marking it as recently used"""
+
+        entry = self.table.pop(key, None)
+        if entry is not None:
+            self.found += 1
+            self.table[key] = entry
+        return entry
+
+    def store(self, key, entry):
+        """(EndgameSolver, tuple, tuple) -> NoneType
+        Add an entry, evicting the least recently used past the size"""
+
+        self.table[key] = entry
+        if len(self.table) > self.size:
+            self.table.popitem(last=False)
+
+    def solve(self, root, wounded, sizes, found, limit=None):
+        """(EndgameSolver, tuple, int, tuple of int, list of tuple, float)
+        -> tuple of (float, int)
+        Return the expected shots left and the best location when the
+        layouts still possible are found, searching from position root
+        found holds (mask of all ships, masks of every ship, bit of the
+        layout in root)
+        Solving stops once the position is known to take at least limit
+        shots: that bound is returned, with None for the location
+        Raise OutOfTime past the deadline"""
+
+        # Every layout covers the same number of locations, all of which
+        # must be bombed: a bound on the expected shots
+        left = sum(sizes) - popcount(wounded)
+        if len(found) == 1:
+            return float(left), indices(found[0][0] & ~wounded)[0]
+
+        # Misses that rule out no layout change nothing, so positions
+        # are told apart by the layouts left
+        key = (root, sizes, wounded, sum(layout[2] for layout in found))
+        entry = self.lookup(key)
+        if entry is not None and (entry[1] is not None or
+                                  limit is not None and entry[0] >= limit):
+            return entry
+        self.solved += 1
+        if self.deadline is not None and timer() > self.deadline:
+            raise OutOfTime()
+
+        # Layouts covering every location not bombed yet. Locations
+        # covered by the same layouts are worth the same, so only the
+        # first of each is tried, most often covered first
+        cover = {}
+        for occupied, ships, bit in found:
+            for n in indices(occupied & ~wounded):
+                cover[n] = cover.get(n, 0) | bit
+        seen = set()
+        candidates = []
+        for n in sorted(cover):
+            if cover[n] not in seen:
+                seen.add(cover[n])
+                candidates.append(n)
+        count = dict((n, popcount(cover[n])) for n in candidates)
+        candidates.sort(key=lambda n: -count[n])
+        total = float(len(found))
+
+        # A location covered by every layout is a sure hit: bombing it
+        # first costs no shot that would not be fired anyway
+        if count[candidates[0]] == len(found):
+            candidates = candidates[:1]
+
+        # The first shot misses at least as often as the most likely
+        # location does
+        bound = left + 1 - count[candidates[0]] / total
+        if limit is not None and bound >= limit:
+            self.store(key, (bound, None))
+            return bound, None
+
+        bestValue, best = limit, None
+        for n in candidates:
+            bit = 1 << n
+
+            # Split the layouts by what the board would show: a miss,
+            # a hit, or the ship sunk
+            miss, hit, sunk = [], [], {}
+            for layout in found:
+                occupied, ships, j = layout
+                if not occupied & bit:
+                    miss.append(layout)
+                    continue
+                for i, m in enumerate(ships):
+                    if m & bit:
+                        break
+                if m & ~(wounded | bit):
+                    hit.append(layout)
+                else:
+                    sunk.setdefault(m, []).append(
+                        (occupied & ~m, ships[:i] + ships[i + 1:], j))
+            children = []
+            if miss:
+                children.append((len(miss) / total, wounded, sizes, miss))
+            if hit:
+                children.append((len(hit) / total, wounded | bit, sizes,
+                                 hit))
+            for m, group in sunk.items():
+                i = sizes.index(popcount(m))
+                children.append((len(group) / total, wounded & ~m,
+                                 sizes[:i] + sizes[i + 1:], group))
+
+            # Bound every outcome by the shots it must still take, then
+            # solve them one by one while the shot can still beat the
+            # best, each within the room left
+            value = 1.0
+            for p, w, s, group in children:
+                value += p * (sum(s) - popcount(w))
+            if bestValue is not None and value >= bestValue:
+                continue
+            for p, w, s, group in children:
+                if not s:
+                    continue
+                low = sum(s) - popcount(w)
+                room = None
+                if bestValue is not None:
+                    room = low + (bestValue - value) / p
+                exact, move = self.solve(root, w, s, group, room)
+                value += p * (exact - low)
+                if move is None or \
+                   bestValue is not None and value >= bestValue:
+                    break
+            else:
+                bestValue, best = value, n
+
+        self.store(key, (bestValue, best))
+        return bestValue, best
@@ -0,0 +1,304 @@
+"""Headless Battleship engine: board state, firing, scoring and win detection
+
+Nothing in this module touches Tkinter, so complete games can be simulated
+without a display. The Board and Players classes in battleship.py are thin
+views drawing on top of the objects defined here."""
+
+import random
+from collections import namedtuple
+
+from placement import placeFleet, PlacementError
+from scoring import Scoreboard, RULES
+
+
+# ################################
+#        Constants
+# ################################
+
+# Outcome of a single shot
+MISS = 0
+HIT = 1
+SINK = 2
+
+# Styles of scoring, as chosen in askWinCondition()
+WIN_BY_POINTS = 0
+WIN_BY_MOVES = 1
+
+FIRST_SHIP_ID = 101  # every ship is identified by an id from 101 upwards
+
+# index: location on the board, result: MISS, HIT or SINK
+# shipID and size describe the ship that was struck (None and 0 on a miss)
+# mask holds the locations of a ship that was sunk, revealed to the
+# player who sank it (0 otherwise)
+Shot = namedtuple('Shot', 'index result shipID size mask')
+
+# index: top-left location of the ship, rotation: 0 vertical, 1 horizontal
+Placement = namedtuple('Placement', 'shipID index size rotation')
+
+
+# ################################
+#        Functions
+# ################################
+
+def popcount(mask):
+    """(int) -> int
+    Return the number of locations set in mask"""
+
+    return bin(mask).count('1')
+
+
+def lowestIndex(mask):
+    """(int) -> int
+    Return the lowest location set in a non-empty mask"""
+
+    return (mask & -mask).bit_length() - 1
+
+
+def indices(mask):
+    """(int) -> list of int
+    Return every location set in mask, in increasing order"""
+
+    result = []
+    while mask:
+        low = mask & -mask
+        result.append(low.bit_length() - 1)
+        mask ^= low
+    return result
+
+
+def shipMask(index, size, rotation, boardsize):
+    """(int, int, int, int) -> int
+    Return the mask of a ship of size placed at index, or 0 if it
+    runs off the board. Rotation 0 is vertical, 1 is horizontal"""
+
+    if rotation != 0:
+        if index % boardsize + size > boardsize:
+            return 0
+        return ((1 << size) - 1) << index
+    if index // boardsize + size > boardsize:
+        return 0
+    mask = 0
+    for j in range(size):
+        mask |= 1 << (index + j * boardsize)
+    return mask
+
+
+def maskPlacement(mask):
+    """(int) -> tuple of int
+    Return the (index, size, rotation) of the ship covering mask"""
+
+    n = lowestIndex(mask)
+    return n, popcount(mask), int(mask >> (n + 1) & 1)
+
+
+# ################################
+#        Classes
+# ################################
+
+class BoardState(object):
+    """State of one player's board: ship layout and shots taken at it
+
+    The board is kept as integer bitmasks where bit n stands for
+    location n (row n / boardsize, column n % boardsize)"""
+
+    __slots__ = ('shipList', 'boardsize', 'cells', 'occupied', 'shots',
+                 'ships')
+
+    def __init__(self, shipList, boardsize):
+        """(BoardState, dict, int) -> NoneType """
+
+        self.shipList = shipList
+        self.boardsize = boardsize
+        self.cells = pow(boardsize, 2)
+        self.occupied = 0  # locations covered by any ship
+        self.shots = 0     # locations that have been attacked
+
+        # Mask of every ship, in the order they were placed
+        # Ship ids start at FIRST_SHIP_ID: ships[0] is ship 101
+        self.ships = []
+
+    @property
+    def tracker(self):
+        """Map every shipID to the number of its locations still unharmed
+        Size of zero represents sunk ship"""
+
+        return dict((FIRST_SHIP_ID + i, popcount(m & ~self.shots))
+                    for i, m in enumerate(self.ships))
+
+    @property
+    def counter_copy(self):
+        """Map every shipID to its original size"""
+
+        return dict((FIRST_SHIP_ID + i, popcount(m))
+                    for i, m in enumerate(self.ships))
+
+    def addShip(self, mask):
+        """(BoardState, int) -> int
+        Add a ship covering the locations in mask and return its id"""
+
+        self.occupied |= mask
+        self.ships.append(mask)
+        return FIRST_SHIP_ID + len(self.ships) - 1
+
+    def placeShips(self, rng=random):
+        """(BoardState, Random) -> list of int
+        Randomly place every ship of shipList on the board
+        Return the sizes of ships that could not be fitted"""
+
+        try:
+            layout = placeFleet(self.shipList, self.boardsize, rng)
+        except PlacementError as pe:
+            return pe.sizes
+        for k, n, rotation in layout:
+            self.addShip(shipMask(n, k, rotation, self.boardsize))
+        return []
+
+    def placements(self):
+        """(BoardState) -> list of Placement
+        Return the placement of every ship on the board"""
+
+        return [Placement(FIRST_SHIP_ID + i, *maskPlacement(mask))
+                for i, mask in enumerate(self.ships)]
+
+    def overlap(self, shipID, mask):
+        """(BoardState, int, int) -> int
+        Return the locations of mask covered by ships other than shipID"""
+
+        return mask & self.occupied & ~self.ships[shipID - FIRST_SHIP_ID]
+
+    def moveShip(self, shipID, mask):
+        """(BoardState, int, int) -> NoneType
+        Move ship shipID to cover the locations in mask instead
+        The ship keeps its id; mask must not overlap another ship
+        Raise ValueError once the board has been bombed"""
+
+        if self.shots:
+            raise ValueError('Ships cannot move once the board is bombed')
+        i = shipID - FIRST_SHIP_ID
+        self.occupied = self.occupied & ~self.ships[i] | mask
+        self.ships[i] = mask
+
+    def isBombed(self, index):
+        """(BoardState, int) -> bool
+        Return True if location index has already been attacked"""
+
+        return bool(self.shots >> index & 1)
+
+    def shipAt(self, index):
+        """(BoardState, int) -> int or NoneType
+        Return the id of the ship covering location index, if any"""
+
+        bit = 1 << index
+        if self.occupied & bit:
+            for i, mask in enumerate(self.ships):
+                if mask & bit:
+                    return FIRST_SHIP_ID + i
+        return None
+
+    def fire(self, index):
+        """(BoardState, int) -> Shot
+        Bomb location index and return the outcome of the shot"""
+
+        if not 0 <= index < self.cells or self.shots >> index & 1:
+            raise ValueError('Location %s cannot be bombed' % index)
+
+        bit = 1 << index
+        self.shots |= bit
+        if not self.occupied & bit:
+            return Shot(index, MISS, None, 0, 0)
+
+        shipID = self.shipAt(index)
+        mask = self.ships[shipID - FIRST_SHIP_ID]
+        if mask & ~self.shots:
+            return Shot(index, HIT, shipID, popcount(mask), 0)
+        return Shot(index, SINK, shipID, popcount(mask), mask)
+
+    def isSunk(self, shipID):
+        """(BoardState, int) -> bool
+        Return True if every location of ship shipID has been bombed"""
+
+        return not self.ships[shipID - FIRST_SHIP_ID] & ~self.shots
+
+    def allSunk(self):
+        """(BoardState) -> bool
+        Return True if all ships have been sunk, False otherwise"""
+
+        return not self.occupied & ~self.shots
+
+    def shipCells(self, shipID):
+        """(BoardState, int) -> list of int
+        Return the locations occupied by ship shipID"""
+
+        return indices(self.ships[shipID - FIRST_SHIP_ID])
+
+
+class Game(object):
+    """A two-player game: both boards, turns and scoring"""
+
+    def __init__(self, shipList, boardsize, winCondition=WIN_BY_POINTS,
+                 rule=None):
+        """(Game, dict, int, int, rule) -> NoneType
+        boards[p] belongs to player p and is attacked by the other player
+        Scores follow rule (default: the rule of winCondition, see
+        scoring.RULES)"""
+
+        self.shipList = shipList
+        self.boardsize = boardsize
+        self.winCondition = winCondition
+        self.boards = [BoardState(shipList, boardsize),
+                       BoardState(shipList, boardsize)]
+        self.turn = 0  # player whose turn it is to bomb
+        self.over = False
+        if rule is None:
+            rule = RULES[winCondition]()
+        self.scoreboard = Scoreboard(rule)
+
+    def placeShips(self, rng=random):
+        """(Game, Random) -> list of int
+        Place ships on both boards
+        Return the sizes of ships that failed to be placed"""
+
+        failed = []
+        for board in self.boards:
+            failed.extend(board.placeShips(rng))
+        return failed
+
+    def target(self, player=None):
+        """(Game, int) -> BoardState
+        Return the board attacked by player (default: current player)"""
+
+        if player is None:
+            player = self.turn
+        return self.boards[1 - player]
+
+    def fire(self, index):
+        """(Game, int) -> Shot
+        Current player bombs location index on the opponent's board
+        Update scores, check for a winner and hand the turn over"""
+
+        if self.over:
+            raise ValueError('The game is already over')
+
+        player = self.turn
+        board = self.boards[1 - player]
+        shot = board.fire(index)
+        self.scoreboard.record(player, shot.result != MISS,
+                               shot.size if shot.result == SINK else 0)
+
+        if board.allSunk():
+            self.over = True
+        else:
+            self.turn = 1 - player
+        return shot
+
+    def finalScores(self):
+        """(Game) -> list of number
+        Return the score of both players, live while the game goes on"""
+
+        return self.scoreboard.scores()
+
+    def winner(self):
+        """(Game) -> int or NoneType
+        Return the player with the highest score, or None on a draw"""
+
+        return self.scoreboard.winner()
@@ -0,0 +1,239 @@
+"""Game events published to any number of subscribers
+
+Board.bomb() and Players.endOfTurn() publish what happens in a game on
+an EventBus: a Miss, Hit or Sink for every shot, a TurnSwitch when the
+other player is due to bomb and GameOver once a fleet is sunk. The
+window's announcements, the game log, the ratings store and any number
+of spectators subscribe to them.
+
+Publishing never waits for a subscriber: the event is appended to the
+queue of every subscription taking events of its kind and publish()
+returns. Queues are bounded unless kept whole; when one is full its
+policy decides what gives:
+
+    DROP_OLDEST   the oldest event queued is dropped, so a subscriber
+                  falling behind sees the latest events (the default)
+    DROP_NEWEST   the event published is dropped
+    COALESCE      events of the same kind from the same player replace
+                  each other, only the latest of each being kept
+    KEEP_ALL      nothing is dropped: the queue is not bounded, for
+                  subscribers such as the game log that must see every
+                  event
+
+Every subscription counts the events it dropped.
+
+Subscriptions with a handler are delivered by pump(), which the bus
+hands to its schedule function once an event is queued for them (the
+game runs it from the Tk loop, after the shooter's turn). They are
+only used by the thread publishing and pumping, so they take no lock.
+The others are read by their owner, from any thread, with poll() or
+wait().
+
+Nothing here imports Tkinter.
+
+Example:
+
+    spectator = players.events.subscribe(kinds=(Sink, GameOver))
+    while True:
+        for event in spectator.wait(1.0):
+            print(event)
+"""
+
+import threading
+from collections import deque, namedtuple, OrderedDict
+
+from engine import MISS, HIT, SINK
+
+
+# ################################
+#        Constants
+# ################################
+
+# Events; player is the player who fired, or is due to fire next
+Miss = namedtuple('Miss', 'player shot')
+Hit = namedtuple('Hit', 'player shot')
+Sink = namedtuple('Sink', 'player shot')
+TurnSwitch = namedtuple('TurnSwitch', 'player')
+GameOver = namedtuple('GameOver', 'scores winner')  # winner None on a draw
+
+SHOT_EVENTS = {MISS: Miss, HIT: Hit, SINK: Sink}
+
+# What a full queue gives up
+DROP_OLDEST = 0
+DROP_NEWEST = 1
+COALESCE = 2
+KEEP_ALL = 3
+
+# Events a subscription queues by default
+QUEUE_LIMIT = 256
+
+
+# ################################
+#        Functions
+# ################################
+
+def shotEvent(player, shot):
+    """(int, Shot) -> Miss, Hit or Sink
+    Return the event of player firing shot"""
+
+    return SHOT_EVENTS[shot.result](player, shot)
+
+
+# ################################
+#        Classes
+# ################################
+
+class Subscription(object):
+    """Bounded queue of the events one subscriber has not taken yet"""
+
+    def __init__(self, bus, handler=None, kinds=None, limit=QUEUE_LIMIT,
+                 policy=DROP_OLDEST):
+        """(Subscription, EventBus, function, tuple of type, int, int)
+        -> NoneType
+        handler(event) is called by the bus's pump(); kinds are the event
+        types taken (default: all)"""
+
+        self.bus = bus
+        self.handler = handler
+        self.kinds = kinds
+        self.limit = limit
+        self.policy = policy
+        self.queue = OrderedDict() if policy == COALESCE else deque()
+        self.dropped = 0
+
+        # Only subscriptions read from other threads need a lock
+        self.ready = threading.Condition() if handler is None else None
+
+    def offer(self, event):
+        """(Subscription, event) -> bool
+        Queue event if it is of a kind taken, making room as the policy
+        says, and return True if it was queued"""
+
+        if self.kinds is not None and not isinstance(event, self.kinds):
+            return False
+        if self.ready is None:
+            return self.put(event)
+        with self.ready:
+            queued = self.put(event)
+            if queued:
+                self.ready.notify()
+        return queued
+
+    def put(self, event):
+        """(Subscription, event) -> bool
+        Queue event as the policy says and return True if it was queued"""
+
+        queue = self.queue
+        if self.policy == COALESCE:
+            key = (type(event), getattr(event, 'player', None))
+            if key in queue:
+                del queue[key]
+                self.dropped += 1
+            elif len(queue) >= self.limit:
+                queue.popitem(last=False)
+                self.dropped += 1
+            queue[key] = event
+        elif len(queue) < self.limit or self.policy == KEEP_ALL:
+            queue.append(event)
+        elif self.policy == DROP_NEWEST:
+            self.dropped += 1
+            return False
+        else:
+            queue.popleft()
+            queue.append(event)
+            self.dropped += 1
+        return True
+
+    def poll(self):
+        """(Subscription) -> list of event
+        Take every event queued, oldest first, without waiting"""
+
+        if self.ready is None:
+            return self.take()
+        with self.ready:
+            return self.take()
+
+    def take(self):
+        """(Subscription) -> list of event
+        Empty the queue and return what it held, oldest first"""
+
+        if self.policy == COALESCE:
+            events = list(self.queue.values())
+        else:
+            events = list(self.queue)
+        self.queue.clear()
+        return events
+
+    def wait(self, timeout=None):
+        """(Subscription, float) -> list of event
+        Take every event queued, waiting up to timeout seconds (forever
+        if None) for one if there is none"""
+
+        if self.ready is None:
+            return self.take()
+        with self.ready:
+            if not self.queue:
+                self.ready.wait(timeout)
+            return self.take()
+
+    def close(self):
+        """(Subscription) -> NoneType
+        Stop taking events"""
+
+        self.bus.unsubscribe(self)
+
+
+class EventBus(object):
+    """Hands the events of a game to every subscription"""
+
+    def __init__(self, schedule=None):
+        """(EventBus, function) -> NoneType
+        schedule(pump) arranges for pump() to run soon; without it
+        handlers only get their events when pump() is called"""
+
+        self.schedule = schedule
+        self.scheduled = False
+        self.published = 0
+
+        # Replaced rather than changed, so publish() needs no lock
+        self.subscriptions = ()
+
+    def subscribe(self, handler=None, kinds=None, limit=QUEUE_LIMIT,
+                  policy=DROP_OLDEST):
+        """(EventBus, function, tuple of type, int, int) -> Subscription
+        Subscribe to the events of kinds (default: all), given to
+        handler by pump() or read from the subscription"""
+
+        subscription = Subscription(self, handler, kinds, limit, policy)
+        self.subscriptions += (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """(EventBus, Subscription) -> NoneType """
+
+        self.subscriptions = tuple(s for s in self.subscriptions
+                                   if s is not subscription)
+
+    def publish(self, event):
+        """(EventBus, event) -> NoneType
+        Queue event for every subscription taking it"""
+
+        self.published += 1
+        due = False
+        for subscription in self.subscriptions:
+            if subscription.offer(event) and \
+               subscription.handler is not None:
+                due = True
+        if due and not self.scheduled and self.schedule is not None:
+            self.scheduled = True
+            self.schedule(self.pump)
+
+    def pump(self):
+        """(EventBus) -> NoneType
+        Give the handlers every event queued for them"""
+
+        self.scheduled = False
+        for subscription in self.subscriptions:
+            if subscription.handler is not None:
+                for event in subscription.poll():
+                    subscription.handler(event)
@@ -0,0 +1,249 @@
+"""Ship layouts the computer hides its own fleet in
+
+A fleet laid out uniformly at random is easy prey for the density
+attacker, which bombs first where most layouts put a ship. The layouts
+kept here were picked out of many random ones for the shots they took
+to sink against the attackers of simulator.py: random shots, hunt and
+target (the medium computer) and probability density (the hard
+computer). Candidates race in rounds: every round each attacker plays
+every layout still in the race as many games as all rounds before, and
+the worse half is dropped, so the games go to the layouts worth telling
+apart. Thousands of games are played at once, one per row of the
+simulator's arrays.
+
+Layouts are built once per board configuration and kept in the opening
+tables cache (see tables.TableCache.fleet). A game draws one of them
+under a random symmetry of the board, so the computer does not hide its
+ships the same way every game.
+
+Building layouts requires NumPy; without it, and on boards above
+MAX_BOARDSIZE, the computer places its ships at random like everyone
+else. Layouts are raced on the first game of a configuration (about a
+second for the default fleet on a 10x10 board); `python fleet.py`
+builds them ahead of time, racing as many candidates as asked.
+
+Example:
+
+    layouts = cache.fleet(shipList, boardsize)
+    if layouts is not None:
+        layouts.place(board, rng)
+"""
+
+import argparse
+import struct
+
+from ai import transform
+from engine import shipMask, indices
+from placement import PlacementError
+from tables import TableCache, configKey
+from tournament import parseShips
+
+try:
+    import simulator
+except ImportError:  # NumPy is not installed
+    simulator = None
+
+
+# ################################
+#        Constants
+# ################################
+
+VERSION = 1
+MAGIC = b'BSHIPFLT'
+HEADER = struct.Struct('<8sIIII')  # magic, version, boardsize, sizes,
+                                   # layouts
+SIZE = struct.Struct('<II')        # size, number of ships
+SHIP = struct.Struct('<IHB')       # index, size, rotation
+SCORE = struct.Struct('<d')        # mean shots to sink a layout
+
+# Random layouts entering the race, and layouts kept at its end
+CANDIDATES = 256
+POOL = 16
+
+# Games every attacker plays on every layout in the first round
+FIRST_GAMES = 1
+
+# Boards above this size take too long to race layouts on (the density
+# attacker fires a shot at a time in every game)
+MAX_BOARDSIZE = 12
+
+
+# ################################
+#        Functions
+# ################################
+
+def attackers():
+    """() -> tuple of function
+    Return the strategies of simulator.py the layouts are raced against"""
+
+    return (simulator.randomShots, simulator.huntShots,
+            simulator.densityShots)
+
+
+def raceLayouts(shipList, boardsize, candidates=CANDIDATES, keep=POOL,
+                seed=0):
+    """(dict, int, int, int, int) -> tuple of (ndarray, ndarray)
+    Return the ship numbers of the keep layouts, out of candidates
+    random ones, that took the most shots to sink, one row per layout
+    (see simulator.Simulator.ships), and the mean shots they took, most
+    first"""
+
+    sim = simulator.Simulator(candidates, shipList, boardsize, seed=seed)
+    sim.placeShips()
+    layouts = sim.ships[1]
+    totals = simulator.np.zeros(candidates)
+    played = 0
+    games = FIRST_GAMES
+    alive = simulator.np.arange(candidates)
+    while True:
+        for strategy in attackers():
+            seed += 1
+            race = simulator.Simulator(len(alive) * games, shipList,
+                                       boardsize, seed=seed,
+                                       strategies=(strategy, strategy))
+            race.ships[1] = simulator.np.repeat(layouts[alive], games, 0)
+            shots = race.attack(0).reshape(len(alive), games)
+            totals[alive] += shots.sum(1)
+        played += games * len(attackers())
+        order = alive[simulator.np.argsort(-totals[alive], kind='mergesort')]
+        if len(alive) <= keep:
+            return layouts[order], totals[order] / played
+        alive = order[:max(keep, len(alive) // 2)]
+        games = played // len(attackers())
+
+
+def shipLayout(numbers):
+    """(ndarray) -> list of (int, int, int)
+    Return the (index, size, rotation) of every ship of a row of ship
+    numbers"""
+
+    ships = []
+    for number in range(1, int(numbers.max()) + 1):
+        cells = [int(n) for n in simulator.np.flatnonzero(numbers == number)]
+        rotation = int(len(cells) == 1 or cells[1] == cells[0] + 1)
+        ships.append((cells[0], len(cells), rotation))
+    return ships
+
+
+def buildFleet(shipList, boardsize, candidates=CANDIDATES, keep=POOL,
+               seed=0):
+    """(dict, int, int, int, int) -> bytes or NoneType
+    Return the content of the layouts file of a board configuration, or
+    None if NumPy is missing, the board is above MAX_BOARDSIZE or the
+    ships do not fit it"""
+
+    if simulator is None or boardsize > MAX_BOARDSIZE:
+        return None
+    try:
+        layouts, shots = raceLayouts(shipList, boardsize, candidates, keep,
+                                     seed)
+    except PlacementError:
+        return None
+    sizes = sorted(k for k in shipList if shipList[k])
+    parts = [HEADER.pack(MAGIC, VERSION, boardsize, len(sizes),
+                         len(layouts))]
+    for k in sizes:
+        parts.append(SIZE.pack(k, shipList[k]))
+    for numbers, mean in zip(layouts, shots):
+        parts.append(SCORE.pack(mean))
+        for index, size, rotation in shipLayout(numbers):
+            parts.append(SHIP.pack(index, size, rotation))
+    return b''.join(parts)
+
+
+# ################################
+#        Classes
+# ################################
+
+class FleetLayouts(object):
+    """Layouts of one configuration, read from a file"""
+
+    def __init__(self, path):
+        """(FleetLayouts, str) -> NoneType
+        Raise ValueError if path does not hold fleet layouts"""
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, self.boardsize, sizes, count = \
+            HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s does not hold fleet layouts' % path)
+
+        position = HEADER.size
+        self.shipList = {}
+        for i in range(sizes):
+            k, number = SIZE.unpack_from(data, position)
+            self.shipList[k] = number
+            position += SIZE.size
+        ships = sum(self.shipList.values())
+
+        # Mask of every ship of every layout, and the mean shots every
+        # layout took to sink
+        self.layouts = []
+        self.shots = []
+        for i in range(count):
+            self.shots.append(SCORE.unpack_from(data, position)[0])
+            position += SCORE.size
+            masks = []
+            for j in range(ships):
+                index, size, rotation = SHIP.unpack_from(data, position)
+                masks.append(shipMask(index, size, rotation, self.boardsize))
+                position += SHIP.size
+            self.layouts.append(masks)
+
+    def close(self):
+        """(FleetLayouts) -> NoneType
+        Nothing is held open: the file is read whole"""
+
+    def place(self, board, rng):
+        """(FleetLayouts, BoardState, Random) -> NoneType
+        Lay out the ships of an empty board as a random layout under a
+        random symmetry of the board"""
+
+        masks = self.layouts[rng.randrange(len(self.layouts))]
+        symmetry = rng.randrange(8)
+        for mask in masks:
+            moved = 0
+            for n in indices(mask):
+                moved |= 1 << transform(n, self.boardsize, symmetry)
+            board.addShip(moved)
+
+
+def main(argv=None):
+    """(list of str) -> NoneType
+    Build the layouts of a configuration into a cache directory"""
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('cache', help='opening tables cache directory '
+                                      '(the game uses ~/.battleship_cache)')
+    parser.add_argument('--ships', default='2:1,3:1,4:1,5:1',
+                        help='ships as size:number pairs')
+    parser.add_argument('--boardsize', type=int, default=10)
+    parser.add_argument('--candidates', type=int, default=CANDIDATES,
+                        help='random layouts entering the race')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    try:
+        shipList = parseShips(args.ships)
+    except ValueError as e:
+        parser.error(str(e))
+    if simulator is None:
+        parser.error('building layouts requires NumPy')
+    if args.boardsize > MAX_BOARDSIZE:
+        parser.error('boards above %s are not raced' % MAX_BOARDSIZE)
+    content = buildFleet(shipList, args.boardsize, args.candidates,
+                         seed=args.seed)
+    if content is None:
+        parser.error('the ships do not fit the board')
+    cache = TableCache(args.cache)
+    name = configKey(shipList, args.boardsize, 'fleet')
+    cache.store(name, content)
+    layouts = cache.fleet(shipList, args.boardsize)
+    print('%s: %d layouts taking %.1f to %.1f shots to sink' % (
+        name, len(layouts.layouts), min(layouts.shots),
+        max(layouts.shots)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+"""Compact append-only log of Battleship games, and a reader replaying them
+
+A log file starts with MAGIC and holds one record after another:
+
+    game    tag byte GAME_TAG, body length (uint32), then the seed
+            (uint64), win condition (uint8), boardsize (uint16), the
+            shipList as (size, number) pairs of uint16 and, for both
+            players, the (index uint32, size uint16, rotation uint8) of
+            every ship on their board
+    shot    5 bytes: tag byte SHOT_TAG | player << 2 | result, then the
+            location bombed (uint32)
+
+The shots of a game directly follow its game record. Next to the log,
+path + '.idx' holds two uint64 per game: where its game record and its
+first shot start, so the reader can jump to any game and move without
+scanning the log. The index is rebuilt from the log when missing or
+behind: the writer brings it up to date before appending, and the
+reader only trusts entries following each other from the start of the
+log. Everything is little-endian.
+
+Example:
+
+    log = GameLog('games.log')
+    log.startGame(game, seed)
+    log.shot(player, game.fire(index))
+    log.close()
+
+    reader = LogReader('games.log')
+    game = reader.replay(len(reader) - 1, moves=10)
+
+Usage:
+    python gamelog.py games.log
+    python gamelog.py games.log --game 12 --moves 30
+"""
+
+import argparse
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+from engine import Game, shipMask
+
+
+# ################################
+#        Constants
+# ################################
+
+MAGIC = b'BSHIPLOG\x01'
+
+GAME_TAG = 0x47
+SHOT_TAG = 0x80
+
+RECORD = struct.Struct('<BI')     # tag, game body length or location
+GAME = struct.Struct('<QBHH')     # seed, winCondition, boardsize, sizes
+FLEET = struct.Struct('<HH')      # size, number
+COUNT = struct.Struct('<H')       # ships on a board
+SHIP = struct.Struct('<IHB')      # index, size, rotation
+INDEX = struct.Struct('<QQ')      # game record offset, first shot offset
+
+NO_SEED = (1 << 64) - 1  # seed of games placed without a known seed
+
+# One game of a log: layouts[p] lists the (index, size, rotation) of the
+# ships on the board of player p, moves is the number of shots recorded
+GameRecord = namedtuple('GameRecord', 'number seed shipList boardsize '
+                                      'winCondition layouts moves')
+
+
+# ################################
+#        Classes
+# ################################
+
+class LogError(ValueError):
+    """The log does not hold what was asked for or disagrees with the
+    engine"""
+    pass
+
+
+class GameLog(object):
+    """Writer appending games to a log and its index"""
+
+    def __init__(self, path):
+        """(GameLog, str) -> NoneType
+        Open the log at path for appending, creating it if needed
+        Raise LogError if path holds something else"""
+
+        self.path = path
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+            self.file.flush()
+        self.reindex()
+        self.index = open(path + '.idx', 'ab')
+
+    def reindex(self):
+        """(GameLog) -> NoneType
+        Rewrite the index if it is missing or behind the log, and drop a
+        record cut short at the end of the log, before appending"""
+
+        with LogReader(self.path) as reader:
+            entries = b''.join(INDEX.pack(*offsets)
+                               for offsets in reader.offsets)
+            end = reader.end
+        if end < os.path.getsize(self.path):
+            self.file.truncate(end)
+            self.file.seek(end)
+        try:
+            with open(self.path + '.idx', 'rb') as index:
+                current = index.read()
+        except IOError:
+            current = None
+        if current != entries:
+            with open(self.path + '.idx', 'wb') as index:
+                index.write(entries)
+
+    def startGame(self, game, seed=None):
+        """(GameLog, Game, int) -> NoneType
+        Record the setup of game, whose ships are already placed"""
+
+        body = [GAME.pack(NO_SEED if seed is None else seed,
+                          game.winCondition, game.boardsize,
+                          len(game.shipList))]
+        for size in sorted(game.shipList):
+            body.append(FLEET.pack(size, game.shipList[size]))
+        for board in game.boards:
+            placements = board.placements()
+            body.append(COUNT.pack(len(placements)))
+            for p in placements:
+                body.append(SHIP.pack(p.index, p.size, p.rotation))
+        body = b''.join(body)
+
+        start = self.file.tell()
+        self.file.write(RECORD.pack(GAME_TAG, len(body)))
+        self.file.write(body)
+        self.index.write(INDEX.pack(start, self.file.tell()))
+
+    def shot(self, player, shot):
+        """(GameLog, int, Shot) -> NoneType
+        Record a shot fired by player"""
+
+        self.file.write(RECORD.pack(SHOT_TAG | player << 2 | shot.result,
+                                    shot.index))
+
+    def flush(self):
+        """(GameLog) -> NoneType
+        Push everything recorded so far to disk"""
+
+        self.file.flush()
+        self.index.flush()
+
+    def close(self):
+        """(GameLog) -> NoneType """
+
+        self.file.close()
+        self.index.close()
+
+
+class LogReader(object):
+    """Memory-mapped view of a log for looking up and replaying games
+
+    Only the index is held in memory, so logs larger than memory can be
+    read. A record cut short at the end of the log, such as the last
+    shot of a game still being written, is ignored."""
+
+    def __init__(self, path):
+        """(LogReader, str) -> NoneType
+        Raise LogError if path is not a game log"""
+
+        self.path = path
+        self.file = open(path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.data = None
+        if self.size:
+            self.data = mmap.mmap(self.file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        if self.size < len(MAGIC) or \
+           self.data[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise LogError('%s is not a game log' % path)
+        self.end = len(MAGIC)  # end of the last complete record
+        self.offsets = self.readIndex()
+
+    def __len__(self):
+        """(LogReader) -> int
+        Return the number of games in the log"""
+
+        return len(self.offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """(LogReader) -> NoneType """
+
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.file.close()
+
+    def readIndex(self):
+        """(LogReader) -> list of tuple
+        Return the offsets of every game, from the index file where it
+        agrees with the log, scanning the log for the rest"""
+
+        offsets = []
+        try:
+            with open(self.path + '.idx', 'rb') as index:
+                raw = index.read()
+        except IOError:
+            raw = b''
+
+        # Every game starts where the shots of the one before end, or a
+        # whole number of shots later
+        position = len(MAGIC)
+        for i in range(len(raw) // INDEX.size):
+            start, shots = INDEX.unpack_from(raw, i * INDEX.size)
+            if start < position or (start - position) % RECORD.size or \
+               (start != position and not offsets) or \
+               shots > self.size or self.tag(start) != GAME_TAG:
+                break
+            offsets.append((start, shots))
+            position = shots
+
+        position = offsets[-1][1] if offsets else len(MAGIC)
+        while position + RECORD.size <= self.size:
+            tag, length = RECORD.unpack_from(self.data, position)
+            if tag == GAME_TAG:
+                shots = position + RECORD.size + length
+                if shots > self.size:
+                    break
+                offsets.append((position, shots))
+                position = shots
+            elif tag & SHOT_TAG:
+                position += RECORD.size
+            else:
+                raise LogError('Corrupt record at byte %s of %s' %
+                               (position, self.path))
+        self.end = position
+        return offsets
+
+    def tag(self, position):
+        """(LogReader, int) -> int
+        Return the tag byte of the record at position, or None"""
+
+        if position + RECORD.size > self.size:
+            return None
+        return RECORD.unpack_from(self.data, position)[0]
+
+    def moves(self, number):
+        """(LogReader, int) -> int
+        Return the number of shots recorded for game number"""
+
+        shots = self.offsets[number][1]
+        if number + 1 < len(self.offsets):
+            end = self.offsets[number + 1][0]
+        else:
+            end = self.end
+        return (end - shots) // RECORD.size
+
+    def game(self, number):
+        """(LogReader, int) -> GameRecord
+        Return the setup of game number
+        Raise LogError if there is no such game"""
+
+        if not 0 <= number < len(self.offsets):
+            raise LogError('No game %s in %s' % (number, self.path))
+        position = self.offsets[number][0] + RECORD.size
+        seed, winCondition, boardsize, sizes = \
+            GAME.unpack_from(self.data, position)
+        position += GAME.size
+        shipList = {}
+        for i in range(sizes):
+            size, count = FLEET.unpack_from(self.data, position)
+            shipList[size] = count
+            position += FLEET.size
+        layouts = []
+        for player in range(2):
+            count = COUNT.unpack_from(self.data, position)[0]
+            position += COUNT.size
+            layout = []
+            for i in range(count):
+                layout.append(SHIP.unpack_from(self.data, position))
+                position += SHIP.size
+            layouts.append(layout)
+        return GameRecord(number, None if seed == NO_SEED else seed,
+                          shipList, boardsize, winCondition, layouts,
+                          self.moves(number))
+
+    def shots(self, number, start=0, stop=None):
+        """(LogReader, int, int, int) -> iterator of tuple
+        Yield the (player, index, result) of moves start to stop of
+        game number"""
+
+        moves = self.moves(number)
+        if stop is None or stop > moves:
+            stop = moves
+        data = self.data
+        position = self.offsets[number][1] + start * RECORD.size
+        for i in range(start, stop):
+            tag, index = RECORD.unpack_from(data, position)
+            yield tag >> 2 & 1, index, tag & 3
+            position += RECORD.size
+
+    def replay(self, number, moves=None, onShot=None):
+        """(LogReader, int, int, function) -> Game
+        Rebuild game number and play its first moves shots (default:
+        all of them), calling onShot(player, shot) after each one
+        Raise LogError if the engine disagrees with the log"""
+
+        record = self.game(number)
+        game = Game(record.shipList, record.boardsize, record.winCondition)
+        for board, layout in zip(game.boards, record.layouts):
+            for index, size, rotation in layout:
+                board.addShip(shipMask(index, size, rotation,
+                                       record.boardsize))
+
+        for player, index, result in self.shots(number, 0, moves):
+            if game.over or game.turn != player:
+                raise LogError('Game %s: shot out of turn' % number)
+            shot = game.fire(index)
+            if shot.result != result:
+                raise LogError('Game %s: shot at %s should be %s, not %s' %
+                               (number, index, result, shot.result))
+            if onShot is not None:
+                onShot(player, shot)
+        return game
+
+
+# ################################
+#        Functions
+# ################################
+
+def main(argv=None):
+    """(list of str) -> NoneType
+    List the games of a log, or replay one of them"""
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('path')
+    parser.add_argument('--game', type=int, default=None,
+                        help='replay this game')
+    parser.add_argument('--moves', type=int, default=None,
+                        help='stop the replay after this many shots')
+    args = parser.parse_args(argv)
+
+    with LogReader(args.path) as reader:
+        numbers = range(len(reader)) if args.game is None else [args.game]
+        for number in numbers:
+            record = reader.game(number)
+            game = reader.replay(number, args.moves)
+            print('game %s: %sx%s board, seed %s, %s moves, scores %s%s' % (
+                number, record.boardsize, record.boardsize, record.seed,
+                min(record.moves, args.moves if args.moves is not None
+                    else record.moves),
+                game.finalScores(), ', over' if game.over else ''))
+
+
+if __name__ == '__main__':
+    main()
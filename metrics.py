@@ -0,0 +1,209 @@
+"""Opt-in timings and counts for the hot paths of the game
+
+Nothing is measured until methods are instrumented: instrument() swaps
+a method for a wrapper timing every call, and restore() puts the
+original back, so the game runs untouched code when metrics are off.
+Measurements go into in-memory histograms with fixed buckets, and can be
+exported as Prometheus text or as a JSON snapshot.
+
+Example:
+
+    registry = Metrics()
+    registry.instrument(Board, 'bomb')
+    registry.instrumentPlacement()
+    ...
+    print(registry.prometheus())
+"""
+
+import bisect
+import json
+from timeit import default_timer as timer
+
+from placement import Layout
+
+
+# ################################
+#        Constants
+# ################################
+
+PREFIX = 'battleship_'
+
+# Upper bounds of the histogram buckets, in seconds for timings
+LATENCY_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4,
+                   5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = tuple(1 << i for i in range(0, 21, 2))
+
+
+# ################################
+#        Classes
+# ################################
+
+class Histogram(object):
+    """Counts of observed values falling under each bucket bound"""
+
+    def __init__(self, bounds):
+        """(Histogram, tuple of number) -> NoneType """
+
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last one is +Inf
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        """(Histogram, number) -> NoneType """
+
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        """(Histogram, float) -> number
+        Return the bucket bound below which a fraction q of the values
+        fall, or None if nothing was observed"""
+
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class Metrics(object):
+    """Registry of the histograms and gauges of one session
+
+    Every metric is identified by its name and a tuple of (label, value)
+    pairs."""
+
+    def __init__(self):
+        """(Metrics) -> NoneType """
+
+        self.histograms = {}
+        self.gauges = {}
+        self.originals = []  # (owner, attribute, original) instrumented
+
+    def histogram(self, name, bounds=LATENCY_BUCKETS, **labels):
+        """(Metrics, str, tuple, **str) -> Histogram
+        Return the histogram name with labels, creating it if needed"""
+
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(bounds)
+        return histogram
+
+    def gauge(self, name, value, **labels):
+        """(Metrics, str, number, **str) -> NoneType
+        Set gauge name with labels to value"""
+
+        self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def instrument(self, owner, attribute, name=None, after=None):
+        """(Metrics, class, str, str, function) -> NoneType
+        Time every call of method attribute of owner in the histogram
+        name_seconds (default: the method name), then call
+        after(self, *args) if given"""
+
+        original = owner.__dict__[attribute]
+        histogram = self.histogram('%s_seconds' % (name or attribute))
+
+        def wrapper(obj, *args, **kw):
+            start = timer()
+            try:
+                return original(obj, *args, **kw)
+            finally:
+                histogram.observe(timer() - start)
+                if after is not None:
+                    after(obj, *args)
+
+        wrapper.__name__ = original.__name__
+        wrapper.__doc__ = original.__doc__
+        self.originals.append((owner, attribute, original))
+        setattr(owner, attribute, wrapper)
+
+    def instrumentPlacement(self):
+        """(Metrics) -> NoneType
+        Time ship placement and count the placements tried by each
+        search of placement.Layout in placement_attempts"""
+
+        attempts = self.histogram('placement_attempts', COUNT_BUCKETS)
+        for attribute in ('place', 'pack'):
+            self.instrument(Layout, attribute, 'placement_%s' % attribute,
+                            lambda layout, *args: attempts.observe(
+                                layout.tries))
+
+    def restore(self):
+        """(Metrics) -> NoneType
+        Put back every method instrumented"""
+
+        while self.originals:
+            owner, attribute, original = self.originals.pop()
+            setattr(owner, attribute, original)
+
+    def snapshot(self):
+        """(Metrics) -> dict
+        Return every metric as plain data, ready for JSON"""
+
+        def label(name, labels):
+            if not labels:
+                return name
+            return '%s{%s}' % (name, ','.join('%s=%s' % l for l in labels))
+
+        result = {'histograms': {}, 'gauges': {}}
+        for (name, labels), h in sorted(self.histograms.items()):
+            result['histograms'][label(name, labels)] = {
+                'count': h.count, 'sum': h.total,
+                'p50': h.quantile(0.5), 'p90': h.quantile(0.9),
+                'p99': h.quantile(0.99),
+                'buckets': dict(('%g' % b, c) for b, c in
+                                zip(h.bounds, h.counts) if c)}
+            if h.counts[-1]:
+                result['histograms'][label(name, labels)]['buckets'][
+                    '+Inf'] = h.counts[-1]
+        for (name, labels), value in sorted(self.gauges.items()):
+            result['gauges'][label(name, labels)] = value
+        return result
+
+    def prometheus(self):
+        """(Metrics) -> str
+        Return every metric in the Prometheus text format"""
+
+        def label(labels, extra=()):
+            pairs = ['%s="%s"' % l for l in labels + extra]
+            return '{%s}' % ','.join(pairs) if pairs else ''
+
+        lines = []
+        for (name, labels), h in sorted(self.histograms.items()):
+            metric = PREFIX + name
+            lines.append('# TYPE %s histogram' % metric)
+            seen = 0
+            for bound, count in zip(h.bounds, h.counts):
+                seen += count
+                lines.append('%s_bucket%s %s' % (
+                    metric, label(labels, (('le', '%g' % bound),)), seen))
+            lines.append('%s_bucket%s %s' % (
+                metric, label(labels, (('le', '+Inf'),)), h.count))
+            lines.append('%s_sum%s %r' % (metric, label(labels), h.total))
+            lines.append('%s_count%s %s' % (metric, label(labels), h.count))
+        names = set()
+        for (name, labels), value in sorted(self.gauges.items()):
+            if name not in names:
+                lines.append('# TYPE %s%s gauge' % (PREFIX, name))
+                names.add(name)
+            lines.append('%s%s%s %s' % (PREFIX, name, label(labels), value))
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path):
+        """(Metrics, str) -> NoneType
+        Write every metric to path: JSON if it ends in .json, otherwise
+        Prometheus text"""
+
+        with open(path, 'w') as f:
+            if path.endswith('.json'):
+                json.dump(self.snapshot(), f, indent=2, sort_keys=True)
+            else:
+                f.write(self.prometheus())
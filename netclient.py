@@ -0,0 +1,97 @@
+"""Client for the Battleship game server (see server.py)
+
+Works with Python 2 and 3 and uses plain sockets, so a Tkinter window can
+poll() for server events from an after() callback without blocking.
+
+Example:
+
+    client = Client('127.0.0.1')
+    client.send('new', opponent='computer', level=2)
+    print client.wait('start')['ships']
+    client.send('fire', index=42)
+    print client.wait('shot')
+"""
+
+import errno
+import json
+import select
+import socket
+import time
+
+
+# ################################
+#        Classes
+# ################################
+
+class Client(object):
+    """Connection to a Battleship game server"""
+
+    def __init__(self, host='127.0.0.1', port=8642, timeout=10):
+        """(Client, str, int, float) -> NoneType """
+
+        self.sock = socket.create_connection((host, port), timeout)
+        self.buffer = b''
+        self.events = []  # events received but not handed out yet
+
+    def send(self, op, **fields):
+        """(Client, str) -> NoneType
+        Send request op with the given fields to the server"""
+
+        fields['op'] = op
+        self.sock.sendall((json.dumps(fields) + '\n').encode())
+
+    def read(self, timeout):
+        """(Client, float) -> bool
+        Read what the server sent within timeout seconds (None: wait)
+        Return False once the server has closed the connection"""
+
+        ready = select.select([self.sock], [], [], timeout)[0]
+        if not ready:
+            return True
+        try:
+            data = self.sock.recv(65536)
+        except socket.error as error:
+            if error.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return True
+            raise
+        if not data:
+            return False
+        self.buffer += data
+        while b'\n' in self.buffer:
+            line, self.buffer = self.buffer.split(b'\n', 1)
+            self.events.append(json.loads(line.decode()))
+        return True
+
+    def poll(self):
+        """(Client) -> list of dict
+        Return the events received so far, without waiting"""
+
+        self.read(0)
+        events, self.events = self.events, []
+        return events
+
+    def wait(self, event, timeout=10):
+        """(Client, str, float) -> dict
+        Return the next event of kind event, waiting up to timeout
+        seconds. Events of other kinds stay queued for poll()
+        Raise ValueError if the server reports an error first"""
+
+        deadline = time.time() + timeout
+        while True:
+            for i, message in enumerate(self.events):
+                if message['event'] in (event, 'error'):
+                    del self.events[i]
+                    if message['event'] == 'error':
+                        raise ValueError(message['message'])
+                    return message
+            left = deadline - time.time()
+            if left <= 0:
+                raise socket.timeout('No %s event from the server' % event)
+            if not self.read(left):
+                raise IOError('Connection closed by server')
+
+    def close(self):
+        """(Client) -> NoneType
+        Disconnect from the server"""
+
+        self.sock.close()
@@ -0,0 +1,355 @@
+"""Exact ship placement for Battleship boards
+
+Every ship is placed uniformly at random among the locations still legal
+for it. When a ship has nowhere left to go, earlier ships are moved
+(backtracking). Crowded boards where that keeps running into dead ends
+are handed to a complete search filling the board location by location,
+so a layout is always found when one exists; its layouts vary, but are
+not drawn uniformly. Free space is tracked as one bitmask per row and
+per column, so checking whether a ship fits costs a couple of operations
+on boardsize-bit integers."""
+
+import random
+from collections import Counter
+
+
+# Random draws tried before listing every legal placement of a ship
+SAMPLE_ATTEMPTS = 16
+
+# Dead ends the random placement may back out of before switching
+# to the complete search
+BACKTRACK_BUDGET = 64
+
+# Dead-end layouts remembered while backtracking
+FAILED_LIMIT = 100000
+
+
+# ################################
+#        Functions
+# ################################
+
+def runStarts(free, size):
+    """(int, int) -> int
+    Return the mask of positions in free starting a run of size set bits"""
+
+    run = 1
+    while run < size:
+        step = min(run, size - run)
+        free &= free >> step
+        run += step
+    return free
+
+
+def checkFleet(shipList, boardsize):
+    """(dict, int) -> NoneType
+    Raise PlacementError if shipList can obviously never fit the board"""
+
+    sizes = []
+    for k, v in shipList.items():
+        sizes.extend([k] * v)
+    tooLong = [k for k in sizes if k > boardsize]
+    if tooLong:
+        raise PlacementError(tooLong, 'Ships longer than the board')
+    if sum(sizes) > pow(boardsize, 2):
+        raise PlacementError(sizes, 'Ships cover more than the whole board')
+
+
+def placeFleet(shipList, boardsize, rng=random, limit=None):
+    """(dict, int, Random, int) -> list of (int, int, int)
+    Return the (size, index, rotation) of every ship of shipList
+    Raise PlacementError if no layout exists, or if none was found
+    after trying limit placements"""
+
+    checkFleet(shipList, boardsize)
+    budget = sum(shipList.values()) + BACKTRACK_BUDGET
+    layout = Layout(boardsize).place(shipList, rng, budget)
+    if layout is None:
+        layout = Layout(boardsize).pack(shipList, rng, limit)
+    return layout
+
+
+# ################################
+#        Classes
+# ################################
+
+class PlacementError(ValueError):
+    """Raised when ships cannot be fitted on a board"""
+
+    def __init__(self, sizes, reason='No layout exists'):
+        """(PlacementError, list of int, str) -> NoneType
+        sizes are the ships that could not be placed"""
+
+        ValueError.__init__(self, reason)
+        self.sizes = sizes
+
+    def summary(self):
+        """(PlacementError) -> dict
+        Map every ship size to the number of ships that failed"""
+
+        return dict(Counter(self.sizes))
+
+
+class Layout(object):
+    """Free space on a board while ships are being placed"""
+
+    def __init__(self, boardsize):
+        """(Layout, int) -> NoneType """
+
+        self.boardsize = boardsize
+        self.full = (1 << boardsize) - 1
+        self.rows = [0] * boardsize  # bit c of rows[r] = location r, c taken
+        self.cols = [0] * boardsize  # bit r of cols[c] = location r, c taken
+        self.free = pow(boardsize, 2)
+        self.tries = 0  # placements tried by place() and pack()
+
+    def fits(self, size, rotation, line, start):
+        """(Layout, int, int, int, int) -> bool
+        Return True if a ship of size fits at start along line
+        Rotation 1 runs along row line, rotation 0 down column line"""
+
+        lines = self.rows if rotation else self.cols
+        return not lines[line] >> start & ((1 << size) - 1)
+
+    def put(self, size, rotation, line, start):
+        """(Layout, int, int, int, int) -> NoneType
+        Mark a ship of size at start along line as taken
+        Putting the same ship a second time removes it"""
+
+        if rotation:
+            self.rows[line] ^= ((1 << size) - 1) << start
+            cross = self.cols
+        else:
+            self.cols[line] ^= ((1 << size) - 1) << start
+            cross = self.rows
+        for j in range(start, start + size):
+            cross[j] ^= 1 << line
+
+    def sample(self, size, rng):
+        """(Layout, int, Random) -> tuple of int or NoneType
+        Return a random (rotation, line, start) a ship of size fits at
+        Every such placement is equally likely. None if there is none"""
+
+        # Cheap first: draw from all placements on an empty board
+        # and keep the first that is still free
+        span = self.boardsize - size + 1
+        count = self.boardsize * span
+        for i in range(SAMPLE_ATTEMPTS):
+            p = rng.randrange(0, count if size == 1 else 2 * count)
+            choice = (int(p < count), p % count // span, p % span)
+            if self.fits(size, *choice):
+                return choice
+
+        legal = self.legal(size)
+        if not legal:
+            return None
+        return legal[rng.randrange(0, len(legal))]
+
+    def legal(self, size):
+        """(Layout, int) -> list of tuple of int
+        Return every (rotation, line, start) a ship of size fits at"""
+
+        result = []
+        rotations = (1,) if size == 1 else (1, 0)
+        for rotation in rotations:
+            lines = self.rows if rotation else self.cols
+            for line in range(self.boardsize):
+                starts = runStarts(~lines[line] & self.full, size)
+                while starts:
+                    low = starts & -starts
+                    result.append((rotation, line, low.bit_length() - 1))
+                    starts ^= low
+        return result
+
+    def place(self, shipList, rng=random, limit=None):
+        """(Layout, dict, Random, int) -> list of (int, int, int)
+        Place every ship of shipList, largest first, backtracking on
+        dead ends. Return the (size, index, rotation) of every ship
+        where index is the top-left location of the ship
+        Return None if limit placements were tried without success
+        Raise PlacementError if no layout exists"""
+
+        order = []
+        for k in sorted(shipList, reverse=True):
+            order.extend([k] * shipList[k])
+        area = [0] * (len(order) + 1)  # area of the ships still to place
+        for i in range(len(order) - 1, -1, -1):
+            area[i] = area[i + 1] + order[i]
+
+        # choices[i] = [placement of ship i, untried alternatives]
+        choices = []
+        failed = set()  # (rows, i) known not to lead to a layout
+        pending = None
+        deepest = 0
+        i = 0
+        while i < len(order):
+            k = order[i]
+            if pending is None:
+                node = [None, None]
+                if area[i] <= self.free and \
+                   not (failed and (tuple(self.rows), i) in failed):
+                    node[0] = self.sample(k, rng)
+            else:
+                node, pending = pending, None
+                if node[1] is None:
+                    node[1] = [c for c in self.legal(k) if c != node[0]]
+                    rng.shuffle(node[1])
+                node[0] = node[1].pop() if node[1] else None
+
+            self.tries += 1
+            if limit is not None and self.tries > limit:
+                return None
+
+            # Dead end: move the previous ship somewhere else
+            if node[0] is None:
+                if len(failed) < FAILED_LIMIT:
+                    failed.add((tuple(self.rows), i))
+                if i == 0:
+                    raise PlacementError(order[deepest:])
+                i -= 1
+                pending = choices.pop()
+                self.put(order[i], *pending[0])
+                self.free += order[i]
+                continue
+
+            self.put(k, *node[0])
+            self.free -= k
+            choices.append(node)
+            i += 1
+            deepest = max(deepest, i)
+
+        result = []
+        for k, (rotation, line, start) in zip(order, [c[0] for c in choices]):
+            if rotation:
+                index = line * self.boardsize + start
+            else:
+                index = start * self.boardsize + line
+            result.append((k, index, rotation))
+        return result
+
+    def nextFree(self, index):
+        """(Layout, int) -> int or NoneType
+        Return the first location from index onwards that is not taken"""
+
+        r, c = divmod(index, self.boardsize)
+        while r < self.boardsize:
+            free = ~self.rows[r] & self.full & ~((1 << c) - 1)
+            if free:
+                return r * self.boardsize + (free & -free).bit_length() - 1
+            r += 1
+            c = 0
+        return None
+
+    def pack(self, shipList, rng=random, limit=None):
+        """(Layout, dict, Random, int) -> list of (int, int, int)
+        Fill the board location by location: the first location not yet
+        taken starts the largest remaining ship that fits, or stays empty
+        Dead ends are remembered by the rows still being filled and the
+        ships left, so equivalent layouts are never searched twice
+        Ships are turned either way first at random and the layout found
+        is flipped and turned at random, so crowded boards get varied
+        layouts, though not all of them equally likely
+        Return the (size, index, rotation) of every ship
+        Raise PlacementError if no layout exists or limit is exceeded"""
+
+        sizes = sorted(shipList, reverse=True)
+        left = [shipList[k] for k in sizes]
+        slack = pow(self.boardsize, 2) - sum(k * v for k, v in zip(sizes, left))
+        depth = max(sizes) if sizes else 1
+
+        # frames[i] = [location, untried options, applied option, key]
+        # An option is (position in sizes, rotation), or None for
+        # leaving the location empty
+        frames = []
+        failed = set()
+        index = self.nextFree(0)
+        while sum(left):
+            frame = None
+            if index is not None:
+                r, c = divmod(index, self.boardsize)
+                key = (index, tuple(left), self.rows[r] >> c) + \
+                    tuple(self.rows[r + 1:r + depth])
+                if key not in failed:
+                    options = self.options(r, c, sizes, left, rng)
+                    if slack:
+                        options.insert(0, None)
+                    frame = [index, options, None, key]
+
+            # Dead end: take back locations until one has options left
+            while frame is None or not frame[1]:
+                if frame is not None and len(failed) < FAILED_LIMIT:
+                    failed.add(frame[3])
+                if not frames:
+                    raise PlacementError(
+                        [k for k, n in zip(sizes, left) for i in range(n)])
+                frame = frames.pop()
+                slack += self.apply(frame, sizes, left, -1)
+
+            self.tries += 1
+            if limit is not None and self.tries > limit:
+                raise PlacementError(
+                    [k for k, n in zip(sizes, left) for i in range(n)],
+                    'Gave up searching')
+
+            frame[2] = frame[1].pop()
+            slack -= self.apply(frame, sizes, left, 1)
+            frames.append(frame)
+            index = self.nextFree(frame[0])
+
+        # Pick one of the eight symmetries of the board
+        flipRows, flipCols, turn = [rng.randrange(0, 2) for i in range(3)]
+        last = self.boardsize - 1
+        result = []
+        for index, options, option, key in frames:
+            if option is None:
+                continue
+            k, rotation = sizes[option[0]], option[1]
+            r, c = divmod(index, self.boardsize)
+            if flipRows:
+                r = last - r - (0 if rotation else k - 1)
+            if flipCols:
+                c = last - c - (k - 1 if rotation else 0)
+            if turn:
+                r, c, rotation = c, r, int(k > 1 and not rotation)
+            result.append((k, r * self.boardsize + c, rotation))
+        return result
+
+    def options(self, r, c, sizes, left, rng=random):
+        """(Layout, int, int, list of int, list of int, Random) -> list
+        Return the (position in sizes, rotation) of every remaining ship
+        that fits with its top-left end at location r, c
+        The option to try first comes last: larger ships first, each
+        one turned either way first at random"""
+
+        result = []
+        for j, k in enumerate(sizes):
+            if not left[j]:
+                continue
+            turns = [0, 1] if k > 1 else [1]
+            if rng.randrange(0, 2):
+                turns.reverse()
+            for rotation in turns:
+                if rotation:
+                    fits = c + k <= self.boardsize and self.fits(k, 1, r, c)
+                else:
+                    fits = r + k <= self.boardsize and self.fits(k, 0, c, r)
+                if fits:
+                    result.append((j, rotation))
+        result.reverse()
+        return result
+
+    def apply(self, frame, sizes, left, direction):
+        """(Layout, list, list of int, list of int, int) -> int
+        Apply the option chosen at frame (direction 1) or take it back
+        (direction -1). Return the number of locations left empty"""
+
+        r, c = divmod(frame[0], self.boardsize)
+        if frame[2] is None:
+            self.put(1, 1, r, c)
+            return 1
+        j, rotation = frame[2]
+        if rotation:
+            self.put(sizes[j], 1, r, c)
+        else:
+            self.put(sizes[j], 0, c, r)
+        left[j] -= direction
+        return 0
@@ -0,0 +1,280 @@
+"""Player statistics and Elo ratings kept in a SQLite database
+
+Every finished game is stored with both players' scores under both win
+conditions, whichever one decided the game, and updates the players'
+Elo ratings. Results are written in batches inside one transaction and
+the database runs in WAL mode, so recording thousands of games a second
+does not wait on the disk. Running totals are kept on every player, so
+the leaderboard is one indexed query however many games were played.
+
+Only one process should write to a database at a time: ratings and
+game ids are tracked in memory between flushes.
+
+Example:
+
+    store = RatingStore('stats.db')
+    store.recordGame(['Alice', 'Bob'], game)
+    store.flush()
+    print store.leaderboard(10)
+
+Usage:
+    python ratings.py stats.db --top 20
+    python ratings.py stats.db --player Alice
+"""
+
+import argparse
+import sqlite3
+import time
+
+from scoring import MovesRule
+
+
+# ################################
+#        Constants
+# ################################
+
+INITIAL_RATING = 1500.0
+K_FACTOR = 32.0
+
+# Games held in memory before they are written
+BATCH = 1000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    rating REAL NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    draws INTEGER NOT NULL DEFAULT 0,
+    shots INTEGER NOT NULL DEFAULT 0,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS playersByRating ON players (rating DESC);
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    played REAL NOT NULL,
+    winCondition INTEGER NOT NULL,
+    boardsize INTEGER NOT NULL,
+    winner INTEGER
+);
+CREATE TABLE IF NOT EXISTS scores (
+    game INTEGER NOT NULL,
+    seat INTEGER NOT NULL,
+    player INTEGER NOT NULL,
+    points INTEGER NOT NULL,
+    hitsPerMove REAL NOT NULL,
+    shots INTEGER NOT NULL,
+    hits INTEGER NOT NULL,
+    sinks INTEGER NOT NULL,
+    PRIMARY KEY (game, seat)
+);
+CREATE INDEX IF NOT EXISTS scoresByPlayer ON scores (player, game);
+'''
+
+
+# ################################
+#        Functions
+# ################################
+
+def expected(rating, other):
+    """(float, float) -> float
+    Return the score a player rated rating is expected to get against
+    a player rated other: 1 for a sure win, 0 for a sure loss"""
+
+    return 1.0 / (1.0 + pow(10.0, (other - rating) / 400.0))
+
+
+# ################################
+#        Classes
+# ################################
+
+class RatingStore(object):
+    """Games, scores and ratings of players in a SQLite database"""
+
+    def __init__(self, path, batch=BATCH, k=K_FACTOR):
+        """(RatingStore, str, int, float) -> NoneType
+        Open or create the database at path (':memory:' for none)"""
+
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self.batch = batch
+        self.k = k
+        self.moves = MovesRule()
+
+        # name -> [id, rating, games, wins, draws, shots, hits] of the
+        # players seen, and the ids of the players changed since the
+        # last flush
+        self.players = {}
+        self.changed = set()
+        self.games = []
+        self.scores = []
+        self.nextGame = self.db.execute(
+            'SELECT COALESCE(MAX(id), 0) + 1 FROM games').fetchone()[0]
+
+    def player(self, name):
+        """(RatingStore, str) -> list
+        Return the cached row of player name, adding the player if new"""
+
+        row = self.players.get(name)
+        if row is None:
+            found = self.db.execute(
+                'SELECT id, rating, games, wins, draws, shots, hits '
+                'FROM players WHERE name = ?', (name,)).fetchone()
+            if found is None:
+                cursor = self.db.execute(
+                    'INSERT INTO players (name, rating) VALUES (?, ?)',
+                    (name, INITIAL_RATING))
+                found = (cursor.lastrowid, INITIAL_RATING, 0, 0, 0, 0, 0)
+            row = self.players[name] = list(found)
+        return row
+
+    def record(self, names, stats, winner, winCondition, boardsize,
+               played=None):
+        """(RatingStore, list of str, list of Stats, int, int, int, float)
+        -> int
+        Record a finished game between players names[0] and names[1]
+        stats[p] are the scoring.Stats of player p and winner is None on
+        a draw. Return the id of the game, or None without recording
+        anything if both players have the same name"""
+
+        # Both seats would share one row, rating a player against itself
+        if names[0] == names[1]:
+            return None
+        rows = [self.player(name) for name in names]
+        number = self.nextGame
+        self.nextGame += 1
+        self.games.append((number, time.time() if played is None else played,
+                           winCondition, boardsize,
+                           None if winner is None else rows[winner][0]))
+
+        for seat in range(2):
+            s = stats[seat]
+            self.scores.append((number, seat, rows[seat][0], s.points,
+                                self.moves.score(s), s.shots, s.hits,
+                                s.sinks))
+
+        # Elo: the winner scores 1, the loser 0, a draw 0.5 each
+        ratings = [rows[0][1], rows[1][1]]
+        for seat in range(2):
+            row = rows[seat]
+            result = 0.5 if winner is None else float(winner == seat)
+            row[1] += self.k * (result - expected(ratings[seat],
+                                                  ratings[1 - seat]))
+            row[2] += 1
+            row[3] += winner == seat
+            row[4] += winner is None
+            row[5] += stats[seat].shots
+            row[6] += stats[seat].hits
+            self.changed.add(row[0])
+
+        if len(self.games) >= self.batch:
+            self.flush()
+        return number
+
+    def recordGame(self, names, game, played=None):
+        """(RatingStore, list of str, Game, float) -> int
+        Record a finished engine.Game (see record)"""
+
+        return self.record(names, game.scoreboard.stats, game.winner(),
+                           game.winCondition, game.boardsize, played)
+
+    def flush(self):
+        """(RatingStore) -> NoneType
+        Write the games recorded so far in one transaction"""
+
+        updates = [row[1:] + row[:1] for row in self.players.values()
+                   if row[0] in self.changed]
+        with self.db:
+            self.db.executemany(
+                'INSERT INTO games VALUES (?, ?, ?, ?, ?)', self.games)
+            self.db.executemany(
+                'INSERT INTO scores VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                self.scores)
+            self.db.executemany(
+                'UPDATE players SET rating = ?, games = ?, wins = ?, '
+                'draws = ?, shots = ?, hits = ? WHERE id = ?', updates)
+        self.games = []
+        self.scores = []
+        self.changed.clear()
+
+    def leaderboard(self, limit=10, minGames=1):
+        """(RatingStore, int, int) -> list of tuple
+        Return the (name, rating, games, wins, draws, accuracy) of the
+        limit best rated players with at least minGames games"""
+
+        self.flush()
+        return self.db.execute(
+            'SELECT name, rating, games, wins, draws, '
+            'CAST(hits AS REAL) / MAX(shots, 1) FROM players '
+            'WHERE games >= ? ORDER BY rating DESC LIMIT ?',
+            (minGames, limit)).fetchall()
+
+    def history(self, name, limit=10):
+        """(RatingStore, str, int) -> list of tuple
+        Return the (game, played, winCondition, won, points, hitsPerMove)
+        of the last limit games of player name, most recent first"""
+
+        self.flush()
+        return self.db.execute(
+            'SELECT g.id, g.played, g.winCondition, g.winner = s.player, '
+            's.points, s.hitsPerMove FROM scores s '
+            'JOIN games g ON g.id = s.game '
+            'WHERE s.player = (SELECT id FROM players WHERE name = ?) '
+            'ORDER BY s.game DESC LIMIT ?', (name, limit)).fetchall()
+
+    def rating(self, name):
+        """(RatingStore, str) -> float or NoneType
+        Return the rating of player name, None if never seen"""
+
+        row = self.players.get(name)
+        if row is None:
+            row = self.db.execute('SELECT id, rating FROM players '
+                                  'WHERE name = ?', (name,)).fetchone()
+        return None if row is None else row[1]
+
+    def close(self):
+        """(RatingStore) -> NoneType
+        Write what is left and close the database"""
+
+        self.flush()
+        self.db.close()
+
+
+def main(argv=None):
+    """(list of str) -> NoneType
+    Show the leaderboard or the last games of a player"""
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('path')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--min-games', type=int, default=1)
+    parser.add_argument('--player', default=None,
+                        help='show the last games of this player')
+    args = parser.parse_args(argv)
+
+    store = RatingStore(args.path)
+    try:
+        if args.player:
+            for number, played, winCondition, won, points, average in \
+                    store.history(args.player, args.top):
+                print('%8s  %s  %-6s  %-4s  %4s points  %.2f hits per move'
+                      % (number, time.strftime('%Y-%m-%d %H:%M',
+                                               time.localtime(played)),
+                         ('points', 'moves')[winCondition],
+                         'won' if won else '', points, average))
+        else:
+            print('%-20s %8s %8s %8s %8s %9s' % (
+                'Player', 'Rating', 'Games', 'Wins', 'Draws', 'Accuracy'))
+            for name, rating, games, wins, draws, accuracy in \
+                    store.leaderboard(args.top, args.min_games):
+                print('%-20s %8.1f %8s %8s %8s %8.1f%%' % (
+                    name, rating, games, wins, draws, 100 * accuracy))
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
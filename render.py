@@ -0,0 +1,367 @@
+"""Drawing helpers for the Battleship canvas
+
+Nothing here imports Tkinter: everything works on the Canvas and widgets
+handed in, so the module loads on machines without a display."""
+
+from engine import maskPlacement
+
+
+# ################################
+#        Constants
+# ################################
+
+MARKER_FONT = 'Helvetica 10 bold'
+WATER = '#0055ff'
+
+# Ships and their names; a ship dragged over another turns CLASH
+SHIP = 'orange'
+CLASH = 'red'
+SHIP_FONT = 'Courier 6'
+SHIP_NAMES = {2: 'BOAT', 3: 'SUB', 4: 'CRUISER', 5: 'CARRIER'}
+
+# Names are left out of squares smaller than this
+MIN_NAMED_CELL = 12
+
+# Boards above this size are drawn as one image instead of one
+# rectangle per location
+LARGE_BOARD = 30
+
+# Largest canvas shown before scrolling, in pixels
+VIEWPORT = 600
+
+# Space around the squares of a board: left of them, above them (for the
+# title) and right of and below them
+LEFT_MARGIN = 20
+TOP_MARGIN = 40
+MARGIN = 20
+
+# Size of a square, in pixels
+MIN_CELL = 2
+MAX_CELL = 40
+DEFAULT_CELL = 20
+
+# Grid lines are left out when squares get smaller than this
+MIN_LINED_CELL = 6
+
+
+# ################################
+#        Functions
+# ################################
+
+def cellSize(boardsize):
+    """(int) -> int
+    Return the size of a square that fits the board and its margins in
+    the viewport, if any does"""
+
+    room = VIEWPORT - max(LEFT_MARGIN, TOP_MARGIN) - MARGIN
+    return max(MIN_CELL, min(DEFAULT_CELL, room // boardsize))
+
+
+def shipName(size, rotation, cell):
+    """(int, int, int) -> str
+    Return the name drawn beside a ship of size, one letter per line
+    for vertical ships (rotation 0), for squares of size cell
+    Ships of custom sizes are named BATTLESHIP"""
+
+    if cell < MIN_NAMED_CELL:  # Names do not fit small squares
+        return ''
+    name = SHIP_NAMES.get(size, 'BATTLESHIP')
+    if rotation != 0:
+        return name
+    return ''.join(ch + '\n' for ch in name)
+
+
+def animate(widget, paint, colours, cycles, interval, done=None):
+    """(widget, function, tuple of str, int, int, function) -> NoneType
+    Call paint with each of colours in turn, cycles times, holding every
+    colour for interval milliseconds, then call done
+    Runs from after() callbacks, so the event loop is never blocked"""
+
+    steps = list(colours) * cycles
+
+    def step(i):
+        if i < len(steps):
+            paint(steps[i])
+            widget.after(interval, step, i + 1)
+        elif done is not None:
+            done()
+    step(0)
+
+
+def flash(widget, canvas, tag, colours, cycles, interval, done=None):
+    """(widget, Canvas, str, tuple of str, int, int, function) -> NoneType
+    Fill the items tagged tag with each of colours in turn (see animate)"""
+
+    animate(widget, lambda colour: canvas.itemconfig(tag, fill=colour),
+            colours, cycles, interval, done)
+
+
+# ################################
+#        Classes
+# ################################
+
+class Grid(object):
+    """Where the locations of a board sit on the canvas
+
+    Location n is the square in row n / boardsize and column
+    n % boardsize. Squares are cell pixels wide, the first one having
+    its top-left corner at left, top"""
+
+    def __init__(self, boardsize, cell=DEFAULT_CELL, left=LEFT_MARGIN,
+                 top=TOP_MARGIN):
+        """(Grid, int, int, int, int) -> NoneType """
+
+        self.boardsize = boardsize
+        self.cell = cell
+        self.left = left
+        self.top = top
+
+    def box(self, index):
+        """(Grid, int) -> tuple of int
+        Return the x0, y0, x1, y1 corners of the square at index"""
+
+        r, c = divmod(index, self.boardsize)
+        x = self.left + c * self.cell
+        y = self.top + r * self.cell
+        return x, y, x + self.cell, y + self.cell
+
+    def centre(self, index):
+        """(Grid, int) -> tuple of float
+        Return the x, y centre of the square at index"""
+
+        x0, y0, x1, y1 = self.box(index)
+        return (x0 + x1) / 2.0, (y0 + y1) / 2.0
+
+    def extent(self):
+        """(Grid) -> tuple of int
+        Return the width and height of the board drawing with margins"""
+
+        side = self.boardsize * self.cell
+        return self.left + side + MARGIN, self.top + side + MARGIN
+
+    def nearest(self, x, y):
+        """(Grid, float, float) -> tuple of int
+        Return the row and column of the square nearest canvas point
+        x, y, on the board or along its edge"""
+
+        last = self.boardsize - 1
+        c = int((x - self.left) // self.cell)
+        r = int((y - self.top) // self.cell)
+        return min(max(r, 0), last), min(max(c, 0), last)
+
+    def cellAt(self, x, y):
+        """(Grid, float, float) -> int or NoneType
+        Return the location of the square containing canvas point x, y,
+        or None if the point is off the board"""
+
+        c = int((x - self.left) // self.cell)
+        r = int((y - self.top) // self.cell)
+        if 0 <= r < self.boardsize and 0 <= c < self.boardsize:
+            return r * self.boardsize + c
+        return None
+
+
+class Markers(object):
+    """Squares of a board with hit and miss markers on top, at most one
+    Canvas item per location: created the first time a location is
+    marked and updated in place afterwards"""
+
+    def __init__(self, canvas, grid, tags=('text', 'marker')):
+        """(Markers, Canvas, Grid, tuple of str) -> NoneType """
+
+        self.canvas = canvas
+        self.grid = grid
+        self.tags = tags
+        self.items = {}  # location -> Canvas item
+
+        self.squares = []
+        for n in range(pow(grid.boardsize, 2)):
+            self.squares.append(canvas.create_rectangle(
+                grid.box(n), fill=WATER, width=2, tags='square'))
+
+    def show(self, index, text, fill):
+        """(Markers, int, str, str) -> NoneType
+        Mark location index with text in colour fill"""
+
+        item = self.items.get(index)
+        if item is None:
+            x, y = self.grid.centre(index)
+            self.items[index] = self.canvas.create_text(
+                x, y, text=text, fill=fill, font=MARKER_FONT, tags=self.tags)
+        else:
+            self.canvas.itemconfig(item, text=text, fill=fill)
+
+    def showAll(self, marks):
+        """(Markers, dict) -> NoneType
+        Mark every location of marks with its (text, fill)"""
+
+        for index, (text, fill) in marks.items():
+            self.show(index, text, fill)
+
+    def painter(self, index):
+        """(Markers, int) -> function
+        Return a function recolouring the marker of location index"""
+
+        item = self.items[index]
+        return lambda colour: self.canvas.itemconfig(item, fill=colour)
+
+    def rescale(self, cell):
+        """(Markers, int) -> NoneType
+        Follow a change of square size; items are scaled by the canvas"""
+
+        pass
+
+    def clear(self):
+        """(Markers) -> NoneType
+        Remove every marker"""
+
+        for item in self.items.values():
+            self.canvas.delete(item)
+        self.items.clear()
+
+
+class PixelBoard(object):
+    """Board drawn as one image for large boards: every location is a
+    pixel of a boardsize x boardsize image, zoomed up to the size of a
+    square. Marking a location repaints its square in the image, so
+    the number of Canvas items does not grow as the game goes on"""
+
+    def __init__(self, canvas, grid, photoImage, tags=('square',)):
+        """(PixelBoard, Canvas, Grid, class, tuple of str) -> NoneType
+        photoImage is the PhotoImage class of Tkinter"""
+
+        self.canvas = canvas
+        self.grid = grid
+        self.tags = tags
+        size = grid.boardsize
+        self.base = photoImage(width=size, height=size)
+        self.base.put(WATER, to=(0, 0, size, size))
+        self.image = None
+        self.item = None
+        self.lines = []
+        self.draw()
+
+    def draw(self):
+        """(PixelBoard) -> NoneType
+        Draw the image and grid lines at the current square size"""
+
+        grid = self.grid
+        self.image = self.base.zoom(grid.cell)
+        if self.item is None:
+            self.item = self.canvas.create_image(
+                grid.left, grid.top, image=self.image, anchor='nw',
+                tags=self.tags)
+        else:
+            self.canvas.itemconfig(self.item, image=self.image)
+
+        for line in self.lines:
+            self.canvas.delete(line)
+        self.lines = []
+        if grid.cell < MIN_LINED_CELL:
+            return
+        side = grid.boardsize * grid.cell
+        for i in range(grid.boardsize + 1):
+            offset = i * grid.cell
+            self.lines.append(self.canvas.create_line(
+                grid.left, grid.top + offset, grid.left + side,
+                grid.top + offset, tags=self.tags))
+            self.lines.append(self.canvas.create_line(
+                grid.left + offset, grid.top, grid.left + offset,
+                grid.top + side, tags=self.tags))
+        self.canvas.tag_raise(self.lines[0], self.item)
+        for line in self.lines[1:]:
+            self.canvas.tag_raise(line, self.lines[0])
+
+    def paint(self, index, colour):
+        """(PixelBoard, int, str) -> NoneType
+        Fill the square of location index with colour"""
+
+        r, c = divmod(index, self.grid.boardsize)
+        cell = self.grid.cell
+        self.base.put(colour, to=(c, r, c + 1, r + 1))
+        self.image.put(colour, to=(c * cell, r * cell,
+                                   (c + 1) * cell, (r + 1) * cell))
+
+    def show(self, index, text, fill):
+        """(PixelBoard, int, str, str) -> NoneType
+        Mark location index in colour fill; text does not fit a pixel"""
+
+        self.paint(index, fill)
+
+    def showAll(self, marks):
+        """(PixelBoard, dict) -> NoneType
+        Mark every location of marks with its (text, fill) and leave the
+        others as water, repainting the image in one go"""
+
+        size = self.grid.boardsize
+        colours = [WATER] * pow(size, 2)
+        for index, (text, fill) in marks.items():
+            colours[index] = fill
+        self.base.put(' '.join('{%s}' % ' '.join(colours[r:r + size])
+                               for r in range(0, len(colours), size)),
+                      to=(0, 0))
+        self.draw()
+
+    def painter(self, index):
+        """(PixelBoard, int) -> function
+        Return a function repainting the square of location index"""
+
+        return lambda colour: self.paint(index, colour)
+
+    def rescale(self, cell):
+        """(PixelBoard, int) -> NoneType
+        Redraw the image and grid lines for squares of size cell"""
+
+        self.draw()
+
+
+class Ships(object):
+    """Rectangle and name of every ship of a board, drawn once: moving a
+    ship changes the coordinates of its two Canvas items only"""
+
+    def __init__(self, canvas, grid, masks):
+        """(Ships, Canvas, Grid, list of int) -> NoneType
+        Draw a ship over the locations of every mask"""
+
+        self.canvas = canvas
+        self.grid = grid
+        self.rects = []   # Canvas rectangle of every ship
+        self.names = []   # Canvas text of every ship
+        for mask in masks:
+            box, position, name = self.outline(mask)
+            self.rects.append(canvas.create_rectangle(box, fill=SHIP,
+                                                      width=1))
+            self.names.append(canvas.create_text(
+                position, text=name, font=SHIP_FONT, fill='yellow'))
+
+    def outline(self, mask):
+        """(Ships, int) -> tuple
+        Return the rectangle corners, the name position and the name of
+        the ship covering mask"""
+
+        n, k, rotation = maskPlacement(mask)
+        x, y = self.grid.box(n)[:2]
+        cell = self.grid.cell
+        name = shipName(k, rotation, cell)
+        if rotation != 0:  # Horizontal
+            return ((x, y + cell / 4, x + k * cell, y + cell * 3 / 4),
+                    (x + cell, y), name)
+        return ((x + cell / 4, y, x + cell * 3 / 4, y + k * cell),
+                (x, y + cell), name)
+
+    def move(self, i, mask, fill=SHIP):
+        """(Ships, int, int, str) -> NoneType
+        Draw ship i over the locations of mask, filled with fill"""
+
+        box, position, name = self.outline(mask)
+        self.canvas.coords(self.rects[i], *box)
+        self.canvas.coords(self.names[i], *position)
+        self.canvas.itemconfig(self.rects[i], fill=fill)
+        self.canvas.itemconfig(self.names[i], text=name)
+
+    def lift(self, i):
+        """(Ships, int) -> NoneType
+        Draw ship i above the others"""
+
+        self.canvas.tag_raise(self.rects[i])
+        self.canvas.tag_raise(self.names[i])
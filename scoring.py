@@ -0,0 +1,132 @@
+"""Running scores of a Battleship game
+
+Every player's shots are folded into a few counters as they are fired,
+so scores can be read at any point of the game and cost the same on a
+100x100 board as on a 10x10 one. How the counters turn into a score is
+left to a rule; RULES holds one per win condition of engine.Game:
+
+Points:  each hit earns 1 point, sinking a ship instead earns points
+         equal to the size of the ship
+Moves:   hits per shot fired, rounded to 2 decimals
+
+Nothing here depends on the engine: shots are recorded as whether they
+hit and the size of the ship they sank, if any."""
+
+
+# ################################
+#        Classes
+# ################################
+
+class Stats(object):
+    """Counters of the shots fired by one player"""
+
+    __slots__ = ('shots', 'hits', 'sinks', 'points', 'sinceHit', 'drought')
+
+    def __init__(self):
+        """(Stats) -> NoneType """
+
+        self.shots = 0
+        self.hits = 0      # shots that hit a ship, sinking ones included
+        self.sinks = 0
+        self.points = 0    # 1 per hit, size of the ship per sink
+        self.sinceHit = 0  # shots fired since the last hit
+        self.drought = 0   # most shots fired in a row without a hit
+
+    @property
+    def misses(self):
+        """Number of shots that hit nothing"""
+
+        return self.shots - self.hits
+
+    @property
+    def accuracy(self):
+        """Hits per shot fired, 0.0 before the first shot"""
+
+        return float(self.hits) / self.shots if self.shots else 0.0
+
+    def record(self, hit, sunk=0):
+        """(Stats, bool, int) -> NoneType
+        Count a shot; sunk is the size of the ship it sank, if any"""
+
+        self.shots += 1
+        if not hit:
+            self.sinceHit += 1
+            self.drought = max(self.drought, self.sinceHit)
+            return
+        self.hits += 1
+        self.sinceHit = 0
+        if sunk:
+            self.sinks += 1
+            self.points += sunk
+        else:
+            self.points += 1
+
+
+class PointsRule(object):
+    """Score of the points earned by hits and sinks"""
+
+    name = 'points'
+    unit = 'points'
+
+    def score(self, stats):
+        """(PointsRule, Stats) -> int """
+
+        return stats.points
+
+
+class MovesRule(object):
+    """Score of the average hits per move"""
+
+    name = 'moves'
+    unit = 'hits per move'
+
+    def score(self, stats):
+        """(MovesRule, Stats) -> float """
+
+        if not stats.hits:
+            return 0
+        return float('%.2f' % stats.accuracy)
+
+
+# Rule of every win condition, in the order of engine.WIN_BY_POINTS and
+# engine.WIN_BY_MOVES
+RULES = (PointsRule, MovesRule)
+
+
+class Scoreboard(object):
+    """Counters of both players and the rule scoring them"""
+
+    def __init__(self, rule):
+        """(Scoreboard, rule) -> NoneType
+        rule has a score(Stats) method, like those of RULES"""
+
+        self.rule = rule
+        self.stats = [Stats(), Stats()]
+
+    def record(self, player, hit, sunk=0):
+        """(Scoreboard, int, bool, int) -> NoneType
+        Count a shot fired by player (see Stats.record)"""
+
+        self.stats[player].record(hit, sunk)
+
+    def scores(self):
+        """(Scoreboard) -> list of number
+        Return the score of both players so far"""
+
+        return [self.rule.score(stats) for stats in self.stats]
+
+    def winner(self):
+        """(Scoreboard) -> int or NoneType
+        Return the player with the highest score, or None on a draw"""
+
+        scores = self.scores()
+        if scores[0] == scores[1]:
+            return None
+        return scores.index(max(scores))
+
+    def margin(self):
+        """(Scoreboard) -> number
+        Return how far ahead the leading player is"""
+
+        scores = self.scores()
+        return max(scores) - min(scores)
@@ -0,0 +1,437 @@
+"""Battleship game server hosting many matches over TCP
+
+Requires Python 3 (asyncio). Every match lives on the server as an
+engine.Game, so the server decides the outcome of every shot; clients
+only send where they want to bomb. Messages are JSON objects, one per
+line, in both directions.
+
+Client requests ("op"):
+    new       start a match: ships, boardsize, winCondition, name and
+              opponent ("human" or "computer", with level 0-2)
+    list      ask for the matches waiting for a second player
+    join      join a match waiting for its second player: game, name
+    fire      bomb a location of the opponent's board, once the match
+              has started: index
+    leave     give up the current match
+
+Server events ("event"):
+    created   match created: game, player
+    games     matches waiting for a second player: games, a list of
+              game, name, boardsize and winCondition
+    start     both players are in: game, player, names, turn and the
+              (size, index, rotation) of the player's own ships
+    shot      a shot was fired: player, index, result ("miss", "hit" or
+              "sink"), size and, on a sink, the cells of the ship
+    over      match finished: scores, winner (null on a draw)
+    left      the opponent left the match
+    error     the request was refused: message
+
+Setting up a match and the computer's moves run in one worker thread,
+so the event loop keeps serving shots while the computer thinks.
+
+Usage:
+    python3 server.py --host 0.0.0.0 --port 8642 --cache ~/.battleship_cache
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ai import Targeting, HARD, LEVELS
+from engine import Game, BoardState, MISS, HIT, SINK, indices
+from tables import TableCache
+from endgame import EndgameSolver
+
+
+# ################################
+#        Constants
+# ################################
+
+PORT = 8642
+RESULTS = {MISS: 'miss', HIT: 'hit', SINK: 'sink'}
+
+# Longest request line accepted from a client, in bytes
+LINE_LIMIT = 64 * 1024
+
+# Largest board a client may ask for
+MAX_BOARDSIZE = 100
+
+
+# ################################
+#        Functions
+# ################################
+
+def encode(message):
+    """(dict) -> bytes
+    Return message as one line of JSON"""
+
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode()
+
+
+def readShipList(ships, boardsize):
+    """(dict, int) -> dict
+    Return the shipList sent by a client, with integer sizes
+    Raise ValueError if it is not a valid fleet or covers more than the
+    whole board"""
+
+    shipList = {}
+    cells = 0
+    for size, number in ships.items():
+        size, number = int(size), int(number)
+        if size < 1 or number < 1:
+            raise ValueError('Ships must have a size and number of at least 1')
+        if size > boardsize:
+            raise ValueError('Ships of size %s do not fit the board' % size)
+        shipList[size] = number
+        cells += size * number
+    if not shipList:
+        raise ValueError('At least one ship is needed')
+    if cells > pow(boardsize, 2):
+        raise ValueError('Ships cover more than the whole board')
+    return shipList
+
+
+# ################################
+#        Classes
+# ################################
+
+class Connection(object):
+    """One client connected to the server"""
+
+    def __init__(self, writer):
+        """(Connection, StreamWriter) -> NoneType """
+
+        self.writer = writer
+        self.match = None
+        self.player = None
+
+    def send(self, message):
+        """(Connection, dict) -> NoneType
+        Queue message for the client without waiting"""
+
+        if not self.writer.is_closing():
+            self.writer.write(encode(message))
+
+
+class Match(object):
+    """A game hosted by the server and the connections playing it"""
+
+    def __init__(self, number, game, names, computer=None):
+        """(Match, int, Game, list of str, Targeting) -> NoneType
+        computer plays player 2 when given"""
+
+        self.number = number
+        self.game = game
+        self.names = names
+        self.players = [None, None]
+        self.computer = computer
+        self.started = False  # both players are in
+        self.closed = False   # over or abandoned, forgotten by the server
+
+    def broadcast(self, message):
+        """(Match, dict) -> NoneType
+        Send message to both players"""
+
+        for connection in self.players:
+            if connection is not None:
+                connection.send(message)
+
+    def layout(self, player):
+        """(Match, int) -> list of list of int
+        Return the (size, index, rotation) of the ships of player"""
+
+        return [[p.size, p.index, p.rotation]
+                for p in self.game.boards[player].placements()]
+
+    def start(self):
+        """(Match) -> NoneType
+        Tell both players the match has begun"""
+
+        self.started = True
+        for player, connection in enumerate(self.players):
+            if connection is not None:
+                connection.send({'event': 'start', 'game': self.number,
+                                 'player': player, 'names': self.names,
+                                 'turn': self.game.turn,
+                                 'ships': self.layout(player)})
+
+    def fire(self, player, index):
+        """(Match, int, int) -> NoneType
+        Player bombs location index; tell both players the outcome
+        Raise ValueError if the shot is not allowed"""
+
+        if not self.started:
+            raise ValueError('Waiting for an opponent')
+        if self.game.over:
+            raise ValueError('The game is already over')
+        if self.game.turn != player:
+            raise ValueError("It is not your turn")
+        shot = self.game.fire(index)
+        message = {'event': 'shot', 'player': player, 'index': index,
+                   'result': RESULTS[shot.result], 'size': shot.size}
+        if shot.result == SINK:
+            message['cells'] = indices(shot.mask)
+        self.broadcast(message)
+        if player == 1 and self.computer is not None:
+            self.computer.record(shot)
+        if self.game.over:
+            scores = self.game.finalScores()
+            self.broadcast({'event': 'over', 'scores': scores,
+                            'winner': self.game.winner()})
+
+    def computerDue(self):
+        """(Match) -> bool
+        Return True if it is the computer's turn"""
+
+        return self.computer is not None and not self.closed and \
+            not self.game.over and self.game.turn == 1
+
+
+class GameServer(object):
+    """Hosts matches for any number of connected clients"""
+
+    def __init__(self, seed=None, tables=None):
+        """(GameServer, int, TableCache) -> NoneType
+        Hard computer players open from the tables cached in tables,
+        hide their fleet in the layouts cached there and share one
+        endgame solver, whose table outlives the matches
+        Matches are set up and the computer's moves chosen in a pool of
+        worker threads, one per CPU; matches are set up one at a time,
+        as they share rng and tables, and every computer player draws
+        from a generator of its own"""
+
+        self.waiting = {}  # number -> match waiting for a second player
+        self.numbers = itertools.count(1)
+        self.rng = random.Random(seed)
+        self.tables = tables
+        self.endgame = EndgameSolver()
+        self.executor = ThreadPoolExecutor(os.cpu_count() or 1)
+        self.setUpLock = threading.Lock()
+        self.server = None
+
+    async def start(self, host='127.0.0.1', port=PORT):
+        """(GameServer, str, int) -> NoneType
+        Start listening; port 0 picks a free port (see port())"""
+
+        self.server = await asyncio.start_server(
+            self.handle, host, port, limit=LINE_LIMIT)
+
+    def port(self):
+        """(GameServer) -> int
+        Return the port the server is listening on"""
+
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """(GameServer) -> NoneType
+        Stop accepting clients"""
+
+        self.server.close()
+        await self.server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    async def think(self, function, *args):
+        """(GameServer, function) -> object
+        Return function(*args), run in a worker thread"""
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, *args)
+
+    async def handle(self, reader, writer):
+        """(GameServer, StreamReader, StreamWriter) -> NoneType
+        Serve requests from one client until it disconnects"""
+
+        connection = Connection(writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    connection.send({'event': 'error',
+                                     'message': 'Request too long'})
+                    break
+                if not line:
+                    break
+                try:
+                    await self.dispatch(connection,
+                                        json.loads(line.decode()))
+                except (ValueError, KeyError, TypeError,
+                        AttributeError) as error:
+                    connection.send({'event': 'error',
+                                     'message': str(error)})
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.leave(connection)
+            writer.close()
+
+    async def dispatch(self, connection, request):
+        """(GameServer, Connection, dict) -> NoneType
+        Carry out one request of connection"""
+
+        op = request['op']
+        if op == 'new':
+            await self.new(connection, request)
+        elif op == 'list':
+            connection.send({'event': 'games', 'games': [
+                {'game': m.number, 'name': m.names[0],
+                 'boardsize': m.game.boardsize,
+                 'winCondition': m.game.winCondition}
+                for m in self.waiting.values()]})
+        elif op == 'join':
+            self.join(connection, int(request['game']),
+                      str(request.get('name', 'Player 2')))
+        elif op == 'fire':
+            if connection.match is None:
+                raise ValueError('You are not playing a game')
+            match = connection.match
+            match.fire(connection.player, int(request['index']))
+            if match.computerDue():
+                index = await self.think(match.computer.choose)
+                if match.computerDue():  # the player may have left
+                    match.fire(1, index)
+            if match.game.over:
+                self.finish(match)
+        elif op == 'leave':
+            self.leave(connection)
+        else:
+            raise ValueError('Unknown request %r' % op)
+
+    async def new(self, connection, request):
+        """(GameServer, Connection, dict) -> NoneType
+        Create a match with connection as its first player"""
+
+        if connection.match is not None:
+            raise ValueError('Leave your current game first')
+        boardsize = int(request.get('boardsize', 10))
+        if not 2 <= boardsize <= MAX_BOARDSIZE:
+            raise ValueError('Size of board must be between 2 and %s' %
+                             MAX_BOARDSIZE)
+        shipList = readShipList(request.get('ships',
+                                            {2: 1, 3: 1, 4: 1, 5: 1}),
+                                boardsize)
+        winCondition = int(request.get('winCondition', 0))
+        if winCondition not in (0, 1):
+            raise ValueError('Unknown win condition %r' % winCondition)
+        level = None
+        if request.get('opponent') == 'computer':
+            level = int(request.get('level', HARD))
+            if level not in range(len(LEVELS)):
+                raise ValueError('Unknown level %r' % level)
+
+        game, computer = await self.think(self.setUp, shipList, boardsize,
+                                          winCondition, level)
+        names = [str(request.get('name', 'Player 1')), 'Player 2']
+        if computer is not None:
+            names[1] = 'Computer'
+
+        match = Match(next(self.numbers), game, names, computer)
+        match.players[0] = connection
+        connection.match, connection.player = match, 0
+        connection.send({'event': 'created', 'game': match.number,
+                         'player': 0})
+        if computer is not None:
+            match.start()
+        else:
+            self.waiting[match.number] = match
+
+    def setUp(self, shipList, boardsize, winCondition, level=None):
+        """(GameServer, dict, int, int, int) -> tuple of (Game, Targeting)
+        Return a game with its ships placed and the computer playing it
+        at level (None for a game between two clients)
+        Raise ValueError if the ships do not fit the board"""
+
+        with self.setUpLock:
+            game = Game(shipList, boardsize, winCondition)
+            failed = game.placeShips(self.rng)
+            if failed:
+                raise ValueError('Ships of size %s do not fit the board' %
+                                 sorted(set(failed)))
+            if level is None:
+                return game, None
+
+            opening = None
+            if self.tables is not None and level == HARD:
+                opening = self.tables.opening(shipList, boardsize)
+
+                # Hide the computer's fleet (see fleet.py)
+                layouts = self.tables.fleet(shipList, boardsize)
+                if layouts is not None:
+                    game.boards[1] = BoardState(shipList, boardsize)
+                    layouts.place(game.boards[1], self.rng)
+            rng = random.Random(self.rng.getrandbits(64))
+        return game, Targeting(shipList, boardsize, level, rng, opening,
+                               self.endgame)
+
+    def join(self, connection, number, name):
+        """(GameServer, Connection, int, str) -> NoneType
+        Add connection as the second player of match number"""
+
+        if connection.match is not None:
+            raise ValueError('Leave your current game first')
+        match = self.waiting.pop(number, None)
+        if match is None:
+            raise ValueError('Game %s is not waiting for a player' % number)
+        match.players[1] = connection
+        match.names[1] = name
+        connection.match, connection.player = match, 1
+        match.start()
+
+    def leave(self, connection):
+        """(GameServer, Connection) -> NoneType
+        Take connection out of its match and tell the opponent"""
+
+        match = connection.match
+        if match is None:
+            return
+        opponent = match.players[1 - connection.player]
+        if opponent is not None:
+            opponent.send({'event': 'left', 'game': match.number})
+        self.finish(match)
+
+    def finish(self, match):
+        """(GameServer, Match) -> NoneType
+        Forget a match that is over or abandoned"""
+
+        self.waiting.pop(match.number, None)
+        match.closed = True
+        for connection in match.players:
+            if connection is not None:
+                connection.match = connection.player = None
+
+
+def main(argv=None):
+    """(list of str) -> NoneType
+    Run the server from the command line"""
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--cache', default=None,
+                        help='directory caching the opening tables of the '
+                             'computer')
+    args = parser.parse_args(argv)
+
+    async def serve():
+        tables = TableCache(args.cache) if args.cache else None
+        server = GameServer(args.seed, tables)
+        await server.start(args.host, args.port)
+        print('Serving Battleship on %s:%s' % (args.host, server.port()))
+        async with server.server:
+            await server.server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,349 @@
+"""Batch simulator playing thousands of Battleship games at once
+
+Every game follows the rules of engine.Game: both players take turns
+bombing each other's board, hits and sinks are scored for the chosen win
+condition and the game ends once a fleet is sunk. Instead of one object
+per game, the boards of N games are held in NumPy arrays of shape
+(N, boardsize * boardsize) and every step fires one shot in all games.
+
+Requires NumPy, which the rest of the game does not need.
+
+Example:
+
+    sim = Simulator(100000, {2: 1, 3: 1, 4: 1, 5: 1}, 10, seed=1)
+    sim.placeShips()
+    sim.run()
+    print(sim.winners())
+"""
+
+import random
+
+import numpy as np
+
+from engine import WIN_BY_MOVES
+from placement import placeFleet
+from scoring import MovesRule, Stats
+
+
+# ################################
+#        Constants
+# ################################
+
+# Random placements tried per ship on every board before falling back
+# to the exact search of placement.py for the boards still left
+PLACE_ATTEMPTS = 32
+
+# How much more a placement counts for every wounded location it covers
+HIT_WEIGHT = 50.0
+
+_cells = {}
+
+
+# ################################
+#        Functions
+# ################################
+
+def shipCells(size, boardsize):
+    """(int, int) -> list of ndarray
+    Return the locations covered by every placement of a ship of size
+    One (placements, size) array per rotation: horizontal, then vertical
+    Results are cached and must not be modified"""
+
+    key = (size, boardsize)
+    if key not in _cells:
+        rows, cols = np.meshgrid(np.arange(boardsize),
+                                 np.arange(boardsize - size + 1),
+                                 indexing='ij')
+        starts = (rows * boardsize + cols).ravel()
+        steps = np.arange(size)
+        across = starts[:, None] + steps
+        down = (cols * boardsize + rows).ravel()[:, None] + steps * boardsize
+        _cells[key] = [across] if size == 1 else [across, down]
+    return _cells[key]
+
+
+def shipMatrix(size, boardsize):
+    """(int, int) -> ndarray
+    Return the (locations, placements) matrix of ships of size, 1 where
+    a placement covers a location
+    Results are cached and must not be modified"""
+
+    key = ('matrix', size, boardsize)
+    if key not in _cells:
+        cells = np.concatenate(shipCells(size, boardsize))
+        matrix = np.zeros((pow(boardsize, 2), len(cells)), np.float32)
+        for j in range(size):
+            matrix[cells[:, j], np.arange(len(cells))] = 1
+        _cells[key] = matrix
+    return _cells[key]
+
+
+def randomShots(sim, player):
+    """(Simulator, int) -> ndarray
+    Return a random location not bombed yet on every board player bombs
+    Every board is bombed in an order shuffled once at the first shot"""
+
+    key = ('randomShots', player)
+    if key not in sim.cache:
+        keys = sim.rng.random_sample(sim.shots[player].shape)
+        sim.cache[key] = keys.argsort(1)
+    order = sim.cache[key]
+    fired = np.minimum(sim.fired[:, player], sim.cells - 1)
+    return order[np.arange(sim.games), fired]
+
+
+def shiftGrid(grid, dr, dc):
+    """(ndarray, int, int) -> ndarray
+    Return (games, boardsize, boardsize) grid moved by dr rows and dc
+    columns, locations moved in from outside the board being False"""
+
+    size = grid.shape[1]
+    result = np.zeros(grid.shape, bool)
+    rows = slice(max(dr, 0), size + min(dr, 0))
+    cols = slice(max(dc, 0), size + min(dc, 0))
+    result[:, rows, cols] = grid[:, max(-dr, 0):size - max(dr, 0),
+                                 max(-dc, 0):size - max(dc, 0)]
+    return result
+
+
+def huntShots(sim, player):
+    """(Simulator, int) -> ndarray
+    Return, on every board player bombs, a random location next to a
+    wounded location, in line with two of them first, or a random
+    location on a checkerboard spaced by the smallest ship left when
+    nothing is wounded (the medium computer of ai.py)"""
+
+    board = 1 - player
+    shots, hits, sunk = sim.observed(board)
+    size = sim.boardsize
+    wounded = (hits & ~sunk).reshape(-1, size, size)
+    around = np.zeros(wounded.shape, bool)
+    inLine = np.zeros(wounded.shape, bool)
+    for dr, dc in ((0, 1), (0, -1), (1, 0), (-1, 0)):
+        near = shiftGrid(wounded, dr, dc)
+        around |= near
+        inLine |= near & shiftGrid(wounded, 2 * dr, 2 * dc)
+    around = around.reshape(shots.shape) & ~shots
+    inLine = inLine.reshape(shots.shape) & ~shots
+
+    step = np.full(sim.games, size + 1)
+    for k, left in sim.remainingSizes(board).items():
+        step = np.where(left > 0, np.minimum(step, k), step)
+    n = np.arange(sim.cells)
+    checker = (n // size + n % size)[None, :] % step[:, None] == 0
+    hunting = ~around.any(1)
+
+    score = sim.rng.random_sample(shots.shape) * 0.5
+    score += checker & hunting[:, None]
+    score += 2 * around + 2 * inLine
+    score[shots] = -1
+    return score.argmax(1)
+
+
+def densityShots(sim, player):
+    """(Simulator, int) -> ndarray
+    Return, on every board player bombs, the location covered by the
+    most placements of the remaining ships that agree with the misses,
+    hits and sunk ships seen so far. Placements covering wounded
+    locations count HIT_WEIGHT times more for each of them
+    Placements are counted with matrix products, on the games still
+    going only"""
+
+    board = 1 - player
+    active = np.flatnonzero(~sim.over)
+    shots, hits, sunk = [a[active] for a in sim.observed(board)]
+    blocked = (shots & ~hits | sunk).astype(np.float32)
+    wounded = (hits & ~sunk).astype(np.float32)
+    density = np.zeros(shots.shape)
+    for k, left in sim.remainingSizes(board).items():
+        cover = shipMatrix(k, sim.boardsize)
+        gains = np.power(HIT_WEIGHT, np.arange(k + 1))
+        weight = gains.take(wounded.dot(cover).astype(np.intp))
+        weight[blocked.dot(cover) > 0] = 0
+        weight *= left[active, None]
+        density += weight.dot(cover.T)
+    density += sim.rng.random_sample(density.shape) * 0.5
+    density[shots] = -1
+    result = np.zeros(sim.games, int)
+    result[active] = density.argmax(1)
+    return result
+
+
+# ################################
+#        Classes
+# ################################
+
+class Simulator(object):
+    """N two-player games played in lockstep"""
+
+    def __init__(self, games, shipList, boardsize, winCondition=0,
+                 seed=None, strategies=(densityShots, densityShots)):
+        """(Simulator, int, dict, int, int, int, tuple) -> NoneType
+        strategies[p] picks the shots of player p for all games"""
+
+        self.games = games
+        self.shipList = shipList
+        self.boardsize = boardsize
+        self.cells = pow(boardsize, 2)
+        self.winCondition = winCondition
+        self.strategies = strategies
+        self.rng = np.random.RandomState(seed)
+        self.seed = seed
+        self.cache = {}  # per-game state kept by the strategies
+
+        # Ships are numbered from 1 in the order they are placed
+        self.sizes = []
+        for k in sorted(shipList, reverse=True):
+            self.sizes.extend([k] * shipList[k])
+        self.shipSizes = np.array([0] + self.sizes)
+
+        # Arrays per player: ship number at every location of their
+        # board (0 = no ship), locations bombed by the opponent and
+        # unharmed locations left on every ship
+        shape = (games, self.cells)
+        self.ships = [np.zeros(shape, np.int32), np.zeros(shape, np.int32)]
+        self.shots = [np.zeros(shape, bool), np.zeros(shape, bool)]
+        self.left = [np.tile(self.shipSizes, (games, 1)) for p in range(2)]
+
+        self.turn = 0
+        self.steps = 0
+        self.over = np.zeros(games, bool)
+        self.score = np.zeros((games, 2))
+        self.fired = np.zeros((games, 2), np.int64)
+        self.hits = np.zeros((games, 2), np.int64)
+
+    def placeShips(self):
+        """(Simulator) -> NoneType
+        Randomly place every ship on both boards of all games
+        Raise placement.PlacementError if the ships cannot fit"""
+
+        rows = np.arange(self.games)
+        for ships in self.ships:
+            taken = np.zeros(ships.shape, bool)
+            stuck = np.zeros(self.games, bool)
+            for number, k in enumerate(self.sizes, 1):
+                layouts = shipCells(k, self.boardsize)
+                options = np.concatenate(layouts)
+                todo = rows[~stuck]
+                for attempt in range(PLACE_ATTEMPTS):
+                    cells = options[self.rng.randint(0, len(options),
+                                                     len(todo))]
+                    clash = taken[todo[:, None], cells].any(1)
+                    done = todo[~clash][:, None]
+                    taken[done, cells[~clash]] = True
+                    ships[done, cells[~clash]] = number
+                    todo = todo[clash]
+                    if not len(todo):
+                        break
+                stuck[todo] = True
+
+            # Lay out crowded boards one by one with the exact search
+            rng = random.Random(self.rng.randint(0, 1 << 30))
+            for n in rows[stuck]:
+                ships[n] = 0
+                numbers = {}
+                for k, index, rotation in placeFleet(self.shipList,
+                                                     self.boardsize, rng):
+                    numbers[k] = numbers.get(k, self.sizes.index(k)) + 1
+                    step = 1 if rotation else self.boardsize
+                    ships[n, index:index + k * step:step] = numbers[k]
+
+    def observed(self, board):
+        """(Simulator, int) -> tuple of ndarray
+        Return what the attacker of board can see on every game:
+        locations bombed, locations hit and locations of sunk ships"""
+
+        shots = self.shots[board]
+        ships = self.ships[board]
+        sunk = (self.left[board] == 0)
+        sunk[:, 0] = False
+        rows = np.arange(self.games)[:, None]
+        return shots, shots & (ships > 0), sunk[rows, ships]
+
+    def remainingSizes(self, board):
+        """(Simulator, int) -> dict of ndarray
+        Map every ship size to the number of ships of that size not
+        yet sunk on board, for every game"""
+
+        afloat = self.left[board][:, 1:] > 0
+        result = {}
+        for k in self.shipList:
+            result[k] = afloat[:, self.shipSizes[1:] == k].sum(1)
+        return result
+
+    def step(self):
+        """(Simulator) -> int
+        Current player fires one shot in every game still going
+        Return the number of games still going"""
+
+        player = self.turn
+        board = 1 - player
+        active = np.flatnonzero(~self.over)
+        targets = self.strategies[player](self, player)[active]
+        if self.shots[board][active, targets].any():
+            raise ValueError('Strategy bombed a location twice')
+
+        self.shots[board][active, targets] = True
+        number = self.ships[board][active, targets]
+        hit = number > 0
+        left = self.left[board]
+        left[active[hit], number[hit]] -= 1
+        sunk = hit & (left[active, number] == 0)
+
+        # Hit earns 1 point. Sinking a ship instead earns
+        # bonus points equal to the size of ship
+        self.fired[active, player] += 1
+        self.hits[active, player] += hit
+        points = np.where(sunk, self.shipSizes[number], hit)
+        self.score[active, player] += points
+
+        # Game ends once every ship on the board has been sunk
+        self.over[active] = (left[active, 1:] == 0).all(1)
+        self.turn = board
+        self.steps += 1
+        return len(active) - self.over[active].sum()
+
+    def run(self, maxSteps=None):
+        """(Simulator, int) -> NoneType
+        Play until every game is over or maxSteps shots were fired"""
+
+        while not self.over.all():
+            if maxSteps is not None and self.steps >= maxSteps:
+                break
+            self.step()
+
+    def attack(self, player=0):
+        """(Simulator, int) -> ndarray
+        Let player alone fire until every ship of the board it bombs is
+        sunk in all games, and return the shots it took in each"""
+
+        while not self.over.all():
+            self.turn = player
+            self.step()
+        return self.fired[:, player].copy()
+
+    def finalScores(self):
+        """(Simulator) -> ndarray
+        Return the (games, 2) scores for the chosen win condition
+        Win by moves scores the hits per move rounded to 2 decimals,
+        exactly as scoring.MovesRule does"""
+
+        if self.winCondition != WIN_BY_MOVES:
+            return self.score.copy()
+        rule = MovesRule()
+        stats = Stats()
+        scores = np.zeros(self.score.shape)
+        for (game, player), fired in np.ndenumerate(self.fired):
+            stats.shots = fired
+            stats.hits = self.hits[game, player]
+            scores[game, player] = rule.score(stats)
+        return scores
+
+    def winners(self):
+        """(Simulator) -> ndarray
+        Return the winning player of every game, -1 for a draw"""
+
+        scores = self.finalScores()
+        result = np.argmax(scores, 1)
+        result[scores[:, 0] == scores[:, 1]] = -1
+        return result
@@ -0,0 +1,212 @@
+"""Snapshots of games in progress, in a compact versioned binary format
+
+A snapshot holds everything needed to carry on a game: the settings,
+where every ship lies, the locations bombed on both boards, whose turn
+it is and the scoring counters of both players. A session snapshot adds
+what the window shows: the names of the players, the opponent, the
+difficulty, the placement seed and the announcements not yet shown.
+A 10x10 game takes under 200 bytes. Everything is little-endian, apart
+from the location masks which are big-endian bitmaps.
+
+The computer is not stored: restoreTargeting() rebuilds its knowledge
+from the locations bombed, which is all it ever learns.
+
+Example:
+
+    data = dumpGame(game)
+    game = loadGame(data)
+"""
+
+import binascii
+import struct
+from collections import namedtuple
+
+from ai import Targeting
+from engine import Game, Shot, MISS, HIT, SINK, shipMask, indices, popcount
+from scoring import RULES
+
+
+# ################################
+#        Constants
+# ################################
+
+MAGIC = b'BSNP'
+VERSION = 1
+
+# Flags of the header
+OVER = 1
+SESSION = 2
+
+HEADER = struct.Struct('<4sBBBHBB')  # magic, version, flags, winCondition,
+                                     # boardsize, turn, sizes
+SIZE = struct.Struct('<HH')          # size, number of ships
+COUNT = struct.Struct('<H')          # ships on a board
+SHIP = struct.Struct('<IHB')         # index, size, rotation
+STATS = struct.Struct('<6I')         # the counters of scoring.Stats
+PLAYERS = struct.Struct('<BBQ')      # opponent, difficulty, seed
+TEXT = struct.Struct('<H')           # length of a utf-8 string
+
+# The settings and window state of a session besides the game
+Session = namedtuple('Session', 'game usernames opponent difficulty seed '
+                                'messages')
+
+
+# ################################
+#        Functions
+# ################################
+
+def packMask(mask, size):
+    """(int, int) -> bytes
+    Return mask as size bytes"""
+
+    return binascii.unhexlify('%0*x' % (2 * size, mask))
+
+
+def unpackMask(data):
+    """(bytes) -> int """
+
+    return int(binascii.hexlify(data), 16) if data else 0
+
+
+def cut(data, position, size):
+    """(bytes, int, int) -> bytes
+    Return the size bytes of data at position
+    Raise ValueError if data ends before them"""
+
+    if position + size > len(data):
+        raise ValueError('Snapshot is cut short')
+    return data[position:position + size]
+
+
+def packText(text):
+    """(str) -> bytes
+    Return text as utf-8 prefixed by its length"""
+
+    if not isinstance(text, bytes):
+        text = text.encode('utf-8')
+    return TEXT.pack(len(text)) + text
+
+
+def unpackText(data, position):
+    """(bytes, int) -> tuple of (str, int)
+    Return the text at position and the position after it
+    Raise ValueError if data ends before the text does"""
+
+    length = TEXT.unpack_from(data, position)[0]
+    position += TEXT.size
+    text = cut(data, position, length).decode('utf-8')
+    return text, position + length
+
+
+def dumpGame(game, session=None):
+    """(Game, Session) -> bytes
+    Return a snapshot of game, followed by the rest of session if given
+    Raise ValueError if game scores with a rule of its own"""
+
+    rule = game.scoreboard.rule
+    if type(rule) is not RULES[game.winCondition]:
+        raise ValueError('Games scored by custom rules cannot be saved')
+
+    size = (game.boards[0].cells + 7) // 8
+    flags = (OVER if game.over else 0) | (SESSION if session else 0)
+    parts = [HEADER.pack(MAGIC, VERSION, flags, game.winCondition,
+                         game.boardsize, game.turn, len(game.shipList))]
+    for k in sorted(game.shipList):
+        parts.append(SIZE.pack(k, game.shipList[k]))
+    for board in game.boards:
+        placements = board.placements()
+        parts.append(COUNT.pack(len(placements)))
+        for p in placements:
+            parts.append(SHIP.pack(p.index, p.size, p.rotation))
+        parts.append(packMask(board.shots, size))
+    for stats in game.scoreboard.stats:
+        parts.append(STATS.pack(stats.shots, stats.hits, stats.sinks,
+                                stats.points, stats.sinceHit, stats.drought))
+
+    if session:
+        seed = session.seed if session.seed is not None else (1 << 64) - 1
+        parts.append(PLAYERS.pack(session.opponent, session.difficulty,
+                                  seed))
+        for text in list(session.usernames) + [
+                session.messages.get(p) or '' for p in (0, 1)]:
+            parts.append(packText(text))
+    return b''.join(parts)
+
+
+def loadGame(data):
+    """(bytes) -> Game or Session
+    Return the game of a snapshot, or its session if it holds one
+    Raise ValueError if data is not a snapshot this version can read"""
+
+    try:
+        magic, version, flags, winCondition, boardsize, turn, sizes = \
+            HEADER.unpack_from(data, 0)
+    except struct.error:
+        raise ValueError('Not a game snapshot')
+    if magic != MAGIC:
+        raise ValueError('Not a game snapshot')
+    if version != VERSION:
+        raise ValueError('Snapshot version %s is not supported' % version)
+
+    try:
+        position = HEADER.size
+        shipList = {}
+        for i in range(sizes):
+            k, number = SIZE.unpack_from(data, position)
+            shipList[k] = number
+            position += SIZE.size
+
+        game = Game(shipList, boardsize, winCondition)
+        size = (game.boards[0].cells + 7) // 8
+        for board in game.boards:
+            count = COUNT.unpack_from(data, position)[0]
+            position += COUNT.size
+            for i in range(count):
+                index, k, rotation = SHIP.unpack_from(data, position)
+                board.addShip(shipMask(index, k, rotation, boardsize))
+                position += SHIP.size
+            board.shots = unpackMask(cut(data, position, size))
+            position += size
+        for stats in game.scoreboard.stats:
+            (stats.shots, stats.hits, stats.sinks, stats.points,
+             stats.sinceHit, stats.drought) = STATS.unpack_from(data,
+                                                                position)
+            position += STATS.size
+        game.turn = turn
+        game.over = bool(flags & OVER)
+        if not flags & SESSION:
+            return game
+
+        opponent, difficulty, seed = PLAYERS.unpack_from(data, position)
+        position += PLAYERS.size
+        texts = []
+        for i in range(4):
+            text, position = unpackText(data, position)
+            texts.append(text)
+    except struct.error:
+        raise ValueError('Snapshot is cut short')
+    return Session(game, texts[:2], opponent, difficulty,
+                   None if seed == (1 << 64) - 1 else seed,
+                   {0: texts[2] or None, 1: texts[3] or None})
+
+
+def restoreTargeting(board, level, rng=None, opening=None, endgame=None):
+    """(BoardState, int, Random, OpeningTables, EndgameSolver) -> Targeting
+    Return a computer that knows what bombing board has shown so far:
+    the outcome of every location bombed and the ships sunk"""
+
+    kwargs = {} if rng is None else {'rng': rng}
+    computer = Targeting(board.shipList, board.boardsize, level,
+                         opening=opening, endgame=endgame, **kwargs)
+    sunk = [mask for mask in board.ships if not mask & ~board.shots]
+    for n in indices(board.shots):
+        if not board.occupied >> n & 1:
+            computer.record(Shot(n, MISS, None, 0, 0))
+        elif not any(mask >> n & 1 for mask in sunk):
+            computer.record(Shot(n, HIT, None, 0, 0))
+    for mask in sunk:
+        cells = indices(mask)
+        for n in cells[:-1]:
+            computer.record(Shot(n, HIT, None, 0, 0))
+        computer.record(Shot(cells[-1], SINK, None, popcount(mask), mask))
+    return computer
@@ -0,0 +1,280 @@
+"""On-disk cache of the computer's opening tables
+
+Before its first hit, the hard computer's state only depends on the
+board configuration (boardsize and shipList) and on the locations it
+missed. For every configuration the cache keeps, in one file:
+
+    density   placements of the whole fleet covering each location,
+              the opening probability map
+    counts    placements of one ship of every size covering each
+              location
+    book      the first BOOK_MOVES shots of the computer if every one
+              of them misses, best location first
+
+Another file of every configuration holds the layouts the hard computer
+hides its own fleet in (see fleet.py).
+
+Files are named by a hash of the configuration, read through mmap and
+written to a temporary file then renamed, so several processes can share
+a cache directory. Every hit touches the file, even on tables this
+process opened already; once the directory grows past its size cap the
+least recently used files are deleted and closed.
+
+Example:
+
+    cache = TableCache('/tmp/tables')
+    computer = Targeting(shipList, boardsize, HARD,
+                         opening=cache.opening(shipList, boardsize))
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+
+from ai import Targeting, HARD, shipPlacements
+from engine import Shot, MISS
+
+
+# ################################
+#        Constants
+# ################################
+
+VERSION = 1
+MAGIC = b'BSHIPTBL'
+HEADER = struct.Struct('<8sIIII')  # magic, version, boardsize, sizes, book
+SIZE = struct.Struct('<II')        # size, number of ships
+
+# Shots of the computer kept in the book, at most half the board
+BOOK_MOVES = 64
+
+# Bytes the cache directory may hold
+MAX_BYTES = 64 << 20
+
+SUFFIX = '.tbl'
+
+
+# ################################
+#        Functions
+# ################################
+
+def configKey(shipList, boardsize, kind=None):
+    """(dict, int, str) -> str
+    Return the name of the cache file of a board configuration, holding
+    its opening tables or the kind of tables given ('fleet')"""
+
+    text = 'v%s boardsize=%s ships=%s' % (VERSION, boardsize, ','.join(
+        '%s:%s' % (k, shipList[k]) for k in sorted(shipList)
+        if shipList[k]))
+    if kind is not None:
+        text = '%s %s' % (kind, text)
+    return hashlib.sha1(text.encode('ascii')).hexdigest() + SUFFIX
+
+
+def buildTables(shipList, boardsize, moves=BOOK_MOVES):
+    """(dict, int, int) -> bytes
+    Return the content of the cache file of a board configuration"""
+
+    cells = pow(boardsize, 2)
+    sizes = sorted(k for k in shipList if shipList[k])
+    moves = min(moves, cells // 2)
+
+    # Play the opening against a board on which every shot misses,
+    # breaking ties by the lowest location
+    computer = Targeting(shipList, boardsize, HARD)
+    density = list(computer.density)
+    book = []
+    for i in range(moves):
+        n = computer.density.index(max(computer.density))
+        book.append(n)
+        computer.record(Shot(n, MISS, None, 0, 0))
+
+    parts = [HEADER.pack(MAGIC, VERSION, boardsize, len(sizes), len(book))]
+    for k in sizes:
+        parts.append(SIZE.pack(k, shipList[k]))
+    parts.append(struct.pack('<%dq' % cells, *density))
+    for k in sizes:
+        parts.append(struct.pack('<%dI' % cells, *shipPlacements(
+            k, boardsize)[2]))
+    parts.append(struct.pack('<%dI' % len(book), *book))
+    return b''.join(parts)
+
+
+# ################################
+#        Classes
+# ################################
+
+class OpeningTables(object):
+    """Opening tables of one configuration, read from a mapped file"""
+
+    def __init__(self, path):
+        """(OpeningTables, str) -> NoneType
+        Raise ValueError if path does not hold opening tables"""
+
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.boardsize, sizes, self.moves = \
+            HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError('%s does not hold opening tables' % path)
+        self.cells = pow(self.boardsize, 2)
+
+        position = HEADER.size
+        self.shipList = {}
+        self.offsets = {}  # size -> position of its counts
+        for i in range(sizes):
+            k, number = SIZE.unpack_from(self.data, position)
+            self.shipList[k] = number
+            position += SIZE.size
+        self.densityAt = position
+        position += 8 * self.cells
+        for k in sorted(self.shipList):
+            self.offsets[k] = position
+            position += 4 * self.cells
+
+        # Read whole, so games still following the book outlive close()
+        self.opening = struct.unpack_from('<%dI' % self.moves, self.data,
+                                          position)
+
+    def density(self):
+        """(OpeningTables) -> list of int
+        Return the opening density of every location"""
+
+        return list(struct.unpack_from('<%dq' % self.cells, self.data,
+                                       self.densityAt))
+
+    def counts(self, size):
+        """(OpeningTables, int) -> list of int
+        Return the placements of a ship of size covering every location"""
+
+        return list(struct.unpack_from('<%dI' % self.cells, self.data,
+                                       self.offsets[size]))
+
+    def book(self, move):
+        """(OpeningTables, int) -> int or NoneType
+        Return the location to bomb at move if every shot missed so far,
+        or None past the end of the book"""
+
+        if move >= self.moves:
+            return None
+        return self.opening[move]
+
+    def close(self):
+        """(OpeningTables) -> NoneType """
+
+        self.data.close()
+
+
+class TableCache(object):
+    """Directory of opening tables, least recently used files evicted
+    once it holds more than maxBytes"""
+
+    def __init__(self, directory, maxBytes=MAX_BYTES, moves=BOOK_MOVES):
+        """(TableCache, str, int, int) -> NoneType """
+
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.moves = moves
+        self.opened = {}  # file name -> tables opened by this process
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def opening(self, shipList, boardsize):
+        """(TableCache, dict, int) -> OpeningTables
+        Return the opening tables of a configuration, building and
+        storing them on a miss"""
+
+        name = configKey(shipList, boardsize)
+        tables = self.opened.get(name)
+        if tables is not None:
+            self.touch(name)
+            return tables
+
+        path = os.path.join(self.directory, name)
+        try:
+            tables = OpeningTables(path)
+            os.utime(path, None)
+        except (IOError, OSError, ValueError, struct.error):
+            self.store(name, buildTables(shipList, boardsize, self.moves))
+            tables = OpeningTables(path)
+        self.opened[name] = tables
+        return tables
+
+    def fleet(self, shipList, boardsize):
+        """(TableCache, dict, int) -> FleetLayouts or NoneType
+        Return the layouts the computer hides its fleet in (see fleet.py),
+        racing and storing them on a miss, or None if none can be built"""
+
+        # fleet.py brings in NumPy, only needed once the computer hides
+        # its fleet
+        from fleet import FleetLayouts, buildFleet
+
+        name = configKey(shipList, boardsize, 'fleet')
+        layouts = self.opened.get(name)
+        if layouts is not None:
+            self.touch(name)
+            return layouts
+
+        path = os.path.join(self.directory, name)
+        try:
+            layouts = FleetLayouts(path)
+            os.utime(path, None)
+        except (IOError, OSError, ValueError, struct.error):
+            content = buildFleet(shipList, boardsize)
+            if content is None:
+                return None
+            self.store(name, content)
+            layouts = FleetLayouts(path)
+        self.opened[name] = layouts
+        return layouts
+
+    def touch(self, name):
+        """(TableCache, str) -> NoneType
+        Mark file name as just used, if it is still there"""
+
+        try:
+            os.utime(os.path.join(self.directory, name), None)
+        except OSError:
+            pass
+
+    def store(self, name, content):
+        """(TableCache, str, bytes) -> NoneType
+        Atomically write content to file name, then evict old files"""
+
+        handle, temporary = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(handle, 'wb') as f:
+            f.write(content)
+        os.rename(temporary, os.path.join(self.directory, name))
+        self.evict(keep=name)
+
+    def evict(self, keep=None):
+        """(TableCache, str) -> NoneType
+        Delete the least recently used files, except keep, until the
+        cache fits in maxBytes"""
+
+        files = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(SUFFIX):
+                continue
+            try:
+                info = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            files.append((info.st_mtime, name, info.st_size))
+            total += info.st_size
+        for mtime, name, size in sorted(files):
+            if total <= self.maxBytes:
+                break
+            if name == keep:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            tables = self.opened.pop(name, None)
+            if tables is not None:
+                tables.close()
+            total -= size
@@ -0,0 +1,39 @@
+import random
+
+from ai import Targeting, EASY, MEDIUM, HARD
+from engine import Game
+
+
+def playOut(level, boardsize=8, seed=0):
+    rng = random.Random(seed)
+    game = Game({2: 1, 3: 2, 4: 1}, boardsize)
+    assert game.placeShips(rng) == []
+    computers = [Targeting({2: 1, 3: 2, 4: 1}, boardsize, level, rng)
+                 for p in range(2)]
+    while not game.over:
+        computer = computers[game.turn]
+        n = computer.choose()
+        assert not computer.shots >> n & 1
+        computer.record(game.fire(n))
+    return computers
+
+
+def test_levels_finish_without_repeating_a_shot():
+    for level in (EASY, MEDIUM, HARD):
+        playOut(level)
+
+
+def test_unbombed_list_follows_shots():
+    for computer in playOut(EASY, 9, 4):
+        unbombed = [n for n in range(81) if not computer.shots >> n & 1]
+        assert sorted(computer.unbombed) == unbombed
+        for n in unbombed:
+            assert computer.unbombed[computer.slots[n]] == n
+
+
+def test_easy_picks_last_location():
+    computer = Targeting({2: 1}, 4, EASY, random.Random(1))
+    for n in range(16):
+        if n != 9:
+            computer.bomb(n)
+    assert computer.choose() == 9
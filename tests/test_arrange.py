@@ -0,0 +1,53 @@
+from arrange import Arrangement
+from engine import BoardState, FIRST_SHIP_ID, shipMask
+from render import Grid
+
+
+class Drawing(object):
+    """Stand-in for render.Ships remembering where ships were drawn"""
+
+    def __init__(self):
+        self.drawn = {}
+
+    def move(self, i, mask, fill=None):
+        self.drawn[i] = mask
+
+    def lift(self, i):
+        pass
+
+
+def arrangement():
+    state = BoardState({2: 1, 3: 1}, 5)
+    state.addShip(shipMask(0, 2, 1, 5))
+    state.addShip(shipMask(10, 3, 1, 5))
+    return Arrangement(state, Grid(5, 20, 0, 0), Drawing())
+
+
+def test_drag_and_drop():
+    a = arrangement()
+    assert a.grab(10, 10)
+    a.drag(10, 70)
+    assert a.drop()
+    assert a.state.ships[0] == shipMask(15, 2, 1, 5)
+
+
+def test_drop_over_ship_goes_back():
+    a = arrangement()
+    assert a.grab(10, 10)
+    a.drag(10, 50)
+    assert not a.drop()
+    assert a.state.ships[0] == shipMask(0, 2, 1, 5)
+
+
+def test_rotate():
+    a = arrangement()
+    assert a.rotate(FIRST_SHIP_ID + 1)
+    assert a.state.ships[1] == shipMask(10, 3, 0, 5)
+
+
+def test_nothing_moves_once_bombed():
+    a = arrangement()
+    a.state.fire(24)
+    assert not a.grab(10, 10)
+    assert not a.rotate(FIRST_SHIP_ID + 1)
+    assert a.state.ships == [shipMask(0, 2, 1, 5), shipMask(10, 3, 1, 5)]
@@ -0,0 +1,34 @@
+import pytest
+
+from dataset import generate, shardName, MAX_BOARDSIZE
+
+
+def test_shards_hold_every_shot(tmp_path):
+    numpy = pytest.importorskip('numpy')
+    directory = str(tmp_path / 'data')
+    manifest = generate(directory, 8, [0, 2], {2: 1, 3: 1}, 6, seed=1,
+                        processes=2, shardSamples=100, chunkGames=2)
+    samples = [numpy.load(str(tmp_path / 'data' / shardName(i)))
+               for i in range(manifest['shards'])]
+    assert sum(len(s) for s in samples) == manifest['samples']
+    assert manifest['games'] == 8
+    records = numpy.concatenate(samples)
+    assert set(records['game']) == set(range(8))
+    assert records['state'].shape[1] == 36
+    assert (records['shot'] < 36).all()
+
+
+def test_resumed_run_matches(tmp_path):
+    whole = generate(str(tmp_path / 'a'), 6, [1], {2: 1}, 5,
+                     processes=1, shardSamples=20, chunkGames=2)
+    generate(str(tmp_path / 'b'), 3, [1], {2: 1}, 5,
+             processes=1, shardSamples=20, chunkGames=2)
+    resumed = generate(str(tmp_path / 'b'), 6, [1], {2: 1}, 5,
+                       processes=1, shardSamples=20, chunkGames=2)
+    assert resumed['samples'] == whole['samples']
+
+
+def test_oversize_board_refused(tmp_path):
+    with pytest.raises(ValueError):
+        generate(str(tmp_path), 1, [0], {2: 1}, MAX_BOARDSIZE + 1)
+    assert not (tmp_path / 'manifest.json').exists()
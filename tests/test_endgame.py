@@ -0,0 +1,57 @@
+import pytest
+
+from endgame import EndgameSolver, layouts, symmetries, mapMask
+from engine import shipMask, indices
+
+# A 6x6 board with a 3-ship and a 2-ship left: all but a few locations
+# bombed, and a hit at location 14 on a ship afloat
+BOARDSIZE = 6
+SHOTS = sum(1 << n for n in range(36)
+            if n not in (3, 4, 5, 8, 10, 11, 15, 16, 17))
+WOUNDED = 1 << 14
+REMAINING = {2: 1, 3: 1}
+
+
+def test_layouts_agree_with_what_was_seen():
+    found = layouts(BOARDSIZE, SHOTS & ~WOUNDED, WOUNDED, (3, 2))
+    assert found
+    for occupied, ships in found:
+        assert occupied & WOUNDED == WOUNDED
+        assert not occupied & SHOTS & ~WOUNDED
+        assert sorted(len(indices(m)) for m in ships) == [2, 3]
+
+
+def test_too_many_layouts_left_unsolved():
+    solver = EndgameSolver(maxLayouts=2, budget=None)
+    assert solver.choose(BOARDSIZE, SHOTS, WOUNDED, REMAINING) is None
+    assert solver.choose(BOARDSIZE, 0, 0, {2: 1, 3: 2}) is None
+
+
+def test_symmetric_positions_share_one_entry():
+    solver = EndgameSolver(budget=None)
+    values = []
+    for s, table in enumerate(symmetries(BOARDSIZE)):
+        shots, wounded = mapMask(SHOTS, table), mapMask(WOUNDED, table)
+        values.append(solver.expected(BOARDSIZE, shots, wounded, REMAINING))
+        n = solver.choose(BOARDSIZE, shots, wounded, REMAINING)
+        assert not shots >> n & 1
+        if s == 0:
+            solved = solver.solved
+    assert values[0] is not None
+    assert values == [pytest.approx(values[0])] * 8
+    assert solver.solved == solved
+
+
+def test_last_layout_sunk_in_its_size():
+    solver = EndgameSolver(budget=None)
+    ship = shipMask(6, 3, 1, 5)
+    wounded = 1 << 7
+    shots = wounded | (((1 << 25) - 1) & ~ship)
+    assert solver.expected(5, shots, wounded, {3: 1}) == 2.0
+    assert solver.choose(5, shots, wounded, {3: 1}) in (6, 8)
+
+
+def test_out_of_time_gives_up():
+    solver = EndgameSolver(budget=None)
+    assert solver.choose(BOARDSIZE, SHOTS, WOUNDED, REMAINING,
+                         deadline=0) is None
@@ -0,0 +1,100 @@
+import pytest
+
+from engine import Game, BoardState, MISS, HIT, SINK, FIRST_SHIP_ID, \
+    WIN_BY_POINTS, WIN_BY_MOVES, shipMask, maskPlacement, indices
+
+
+def fixedGame(winCondition=WIN_BY_POINTS):
+    """Game on a 4x4 board: a 2-ship at 0-1 and a 3-ship down column 3"""
+
+    game = Game({2: 1, 3: 1}, 4, winCondition)
+    for board in game.boards:
+        board.addShip(shipMask(0, 2, 1, 4))
+        board.addShip(shipMask(3, 3, 0, 4))
+    return game
+
+
+def test_ship_masks():
+    assert shipMask(0, 2, 1, 4) == 0b11
+    assert indices(shipMask(3, 3, 0, 4)) == [3, 7, 11]
+    assert not shipMask(3, 2, 1, 4)  # past the right edge
+    assert maskPlacement(shipMask(6, 3, 0, 5)) == (6, 3, 0)
+
+
+def test_fire_outcomes():
+    board = BoardState({2: 1}, 4)
+    shipID = board.addShip(shipMask(5, 2, 1, 4))
+    assert shipID == FIRST_SHIP_ID
+    assert board.fire(0) == (0, MISS, None, 0, 0)
+    assert board.fire(5) == (5, HIT, shipID, 2, 0)
+    assert board.tracker == {shipID: 1}
+    shot = board.fire(6)
+    assert shot.result == SINK and shot.mask == 0b11 << 5
+    assert board.isSunk(shipID) and board.allSunk()
+
+
+def test_bombed_or_outside_location_refused():
+    board = BoardState({2: 1}, 4)
+    board.fire(3)
+    for n in (3, -1, 16):
+        with pytest.raises(ValueError):
+            board.fire(n)
+
+
+def test_turns_and_game_over():
+    game = fixedGame()
+    assert game.fire(0).result == HIT and game.turn == 1
+    assert game.fire(15).result == MISS and game.turn == 0
+    for n, miss in ((1, 14), (3, 13), (7, 12)):
+        game.fire(n)
+        game.fire(miss)
+    assert game.fire(11).result == SINK
+    assert game.over and game.turn == 0
+    with pytest.raises(ValueError):
+        game.fire(10)
+
+
+def test_points_scoring():
+    game = fixedGame()
+    game.fire(0)   # hit: 1 point
+    game.fire(15)
+    game.fire(1)   # sinks the 2-ship: 2 points
+    game.fire(3)   # hit
+    game.fire(8)
+    assert game.finalScores() == [3, 1]
+    assert game.winner() == 0
+    assert game.scoreboard.margin() == 2
+
+
+def test_moves_scoring_and_draw():
+    game = fixedGame(WIN_BY_MOVES)
+    game.fire(0)
+    game.fire(0)
+    game.fire(5)
+    game.fire(5)
+    assert game.finalScores() == [0.5, 0.5]
+    assert game.winner() is None
+    stats = game.scoreboard.stats[0]
+    assert (stats.shots, stats.hits, stats.misses, stats.drought) == \
+        (2, 1, 1, 1)
+
+
+def test_move_ship_keeps_occupancy():
+    board = BoardState({2: 1, 3: 1}, 5)
+    a = board.addShip(shipMask(0, 2, 1, 5))
+    b = board.addShip(shipMask(10, 3, 1, 5))
+    mask = shipMask(20, 2, 1, 5)
+    assert not board.overlap(a, mask)
+    assert board.overlap(a, shipMask(10, 2, 0, 5))
+    board.moveShip(a, mask)
+    assert board.occupied == mask | board.ships[b - FIRST_SHIP_ID]
+    assert board.shipAt(20) == a and board.shipAt(0) is None
+
+
+def test_ships_stay_once_bombed():
+    board = BoardState({2: 1}, 5)
+    shipID = board.addShip(shipMask(0, 2, 1, 5))
+    board.fire(12)
+    with pytest.raises(ValueError):
+        board.moveShip(shipID, shipMask(20, 2, 1, 5))
+    assert board.ships == [shipMask(0, 2, 1, 5)]
@@ -0,0 +1,62 @@
+from engine import MISS, SINK, Shot
+from events import EventBus, Sink, GameOver, shotEvent, \
+    COALESCE, DROP_NEWEST, KEEP_ALL
+
+
+def shots(count, result=MISS):
+    return [shotEvent(i % 2, Shot(i, result, None, 0, 0)) for i in range(count)]
+
+
+def test_kept_whole_past_limit():
+    bus = EventBus()
+    seen = []
+    subscription = bus.subscribe(seen.append, limit=4, policy=KEEP_ALL)
+    events = shots(100)
+    for event in events:
+        bus.publish(event)
+    bus.pump()
+    assert seen == events
+    assert subscription.dropped == 0
+
+
+def test_bounded_policies_drop():
+    bus = EventBus()
+    oldest = bus.subscribe(limit=4)
+    newest = bus.subscribe(limit=4, policy=DROP_NEWEST)
+    events = shots(10)
+    for event in events:
+        bus.publish(event)
+    assert oldest.poll() == events[-4:]
+    assert newest.poll() == events[:4]
+    assert oldest.dropped == newest.dropped == 6
+
+
+def test_coalesce_keeps_latest_per_player():
+    bus = EventBus()
+    subscription = bus.subscribe(kinds=(Sink,), policy=COALESCE)
+    events = shots(6, SINK)
+    for event in events:
+        bus.publish(event)
+    assert subscription.poll() == events[-2:]
+
+
+def test_handlers_take_no_lock():
+    bus = EventBus()
+    handled = bus.subscribe(lambda event: None)
+    read = bus.subscribe(kinds=(GameOver,))
+    assert handled.ready is None
+    assert read.ready is not None
+    bus.publish(GameOver([1, 0], 0))
+    assert read.wait(0) == [GameOver([1, 0], 0)]
+
+
+def test_schedules_pump_once():
+    scheduled = []
+    bus = EventBus(scheduled.append)
+    seen = []
+    bus.subscribe(seen.append)
+    for event in shots(3):
+        bus.publish(event)
+    assert len(scheduled) == 1
+    scheduled[0]()
+    assert len(seen) == 3
@@ -0,0 +1,108 @@
+import os
+import random
+
+from ai import Targeting, MEDIUM
+from engine import Game
+from gamelog import GameLog, LogReader
+
+
+def playLogged(log, seed):
+    rng = random.Random(seed)
+    game = Game({2: 1, 3: 1, 4: 1}, 8, seed % 2)
+    assert game.placeShips(rng) == []
+    log.startGame(game, seed)
+    computers = [Targeting(game.shipList, 8, MEDIUM, rng) for p in range(2)]
+    while not game.over:
+        player = game.turn
+        shot = game.fire(computers[player].choose())
+        computers[player].record(shot)
+        log.shot(player, shot)
+    return game
+
+
+def writeLog(path, seeds):
+    log = GameLog(path)
+    games = [playLogged(log, seed) for seed in seeds]
+    log.close()
+    return games
+
+
+def test_replay_matches_games_played(tmp_path):
+    path = str(tmp_path / 'games.log')
+    games = writeLog(path, [3, 4, 5])
+    with LogReader(path) as reader:
+        assert len(reader) == 3
+        for number, game in enumerate(games):
+            record = reader.game(number)
+            assert record.seed == number + 3
+            assert record.moves == sum(s.shots
+                                       for s in game.scoreboard.stats)
+            replayed = reader.replay(number)
+            assert replayed.over
+            assert replayed.finalScores() == game.finalScores()
+            assert [b.shots for b in replayed.boards] == \
+                [b.shots for b in game.boards]
+
+
+def test_replay_stops_at_move(tmp_path):
+    path = str(tmp_path / 'games.log')
+    writeLog(path, [7])
+    with LogReader(path) as reader:
+        game = reader.replay(0, moves=5)
+        assert sum(s.shots for s in game.scoreboard.stats) == 5
+        assert not game.over
+        assert len(list(reader.shots(0, 2, 5))) == 3
+
+
+def test_index_rebuilt_and_cut_record_ignored(tmp_path):
+    path = str(tmp_path / 'games.log')
+    writeLog(path, [1, 2])
+    os.remove(path + '.idx')
+    with open(path, 'ab') as f:
+        f.write(b'\x80\x01')  # shot record cut short
+    with LogReader(path) as reader:
+        assert len(reader) == 2
+        assert reader.replay(1).over
+
+
+def test_appending_keeps_earlier_games(tmp_path):
+    path = str(tmp_path / 'games.log')
+    writeLog(path, [1])
+    writeLog(path, [2])
+    with LogReader(path) as reader:
+        assert [reader.game(n).seed for n in range(len(reader))] == [1, 2]
+
+
+def test_index_lost_between_writers(tmp_path):
+    path = str(tmp_path / 'games.log')
+    writeLog(path, [1, 2])
+    os.remove(path + '.idx')
+    writeLog(path, [3])
+    with open(path + '.idx', 'rb') as f:
+        assert len(f.read()) == 3 * 16
+    with LogReader(path) as reader:
+        assert [reader.game(n).seed for n in range(len(reader))] == \
+            [1, 2, 3]
+
+
+def test_stale_index_not_trusted(tmp_path):
+    path = str(tmp_path / 'games.log')
+    writeLog(path, [1, 2, 3])
+    with open(path + '.idx', 'rb') as f:
+        entries = f.read()
+    with open(path + '.idx', 'wb') as f:
+        f.write(entries[16:])  # first game missing
+    with LogReader(path) as reader:
+        assert [reader.game(n).seed for n in range(len(reader))] == \
+            [1, 2, 3]
+
+
+def test_writer_drops_record_cut_short(tmp_path):
+    path = str(tmp_path / 'games.log')
+    writeLog(path, [1])
+    with open(path, 'ab') as f:
+        f.write(b'\x80\x01')
+    writeLog(path, [2])
+    with LogReader(path) as reader:
+        assert len(reader) == 2
+        assert reader.replay(0).over and reader.replay(1).over
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from engine import BoardState, shipMask, popcount
+from placement import placeFleet, PlacementError
+
+
+def layoutMasks(layout, boardsize):
+    return [shipMask(n, k, rotation, boardsize)
+            for k, n, rotation in layout]
+
+
+def checkLayout(shipList, boardsize, layout):
+    masks = layoutMasks(layout, boardsize)
+    sizes = sorted(k for k, n, rotation in layout)
+    assert sizes == sorted(k for k in shipList for i in range(shipList[k]))
+    occupied = 0
+    for (k, n, rotation), mask in zip(layout, masks):
+        assert mask and popcount(mask) == k  # inside the board
+        assert not occupied & mask           # no two ships overlap
+        occupied |= mask
+
+
+def test_layouts_fit_without_overlap():
+    rng = random.Random(5)
+    for shipList, boardsize in (({2: 1, 3: 2, 4: 1, 5: 1}, 10),
+                                ({1: 3, 2: 2}, 3),
+                                ({3: 10}, 6)):
+        for i in range(50):
+            checkLayout(shipList, boardsize,
+                        placeFleet(shipList, boardsize, rng))
+
+
+def test_full_board_packed():
+    layout = placeFleet({4: 4}, 4, random.Random(2))
+    checkLayout({4: 4}, 4, layout)
+
+
+def test_same_seed_same_layout():
+    shipList = {2: 2, 3: 2, 5: 1}
+    assert placeFleet(shipList, 8, random.Random(9)) == \
+        placeFleet(shipList, 8, random.Random(9))
+
+
+def test_impossible_fleets_refused():
+    for shipList, boardsize in (({5: 1}, 4), ({4: 5}, 4), ({2: 5}, 3)):
+        with pytest.raises(PlacementError):
+            placeFleet(shipList, boardsize, random.Random(0))
+
+
+def test_board_reports_ships_that_do_not_fit():
+    board = BoardState({5: 2}, 4)
+    assert sorted(set(board.placeShips(random.Random(0)))) == [5]
+    assert not board.ships
+
+
+def test_crowded_boards_get_varied_layouts():
+    for shipList, boardsize in (({4: 24}, 10), ({3: 16}, 7)):
+        layouts = set()
+        for seed in range(100):
+            layout = placeFleet(shipList, boardsize, random.Random(seed))
+            checkLayout(shipList, boardsize, layout)
+            layouts.add(tuple(sorted(layout)))
+        assert len(layouts) > 50
@@ -0,0 +1,37 @@
+from ratings import RatingStore
+from scoring import Stats
+from engine import WIN_BY_POINTS
+from tournament import runTournament
+
+
+def stats():
+    return [Stats(), Stats()]
+
+
+def test_winner_gains_rating(tmp_path):
+    store = RatingStore(str(tmp_path / 'stats.db'))
+    assert store.record(['Ann', 'Bob'], stats(), 0, WIN_BY_POINTS, 10) == 1
+    store.flush()
+    assert store.rating('Ann') > 1500 > store.rating('Bob')
+    store.close()
+
+
+def test_same_name_not_recorded(tmp_path):
+    store = RatingStore(str(tmp_path / 'stats.db'))
+    assert store.record(['Ann', 'Ann'], stats(), 0, WIN_BY_POINTS, 10) \
+        is None
+    store.flush()
+    assert store.rating('Ann') is None
+    assert store.leaderboard() == []
+    store.close()
+
+
+def test_tournament_ratings_do_not_depend_on_processes(tmp_path):
+    ratings = []
+    for processes in (1, 3):
+        store = RatingStore(str(tmp_path / ('%d.db' % processes)))
+        runTournament([0, 1, 2], 6, boardsize=8, seed=3,
+                      processes=processes, chunksize=1, store=store)
+        ratings.append(store.leaderboard())
+        store.close()
+    assert ratings[0] == ratings[1]
@@ -0,0 +1,22 @@
+from render import Grid, cellSize, shipName, VIEWPORT, MIN_CELL
+
+
+def test_boards_fit_the_viewport_with_their_margins():
+    for boardsize in range(2, 300):
+        cell = cellSize(boardsize)
+        width, height = Grid(boardsize, cell).extent()
+        if cell > MIN_CELL:
+            assert max(width, height) <= VIEWPORT, boardsize
+
+
+def test_cells_map_back_to_locations():
+    grid = Grid(7, cellSize(7))
+    for n in range(49):
+        x, y = grid.centre(n)
+        assert grid.cellAt(x, y) == n
+    assert grid.cellAt(0, 0) is None
+
+
+def test_ship_names_left_out_of_small_squares():
+    assert shipName(2, 1, 20) == 'BOAT'
+    assert shipName(2, 1, 4) == ''
@@ -0,0 +1,110 @@
+import random
+
+from engine import Game, MISS, SINK, WIN_BY_POINTS, WIN_BY_MOVES
+from scoring import Stats, Scoreboard, PointsRule, MovesRule
+
+
+# (hit, size of the ship sunk) of the shots of a recorded game of
+# {2: 1, 3: 1, 4: 1}, one list per player
+RECORDED = (
+    [(False, 0), (True, 0), (True, 0), (True, 0), (True, 4), (False, 0),
+     (False, 0), (False, 0), (True, 0), (True, 0), (True, 3), (False, 0),
+     (True, 0), (True, 2)],
+    [(False, 0), (False, 0), (True, 0), (False, 0), (True, 2), (False, 0),
+     (False, 0), (False, 0), (False, 0), (True, 0), (True, 0), (False, 0),
+     (False, 0)])
+
+
+def oldPoints(shots):
+    """Points of the original game: 1 per hit, ship size per sink"""
+
+    score = 0
+    for hit, sunk in shots:
+        if hit:
+            score += sunk if sunk else 1
+    return score
+
+
+def oldMoves(shots):
+    """Hits per move of the original game, kept as a list of the moves
+    before every hit with the current run of moves in front"""
+
+    moves = [0]
+    for hit, sunk in shots:
+        moves[0] += 1
+        if hit:
+            moves.append(moves[0])
+            moves[0] = 0
+    if len(moves) == 1:
+        return 0
+    total = moves[0]
+    for n in moves[1:]:
+        total += n
+    avg = float(len(moves) - 1) / total
+    return float('%.2f' % avg)
+
+
+def oldDrought(shots):
+    """Longest run of shots without a hit"""
+
+    longest = run = 0
+    for hit, sunk in shots:
+        run = 0 if hit else run + 1
+        longest = max(longest, run)
+    return longest
+
+
+def played(shots):
+    """Stats of shots"""
+
+    stats = Stats()
+    for hit, sunk in shots:
+        stats.record(hit, sunk)
+    return stats
+
+
+def test_recorded_game_scores_as_before():
+    for shots in RECORDED:
+        stats = played(shots)
+        assert PointsRule().score(stats) == oldPoints(shots)
+        assert MovesRule().score(stats) == oldMoves(shots)
+        assert stats.drought == oldDrought(shots)
+        assert stats.misses == len([hit for hit, sunk in shots if not hit])
+        assert stats.sinks == len([sunk for hit, sunk in shots if sunk])
+
+
+def test_scores_after_every_shot():
+    for rule, old in ((PointsRule(), oldPoints), (MovesRule(), oldMoves)):
+        board = Scoreboard(rule)
+        for player, shots in enumerate(RECORDED):
+            for n, (hit, sunk) in enumerate(shots, 1):
+                board.record(player, hit, sunk)
+                assert board.scores()[player] == old(shots[:n])
+
+
+def test_no_hits_scores_nothing():
+    shots = [(False, 0)] * 5
+    stats = played(shots)
+    assert PointsRule().score(stats) == oldPoints(shots) == 0
+    assert MovesRule().score(stats) == oldMoves(shots) == 0
+    assert MovesRule().score(Stats()) == 0
+
+
+def test_engine_games_score_as_before():
+    rng = random.Random(7)
+    for winCondition, old in ((WIN_BY_POINTS, oldPoints),
+                              (WIN_BY_MOVES, oldMoves)):
+        for n in range(20):
+            game = Game({2: 1, 3: 2, 4: 1}, 6, winCondition)
+            game.placeShips(rng)
+            shots = ([], [])
+            left = [list(range(36)), list(range(36))]
+            rng.shuffle(left[0])
+            rng.shuffle(left[1])
+            while not game.over:
+                player = game.turn
+                shot = game.fire(left[player].pop())
+                shots[player].append((shot.result != MISS,
+                                      shot.size if shot.result == SINK
+                                      else 0))
+            assert game.finalScores() == [old(shots[0]), old(shots[1])]
@@ -0,0 +1,178 @@
+"""Protocol of server.py, played over a loopback connection"""
+
+import asyncio
+import threading
+
+import pytest
+
+from netclient import Client
+from server import GameServer, readShipList
+
+
+@pytest.fixture
+def server():
+    """Yield a function connecting clients to a GameServer running in a
+    thread of its own"""
+
+    loop = asyncio.new_event_loop()
+    game = GameServer(seed=1)
+    loop.run_until_complete(game.start('127.0.0.1', 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    clients = []
+
+    def connect():
+        clients.append(Client('127.0.0.1', game.port(), timeout=5))
+        return clients[-1]
+
+    yield connect
+    for client in clients:
+        client.close()
+    asyncio.run_coroutine_threadsafe(game.close(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+def newMatch(connect):
+    """Return a host, a second player and the number of their match"""
+
+    host = connect()
+    host.send('new', name='Ann', ships={2: 1, 3: 1}, boardsize=5)
+    number = host.wait('created')['game']
+    guest = connect()
+    guest.send('join', game=number, name='Bob')
+    return host, guest, number
+
+
+def test_fire_before_opponent_joins_is_refused(server):
+    host = server()
+    host.send('new', name='Ann')
+    host.wait('created')
+    host.send('fire', index=0)
+    with pytest.raises(ValueError, match='Waiting for an opponent'):
+        host.wait('shot')
+    guest = server()
+    guest.send('join', game=1, name='Bob')
+    assert guest.wait('start')['turn'] == 0
+    assert host.wait('start')['names'] == ['Ann', 'Bob']
+
+
+def test_list_shows_only_waiting_matches(server):
+    host, guest, number = newMatch(server)
+    guest.wait('start')
+    other = server()
+    other.send('new', name='Cy')
+    waiting = other.wait('created')['game']
+    other.send('list')
+    games = other.wait('games')['games']
+    assert [g['game'] for g in games] == [waiting]
+    assert games[0]['name'] == 'Cy'
+
+    third = server()
+    third.send('join', game=number, name='Di')
+    with pytest.raises(ValueError, match='not waiting'):
+        third.wait('start')
+
+
+def test_turn_order_and_game_over(server):
+    host, guest, number = newMatch(server)
+    ships = [host.wait('start')['ships'], guest.wait('start')['ships']]
+    targets = []
+    for own in reversed(ships):  # each player bombs the other's ships
+        cells = []
+        for size, index, rotation in own:
+            step = 1 if rotation else 5
+            cells.extend(index + j * step for j in range(size))
+        targets.append(cells)
+
+    guest.send('fire', index=targets[1][0])
+    with pytest.raises(ValueError, match='not your turn'):
+        guest.wait('shot')
+
+    # Player 1 hits every time, player 2 misses every time; both
+    # players hear of every shot
+    misses = [n for n in range(25) if n not in targets[1]]
+    for i, index in enumerate(targets[0]):
+        host.send('fire', index=index)
+        shot = guest.wait('shot')
+        assert (shot['player'], shot['index']) == (0, index)
+        assert shot['result'] in ('hit', 'sink')
+        assert host.wait('shot') == shot
+        if i < len(targets[0]) - 1:
+            guest.send('fire', index=misses[i])
+            assert host.wait('shot')['result'] == 'miss'
+            assert guest.wait('shot')['player'] == 1
+    over = host.wait('over')
+    assert over['winner'] == 0 and guest.wait('over') == over
+    host.send('fire', index=misses[-1])
+    with pytest.raises(ValueError, match='not playing'):
+        host.wait('shot')
+
+
+def test_leave_tells_the_opponent(server):
+    host, guest, number = newMatch(server)
+    guest.wait('start')
+    guest.send('leave')
+    assert host.wait('left')['game'] == number
+    host.send('list')
+    assert host.wait('games')['games'] == []
+
+
+def test_computer_answers_every_shot(server):
+    client = server()
+    client.send('new', opponent='computer', level=0, ships={2: 1},
+                boardsize=4)
+    client.wait('start')
+    for index in range(16):
+        client.send('fire', index=index)
+        if client.wait('shot')['result'] == 'sink':
+            break
+        assert client.wait('shot')['player'] == 1
+    assert client.wait('over')['winner'] == 0
+
+
+def test_fleets_larger_than_the_board_are_refused(server):
+    client = server()
+    client.send('new', ships={1: 10 ** 9}, boardsize=10)
+    with pytest.raises(ValueError, match='whole board'):
+        client.wait('created')
+    with pytest.raises(ValueError):
+        readShipList({11: 1}, 10)
+    assert readShipList({'2': 3}, 10) == {2: 3}
+
+
+def test_unknown_levels_are_refused(server):
+    client = server()
+    for level in (-1, 3):
+        client.send('new', opponent='computer', level=level)
+        with pytest.raises(ValueError, match='Unknown level'):
+            client.wait('created')
+    client.send('new', opponent='computer', level=1, ships={2: 1},
+                boardsize=4)
+    client.wait('start')
+
+
+def test_computer_matches_play_side_by_side(server):
+    def play(client, winners):
+        client.send('new', opponent='computer', level=2, ships={2: 1, 3: 1},
+                    boardsize=5)
+        client.wait('start')
+        sinks = [0, 0]
+        for index in range(25):
+            client.send('fire', index=index)
+            for n in range(2):
+                shot = client.wait('shot')
+                sinks[shot['player']] += shot['result'] == 'sink'
+                if 2 in sinks:
+                    winners.append(client.wait('over')['winner'])
+                    return
+
+    winners = []
+    threads = [threading.Thread(target=play, args=(server(), winners))
+               for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert len(winners) == 4
@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from battleship import readSettings
+
+
+def test_config_strings(tmp_path):
+    path = tmp_path / 'game.json'
+    path.write_text(json.dumps({'names': u'Ann, Bj\xf6rn',
+                                'ships': u'2:2,3:1', 'boardsize': 8}))
+    settings = readSettings(['--config', str(path)])
+    assert settings['usernames'] == [u'Ann', u'Bj\xf6rn']
+    assert settings['shipList'] == {2: 2, 3: 1}
+    assert settings['boardsize'] == 8
+
+
+def test_flags_override_config(tmp_path):
+    path = tmp_path / 'game.json'
+    path.write_text(json.dumps({'names': ['Ann', 'Bob'], 'boardsize': 8}))
+    settings = readSettings(['--config', str(path), '--boardsize', '12',
+                             '--opponent', 'computer', '--level', 'easy'])
+    assert settings['boardsize'] == 12
+    assert settings['usernames'] == ['Ann', 'Bob']
+    assert (settings['opponent'], settings['difficulty']) == (1, 0)
+
+
+def test_no_settings_asks_for_them():
+    assert readSettings([]) is None
+
+
+def test_bad_settings_refused(tmp_path):
+    for argv in (['--names', 'Ann'], ['--boardsize', '1'],
+                 ['--ships', '2:0']):
+        with pytest.raises(SystemExit):
+            readSettings(argv)
@@ -0,0 +1,70 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from engine import Game, WIN_BY_POINTS, WIN_BY_MOVES
+from simulator import Simulator, densityShots
+
+SHIPS = {2: 1, 3: 2, 4: 1}
+
+
+def recorded(shots):
+    """Density strategy noting the shots of every step"""
+
+    def strategy(sim, player):
+        targets = densityShots(sim, player)
+        shots.append((player, ~sim.over, targets.copy()))
+        return targets
+    return strategy
+
+
+def engineGame(sim, number, shots):
+    """Replay game number of sim with engine.Game"""
+
+    game = Game(SHIPS, sim.boardsize, sim.winCondition)
+    for board, ships in zip(game.boards, sim.ships):
+        for ship in range(1, len(sim.sizes) + 1):
+            cells = np.flatnonzero(ships[number] == ship)
+            board.addShip(sum(1 << int(n) for n in cells))
+    for player, active, targets in shots:
+        if active[number]:
+            assert game.turn == player
+            game.fire(int(targets[number]))
+    return game
+
+
+def test_simulator_scores_like_the_engine():
+    for winCondition in (WIN_BY_POINTS, WIN_BY_MOVES):
+        shots = []
+        strategy = recorded(shots)
+        sim = Simulator(60, SHIPS, 7, winCondition, seed=4,
+                        strategies=(strategy, strategy))
+        sim.placeShips()
+        sim.run()
+        scores = sim.finalScores()
+        winners = sim.winners()
+        for number in range(sim.games):
+            game = engineGame(sim, number, shots)
+            assert game.over
+            assert list(scores[number]) == game.finalScores()
+            winner = game.winner()
+            assert winners[number] == (-1 if winner is None else winner)
+
+
+def test_placed_ships_do_not_overlap():
+    sim = Simulator(200, {2: 2, 3: 3, 4: 2}, 6, seed=1)
+    sim.placeShips()
+    for ships in sim.ships:
+        for number, k in enumerate(sim.sizes, 1):
+            assert ((ships == number).sum(1) == k).all()
+
+
+def test_moves_ties_round_like_the_engine():
+    sim = Simulator(1, SHIPS, 7, WIN_BY_MOVES, seed=4)
+    sim.hits[0] = (1, 2)
+    sim.fired[0] = (40, 80)
+    game = Game(SHIPS, 7, WIN_BY_MOVES)
+    for player, stats in enumerate(game.scoreboard.stats):
+        stats.hits = int(sim.hits[0, player])
+        stats.shots = int(sim.fired[0, player])
+    assert list(sim.finalScores()[0]) == game.finalScores() == [0.03, 0.03]
@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from ai import Targeting, HARD
+from engine import Game, WIN_BY_MOVES
+from snapshot import Session, dumpGame, loadGame, restoreTargeting
+
+
+def midGame(seed=0, moves=30, winCondition=WIN_BY_MOVES):
+    rng = random.Random(seed)
+    game = Game({2: 1, 3: 2, 4: 1, 5: 1}, 10, winCondition)
+    assert game.placeShips(rng) == []
+    computers = [Targeting(game.shipList, 10, HARD, rng) for p in range(2)]
+    for i in range(moves):
+        computer = computers[game.turn]
+        computer.record(game.fire(computer.choose()))
+    return game
+
+
+def test_game_round_trip():
+    game = midGame()
+    data = dumpGame(game)
+    loaded = loadGame(data)
+    assert dumpGame(loaded) == data
+    assert loaded.turn == game.turn
+    assert loaded.finalScores() == game.finalScores()
+    for board, copy in zip(game.boards, loaded.boards):
+        assert copy.ships == board.ships
+        assert copy.shots == board.shots
+        assert copy.occupied == board.occupied
+
+
+def test_session_round_trip():
+    game = midGame(1)
+    session = Session(game, [u'Ann', u'B\xf6b'], 1, HARD, None,
+                      {0: u'Sunk!', 1: None})
+    loaded = loadGame(dumpGame(game, session))
+    assert loaded.usernames == [u'Ann', u'B\xf6b']
+    assert loaded.seed is None
+    assert loaded.messages == {0: u'Sunk!', 1: None}
+    assert dumpGame(loaded.game) == dumpGame(game)
+
+
+def test_every_cut_refused():
+    game = midGame(2)
+    data = dumpGame(game, Session(game, [u'Ann', u'Bob'], 0, HARD, 7,
+                                  {0: None, 1: u'Hello'}))
+    for end in range(len(data)):
+        with pytest.raises(ValueError):
+            loadGame(data[:end])
+
+
+def test_restored_computer_knows_the_board():
+    game = midGame(3, 40)
+    board = game.boards[1]
+    computer = restoreTargeting(board, HARD)
+    assert computer.shots == board.shots
+    assert not board.shots >> computer.choose() & 1
@@ -0,0 +1,28 @@
+import os
+
+from tables import TableCache, configKey
+
+SHIPS = {2: 1, 3: 1}
+
+
+def test_hit_in_process_touches_file(tmp_path):
+    cache = TableCache(str(tmp_path))
+    tables = cache.opening(SHIPS, 6)
+    path = os.path.join(str(tmp_path), configKey(SHIPS, 6))
+    os.utime(path, (1, 1))
+    assert cache.opening(SHIPS, 6) is tables
+    assert os.stat(path).st_mtime > 1
+
+
+def test_evicted_tables_closed(tmp_path):
+    cache = TableCache(str(tmp_path))
+    old = cache.opening(SHIPS, 6)
+    first = old.book(0)
+    os.utime(os.path.join(str(tmp_path), configKey(SHIPS, 6)), (1, 1))
+    cache.maxBytes = 1
+    cache.opening(SHIPS, 7)
+    assert configKey(SHIPS, 6) not in cache.opened
+    assert old.data.closed
+    assert old.book(0) == first
+    assert not os.path.exists(os.path.join(str(tmp_path),
+                                           configKey(SHIPS, 6)))
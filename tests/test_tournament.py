@@ -0,0 +1,38 @@
+from engine import WIN_BY_MOVES
+from tournament import runTournament, schedule, playGame, gameSeed, \
+    parseShips
+
+
+def results(report):
+    return dict((k, v) for k, v in report.items()
+                if k not in ('seconds', 'gamesPerSecond'))
+
+
+def test_report_does_not_depend_on_processes():
+    reports = [results(runTournament([0, 1, 2], 8, boardsize=8, seed=11,
+                                     processes=processes, chunksize=1))
+               for processes in (1, 4)]
+    assert reports[0] == reports[1]
+    assert reports[0]['games'] == 24
+
+
+def test_games_replay_from_their_seed():
+    tasks = list(schedule([1, 2], 4, 5, {2: 1, 3: 1}, 6, WIN_BY_MOVES))
+    assert [task[2] for task in tasks] == [(1, 2), (2, 1)] * 2
+    for task in tasks:
+        first, second = playGame(task), playGame(task)
+        assert first[:5] == second[:5]
+        assert [s.points for s in first[5]] == [s.points for s in second[5]]
+
+
+def test_seeds_differ_per_game():
+    assert len(set(gameSeed(3, n) for n in range(1000))) == 1000
+
+
+def test_single_level_plays_itself():
+    assert [task[2] for task in schedule([2], 2, 0, {2: 1}, 5, 0)] == \
+        [(2, 2), (2, 2)]
+
+
+def test_parse_ships():
+    assert parseShips('2:1,3:2') == {2: 1, 3: 2}
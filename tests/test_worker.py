@@ -0,0 +1,105 @@
+"""Moves chosen by worker.MoveWorker and handed back by awaitMove, and
+calls run off the Tk loop by awaitCall"""
+
+import threading
+import time
+
+from ai import Targeting, EASY, HARD
+from worker import MoveWorker, awaitMove, awaitCall
+
+
+class Widget(object):
+    """Stand-in for a Tk widget running after() callbacks in run()"""
+
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, function, *args):
+        self.pending.append((function, args))
+
+    def run(self, timeout=5):
+        end = time.time() + timeout
+        while self.pending and time.time() < end:
+            function, args = self.pending.pop(0)
+            function(*args)
+            time.sleep(0.001)
+
+
+def play(computer, limit=1.0):
+    worker = MoveWorker()
+    widget = Widget()
+    moves = []
+    awaitMove(widget, worker, computer, moves.append, limit=limit)
+    widget.run()
+    worker.close()
+    return moves
+
+
+def test_move_is_handed_back():
+    computer = Targeting({2: 1, 3: 1}, 5, HARD)
+    moves = play(computer)
+    assert len(moves) == 1 and 0 <= moves[0] < 25
+
+
+class Failing(Targeting):
+    def choose(self, deadline=None):
+        raise RuntimeError('broken')
+
+
+def test_failing_computer_plays_an_unbombed_location():
+    computer = Failing({2: 1}, 3, EASY)
+    for n in range(9):
+        if n != 4:  # only location 4 is left
+            computer.bomb(n)
+    assert play(computer) == [4]
+
+
+class Slow(Targeting):
+    def __init__(self, *args):
+        Targeting.__init__(self, *args)
+        self.release = threading.Event()
+        self.busy = False
+
+    def choose(self, deadline=None):
+        self.busy = True
+        self.release.wait(5)
+        self.busy = False
+        return 0
+
+
+def test_late_move_is_replaced_by_the_densest_location():
+    computer = Slow({3: 1}, 5, HARD)
+    played = []
+
+    def done(move):
+        played.append((move, computer.busy))
+
+    threading.Timer(0.2, computer.release.set).start()
+    worker = MoveWorker()
+    widget = Widget()
+    awaitMove(widget, worker, computer, done, limit=0.05)
+    widget.run()
+    worker.close()
+    # The centre is covered by the most placements, and the move is only
+    # played once the worker is done with the computer
+    assert played == [(12, False)]
+
+
+def test_call_result_handed_back_on_the_loop():
+    widget = Widget()
+    results = []
+
+    def done(result):
+        results.append((result, threading.current_thread().name))
+
+    awaitCall(widget, sorted, ([3, 1, 2],), done)
+    widget.run()
+    assert results == [([1, 2, 3], threading.current_thread().name)]
+
+
+def test_failed_call_hands_back_none():
+    widget = Widget()
+    results = []
+    awaitCall(widget, int, ('x',), results.append)
+    widget.run()
+    assert results == [None]
@@ -0,0 +1,258 @@
+"""Tournament between computer players, spread over all CPU cores
+
+Every pair of different difficulty levels (or a single level against
+itself) plays the requested number of games with engine.Game rules,
+taking turns to move first. Each game gets its own seed derived from
+the tournament seed and the game number, so results do not depend on
+how games are shared out among processes. Games are rated in the order
+of their numbers, so neither do the Elo ratings.
+
+Usage:
+    python tournament.py --games 10000 --levels easy,medium,hard
+    python tournament.py --win-condition moves --processes 64 --json
+    python tournament.py --games 100000 --db stats.db
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import time
+
+from ai import Targeting, LEVELS
+from engine import Game, WIN_BY_POINTS, WIN_BY_MOVES
+from ratings import RatingStore
+
+
+# ################################
+#        Functions
+# ################################
+
+def gameSeed(seed, number):
+    """(int, int) -> int
+    Return the seed of game number of a tournament started with seed"""
+
+    return (seed * 1000003 + number) & 0xffffffffffff
+
+
+def playGame(task):
+    """(tuple) -> tuple
+    Play one game between two computer players
+    task is (number, seed, levels, shipList, boardsize, winCondition)
+    where levels[p] is the difficulty of player p
+    Return (number, levels, winner, finisher, shots, stats) where winner
+    is None on a draw, finisher is the player who sank the whole fleet,
+    shots[p] counts the shots player p fired and stats[p] holds the
+    scoring.Stats of player p"""
+
+    number, seed, levels, shipList, boardsize, winCondition = task
+    rng = random.Random(gameSeed(seed, number))
+    game = Game(shipList, boardsize, winCondition)
+    failed = game.placeShips(rng)
+    if failed:
+        raise ValueError('Ships of size %s do not fit the board' %
+                         sorted(set(failed)))
+    computers = [Targeting(shipList, boardsize, level, rng)
+                 for level in levels]
+    shots = [0, 0]
+    while not game.over:
+        player = game.turn
+        computers[player].record(game.fire(computers[player].choose()))
+        shots[player] += 1
+    return (number, levels, game.winner(), game.turn, shots,
+            game.scoreboard.stats)
+
+
+def percentile(values, p):
+    """(list of number, float) -> number
+    Return the p-th percentile of sorted values (nearest rank)"""
+
+    if not values:
+        return None
+    rank = int(round(p / 100.0 * (len(values) - 1)))
+    return values[rank]
+
+
+def schedule(levels, games, seed, shipList, boardsize, winCondition):
+    """(list of int, int, int, dict, int, int) -> iterator of tuple
+    Yield the tasks of a round robin: games per pair of different
+    levels, with the first move alternating between the two
+    A single level plays against itself"""
+
+    number = 0
+    for i, a in enumerate(levels):
+        for b in levels[i + 1:] or (levels if len(levels) == 1 else []):
+            for g in range(games):
+                pair = (a, b) if g % 2 == 0 else (b, a)
+                yield (number, seed, pair, shipList, boardsize, winCondition)
+                number += 1
+
+
+def runTournament(levels, games, shipList=None, boardsize=10,
+                  winCondition=WIN_BY_POINTS, seed=0, processes=None,
+                  chunksize=64, store=None):
+    """(list of int, int, dict, int, int, int, int, int, RatingStore)
+    -> dict
+    Play games per pair of levels on processes worker processes
+    (default: one per CPU) and return the tournament report
+    Every game is recorded in store, if given, with the levels as
+    players"""
+
+    if shipList is None:
+        shipList = {2: 1, 3: 1, 4: 1, 5: 1}
+    tasks = schedule(levels, games, seed, shipList, boardsize, winCondition)
+
+    # Per level: games, wins, draws and shots-to-win of the games it
+    # finished. Per pair: wins of each side
+    stats = dict((level, {'games': 0, 'wins': 0, 'draws': 0, 'shots': []})
+                 for level in levels)
+    pairs = {}
+    played = 0
+    start = time.time()
+    pool = multiprocessing.Pool(processes)
+    try:
+        for number, pair, winner, finisher, shots, scores in \
+                pool.imap(playGame, tasks, chunksize):
+            played += 1
+            if store is not None:
+                store.record([LEVELS[l] for l in pair], scores, winner,
+                             winCondition, boardsize)
+            key = tuple(sorted(pair))
+            record = pairs.setdefault(key, {'games': 0, 'draws': 0,
+                                            'wins': dict((l, 0) for l in key)})
+            record['games'] += 1
+            for p in range(2):
+                stats[pair[p]]['games'] += 1
+                if winner is None:
+                    stats[pair[p]]['draws'] += 1
+                elif winner == p:
+                    stats[pair[p]]['wins'] += 1
+            if winner is None:
+                record['draws'] += 1
+            else:
+                record['wins'][pair[winner]] += 1
+            stats[pair[finisher]]['shots'].append(shots[finisher])
+    finally:
+        pool.close()
+        pool.join()
+        if store is not None:
+            store.flush()
+    elapsed = time.time() - start
+
+    report = {'games': played, 'seconds': round(elapsed, 3),
+              'gamesPerSecond': round(played / max(elapsed, 1e-9), 1),
+              'winCondition': ('points', 'moves')[winCondition],
+              'boardsize': boardsize, 'seed': seed,
+              'levels': {}, 'pairs': []}
+    for level in levels:
+        s = stats[level]
+        shots = sorted(s['shots'])
+        report['levels'][LEVELS[level]] = {
+            'games': s['games'],
+            'winRate': round(float(s['wins']) / max(s['games'], 1), 4),
+            'drawRate': round(float(s['draws']) / max(s['games'], 1), 4),
+            'shotsToWin': {
+                'mean': round(float(sum(shots)) / len(shots), 2)
+                        if shots else None,
+                'p50': percentile(shots, 50),
+                'p90': percentile(shots, 90),
+                'p99': percentile(shots, 99)}}
+    for key in sorted(pairs):
+        record = pairs[key]
+        report['pairs'].append({
+            'levels': [LEVELS[l] for l in key],
+            'games': record['games'],
+            'draws': record['draws'],
+            'wins': dict((LEVELS[l], n) for l, n in record['wins'].items())})
+    return report
+
+
+def formatReport(report):
+    """(dict) -> str
+    Return the tournament report as a table"""
+
+    lines = ['%s games in %ss (%s games/sec), win by %s, %sx%s board' % (
+        report['games'], report['seconds'], report['gamesPerSecond'],
+        report['winCondition'], report['boardsize'], report['boardsize']),
+        '',
+        '%-8s %8s %8s %8s %8s %6s %6s %6s' % (
+            'Level', 'Games', 'Win %', 'Draw %', 'Shots', 'p50', 'p90',
+            'p99')]
+    for name in LEVELS:
+        if name not in report['levels']:
+            continue
+        s = report['levels'][name]
+        shots = s['shotsToWin']
+        lines.append('%-8s %8s %8.1f %8.1f %8s %6s %6s %6s' % (
+            name, s['games'], 100 * s['winRate'], 100 * s['drawRate'],
+            shots['mean'], shots['p50'], shots['p90'], shots['p99']))
+    lines.append('')
+    for record in report['pairs']:
+        a, b = record['levels']
+        if a != b:
+            lines.append('%s vs %s: %s - %s (%s draws)' % (
+                a, b, record['wins'][a], record['wins'][b],
+                record['draws']))
+    return '\n'.join(lines)
+
+
+def parseShips(text):
+    """(str) -> dict
+    Return the shipList described by text such as '2:1,3:1,4:1,5:1'"""
+
+    shipList = {}
+    for item in text.split(','):
+        size, number = item.split(':')
+        shipList[int(size)] = int(number)
+    return shipList
+
+
+def main(argv=None):
+    """(list of str) -> NoneType
+    Run a tournament from the command line"""
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--games', type=int, default=1000,
+                        help='games per pair of levels')
+    parser.add_argument('--levels', default='easy,medium,hard',
+                        help='comma separated difficulty levels')
+    parser.add_argument('--ships', default='2:1,3:1,4:1,5:1',
+                        help='ships as size:number pairs')
+    parser.add_argument('--boardsize', type=int, default=10)
+    parser.add_argument('--win-condition', choices=('points', 'moves'),
+                        default='points')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None,
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('--json', action='store_true',
+                        help='print the report as JSON')
+    parser.add_argument('--db', default=None,
+                        help='record every game and rating in this '
+                             'SQLite database')
+    args = parser.parse_args(argv)
+
+    names = [name.lower() for name in LEVELS]
+    levels = []
+    for name in args.levels.split(','):
+        if name.strip().lower() not in names:
+            parser.error('unknown level %r' % name)
+        levels.append(names.index(name.strip().lower()))
+    winCondition = WIN_BY_MOVES if args.win_condition == 'moves' \
+        else WIN_BY_POINTS
+
+    store = RatingStore(args.db) if args.db else None
+    try:
+        report = runTournament(levels, args.games, parseShips(args.ships),
+                               args.boardsize, winCondition, args.seed,
+                               args.processes, store=store)
+    finally:
+        if store is not None:
+            store.close()
+    if args.json:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    else:
+        print(formatReport(report))
+
+
+if __name__ == '__main__':
+    main()
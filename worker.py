@@ -0,0 +1,186 @@
+"""Computer moves chosen off the Tk main thread
+
+A MoveWorker runs a thread taking the computer's Targeting off a request
+queue, letting it choose a move and putting the move on a result queue.
+The Tk side never waits for it: awaitMove() polls the result queue from
+after() callbacks, so the window keeps redrawing, moving and answering
+dialogs however long the computer thinks. One move is asked for at a
+time, and the main thread leaves the Targeting alone until it is back.
+
+Every move has a deadline, MOVE_LIMIT seconds away by default. The hard
+computer's endgame search gives up by then and the move found by its
+heuristics is played instead. A move chosen past the deadline anyway is
+dropped for the location of highest density (or a random one for the
+easier computers); the Tk side still waits for the worker to hand the
+Targeting back, so no two threads ever use it at once and the next move
+is not asked for while the worker is busy. A computer whose choose()
+fails plays a random location not bombed yet, so the game always goes
+on.
+
+awaitCall() runs any other slow function, such as racing the hard
+computer's fleet layouts, in a thread of its own the same way.
+
+Nothing here imports Tkinter."""
+
+import itertools
+import threading
+from timeit import default_timer as timer
+
+try:
+    import Queue as queue
+except ImportError:  # Python 3
+    import queue
+
+
+# ################################
+#        Constants
+# ################################
+
+# Milliseconds between two looks at the result queue
+POLL_INTERVAL = 20
+
+# Seconds the computer may take over a move before one is made up
+MOVE_LIMIT = 1.0
+
+
+# ################################
+#        Functions
+# ################################
+
+def randomMove(computer):
+    """(Targeting) -> int
+    Return a random location computer has not bombed yet"""
+
+    return computer.rng.choice(computer.unbombed)
+
+
+def fallbackMove(computer):
+    """(Targeting) -> int
+    Return a move of computer found without thinking: the location of
+    highest density for the hard computer, otherwise a random location
+    not bombed yet"""
+
+    density = computer.density
+    if density is None:
+        return randomMove(computer)
+    shots = computer.shots
+    cells = [n for n in range(computer.cells) if not shots >> n & 1]
+    return max(cells, key=density.__getitem__)
+
+
+def awaitMove(widget, worker, computer, done, delay=0,
+              interval=POLL_INTERVAL, limit=MOVE_LIMIT):
+    """(widget, MoveWorker, Targeting, function, int, int, float)
+    -> NoneType
+    Ask worker for the move of computer and call done(move) from the Tk
+    loop of widget once it is chosen, no sooner than delay milliseconds
+    from now; a move chosen later than limit seconds from now is
+    replaced by fallbackMove()"""
+
+    deadline = timer() + limit
+    number = worker.ask(computer, deadline)
+    due = timer() + delay / 1000.0
+    answer = []
+
+    def poll():
+        if not answer:
+            move = worker.answer(number)
+            if move is not None:
+                answer.append(move)
+        if answer and timer() >= due:
+            done(answer[0])
+        else:
+            widget.after(interval, poll)
+    widget.after(min(interval, delay), poll)
+
+
+def awaitCall(widget, function, args, done, interval=POLL_INTERVAL):
+    """(widget, function, tuple, function, int) -> NoneType
+    Call function(*args) in a thread of its own and done(result) from
+    the Tk loop of widget once it returns, done(None) if it raised"""
+
+    result = []
+
+    def run():
+        try:
+            result.append(function(*args))
+        except Exception:
+            result.append(None)
+
+    def poll():
+        if result:
+            done(result[0])
+        else:
+            widget.after(interval, poll)
+
+    thread = threading.Thread(target=run, name=getattr(
+        function, '__name__', 'call'))
+    thread.daemon = True
+    thread.start()
+    widget.after(interval, poll)
+
+
+# ################################
+#        Classes
+# ################################
+
+class MoveWorker(object):
+    """Thread choosing the moves of computer players"""
+
+    def __init__(self):
+        """(MoveWorker) -> NoneType """
+
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.numbers = itertools.count(1)
+        self.error = None  # last error of a computer choosing its move
+        self.thread = threading.Thread(target=self.run, name='MoveWorker')
+        self.thread.daemon = True  # never keeps the game from exiting
+        self.thread.start()
+
+    def run(self):
+        """(MoveWorker) -> NoneType
+        Choose the moves asked for until closed"""
+
+        while True:
+            job = self.requests.get()
+            if job is None:
+                return
+            number, computer, deadline = job
+            try:
+                move = computer.choose(deadline)
+                if deadline is not None and timer() > deadline:
+                    move = fallbackMove(computer)
+            except Exception as e:
+                self.error = e
+                move = randomMove(computer)
+            self.results.put((number, move))
+
+    def ask(self, computer, deadline=None):
+        """(MoveWorker, Targeting, float) -> int
+        Ask for the move of computer, to be chosen by deadline (a timer()
+        value), and return the number of the request"""
+
+        number = next(self.numbers)
+        self.requests.put((number, computer, deadline))
+        return number
+
+    def answer(self, number):
+        """(MoveWorker, int) -> int or NoneType
+        Return the move asked for by request number, or None if it is not
+        chosen yet; answers to older requests are dropped
+        A computer that failed to choose plays a random location"""
+
+        while True:
+            try:
+                done, move = self.results.get_nowait()
+            except queue.Empty:
+                return None
+            if done == number:
+                return move
+
+    def close(self):
+        """(MoveWorker) -> NoneType
+        Stop the thread once the move it is choosing, if any, is done"""
+
+        self.requests.put(None)